@@ -0,0 +1,174 @@
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import numpy as np
+from cache_utils import path_signature
+
+# Baris versi lama di SQLite bersama dibiarkan (proses lain mungkin masih memakainya)
+# sampai tidak dipakai selama ini
+STALE_VERSION_SECONDS = 7 * 24 * 3600
+
+
+def chunk_ids(results):
+    """Identitas set chunk hasil retrieval (urutan tidak diperhitungkan)."""
+    ids = []
+    for doc, _ in results:
+        doc_id = getattr(doc, "id", None)
+        if not doc_id:
+            raw = json.dumps(doc.metadata, sort_keys=True, ensure_ascii=False) + doc.page_content
+            doc_id = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        ids.append(doc_id)
+    return tuple(sorted(ids))
+
+
+class AnswerCache:
+    """
+    Cache jawaban semantik: pertanyaan parafrase (cosine >= threshold) yang
+    mengambil set chunk yang sama memakai ulang jawaban sebelumnya.
+
+    Args:
+        threshold (float): Batas minimal cosine similarity embedding pertanyaan.
+        max_entries (int): Jumlah entri maksimum di memori (LRU).
+        db_path (str): Opsional, file SQLite untuk menyimpan cache antar-proses/restart.
+        watch_paths (list): Path yang menentukan versi cache (GGUF, folder Chroma DB /
+            index NumPy, embedding model atau embedder ONNX); bila berubah, entri versi
+            lama tidak dipakai lagi. Setiap baris SQLite menyimpan versinya sendiri,
+            sehingga proses lain yang masih di versi lama tidak ikut terhapus.
+        check_interval (float): Jeda minimal (detik) antar pengecekan versi.
+    """
+
+    def __init__(self, threshold=0.95, max_entries=512, db_path=None, watch_paths=(), check_interval=5.0):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.watch_paths = list(watch_paths)
+        self.check_interval = check_interval
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+        self.version = path_signature(self.watch_paths)
+        self.last_check = time.monotonic()
+
+        self.conn = None
+        if db_path:
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, version TEXT, embedding BLOB, chunk_ids TEXT, "
+                "question TEXT, answer TEXT, last_used REAL)"
+            )
+            self._load_from_disk()
+
+    def _load_from_disk(self):
+        self.conn.execute(
+            "DELETE FROM answers WHERE version != ? AND last_used < ?",
+            (self.version, time.time() - STALE_VERSION_SECONDS),
+        )
+        self.conn.commit()
+        rows = self.conn.execute(
+            "SELECT key, embedding, chunk_ids, question, answer FROM answers "
+            "WHERE version = ? ORDER BY last_used DESC LIMIT ?",
+            (self.version, self.max_entries),
+        ).fetchall()
+        for key, embedding, ids, question, answer in reversed(rows):
+            self.entries[key] = {
+                "embedding": np.frombuffer(embedding, dtype=np.float32),
+                "chunk_ids": tuple(json.loads(ids)),
+                "question": question,
+                "answer": answer,
+            }
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self.last_check < self.check_interval:
+            return
+        self.last_check = now
+        version = path_signature(self.watch_paths)
+        if version != self.version:
+            self.version = version
+            self.entries.clear()
+            self.stats["invalidations"] += 1
+            if self.conn is not None:
+                self._load_from_disk()
+
+    def clear(self):
+        """Kosongkan entri versi saat ini (baris versi lain milik proses lain dibiarkan)."""
+        self.entries.clear()
+        if self.conn is not None:
+            self.conn.execute("DELETE FROM answers WHERE version = ?", (self.version,))
+            self.conn.commit()
+
+    @staticmethod
+    def _normalize(embedding):
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def get(self, embedding, ids):
+        """
+        Cari jawaban tersimpan untuk embedding pertanyaan + set chunk `ids`.
+        Mengembalikan dict entri atau None.
+        """
+        with self.lock:
+            self._check_version()
+            query = self._normalize(embedding)
+
+            best_key, best_score = None, self.threshold
+            for key, entry in self.entries.items():
+                if entry["chunk_ids"] != ids:
+                    continue
+                score = float(np.dot(query, entry["embedding"]))
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.stats["misses"] += 1
+                return None
+
+            self.stats["hits"] += 1
+            self.entries.move_to_end(best_key)
+            if self.conn is not None:
+                self.conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (time.time(), best_key))
+                self.conn.commit()
+            return {**self.entries[best_key], "similarity": best_score}
+
+    def put(self, question, embedding, ids, answer):
+        with self.lock:
+            self._check_version()
+            vec = self._normalize(embedding)
+            key = hashlib.sha1(f"{self.version}\x00{question}\x00{','.join(ids)}".encode("utf-8")).hexdigest()
+
+            self.entries[key] = {"embedding": vec, "chunk_ids": ids, "question": question, "answer": answer}
+            self.entries.move_to_end(key)
+
+            evicted = []
+            while len(self.entries) > self.max_entries:
+                old_key, _ = self.entries.popitem(last=False)
+                evicted.append(old_key)
+                self.stats["evictions"] += 1
+
+            if self.conn is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, self.version, vec.tobytes(), json.dumps(list(ids)), question, answer, time.time()),
+                )
+                self.conn.executemany("DELETE FROM answers WHERE key = ?", [(k,) for k in evicted])
+                self.conn.commit()
+
+    def report(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self.entries),
+            "hit_rate": self.stats["hits"] / total if total else 0.0,
+        }
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,192 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from tqdm import tqdm
+from engine import TaxbotEngine, CHROMA_PATH, MODEL_PATH, EMBEDDING_MODEL, NO_ANSWER, CONTEXT_SEPARATOR
+from topic_gate import load_topic_gate
+
+BATCH_SIZE = 32
+TOP_K = 5
+
+
+# ===========================
+# INPUT / OUTPUT
+# ===========================
+def load_questions(path):
+    """
+    Baca pertanyaan dari JSONL atau CSV. Field pertanyaan: "question" atau "prompt"
+    (format selected_questions dari rlhf/data_prep/get_question.py). Field "id"
+    opsional; jika tidak ada, id diturunkan dari hash pertanyaan (bukan nomor
+    baris), sehingga resume tetap benar walau file input diedit/diurutkan ulang.
+    """
+    if path.endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    items = []
+    seen = {}
+    for row in rows:
+        question = row.get("question") or row.get("prompt")
+        if not question:
+            continue
+        item_id = row.get("id")
+        if item_id is None or item_id == "":
+            item_id = "q-" + hashlib.sha1(question.strip().encode("utf-8")).hexdigest()[:16]
+            # Pertanyaan kembar diberi akhiran urutan kemunculan
+            seen[item_id] = seen.get(item_id, 0) + 1
+            if seen[item_id] > 1:
+                item_id = f"{item_id}-{seen[item_id]}"
+        items.append({"id": str(item_id), "question": question, "type": row.get("type")})
+    return items
+
+
+def load_done_ids(path):
+    """Id yang sudah ada di file output, supaya run yang terputus bisa dilanjutkan."""
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["id"])
+            except (json.JSONDecodeError, KeyError):
+                # Baris terakhir bisa terpotong bila proses dihentikan paksa
+                continue
+    return done
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# ===========================
+# BATCH PIPELINE
+# ===========================
+def answer_batch(engine, batch, top_k):
+    """
+    Embed + cari semua pertanyaan dalam batch sekaligus, lalu generate satu per satu.
+    Pertanyaan yang ditolak topic gate langsung dijawab NO_ANSWER tanpa retrieval.
+    Yield record hasil per pertanyaan.
+    """
+    off_topic = [item for item in batch if engine.is_off_topic(item["question"])]
+    for item in off_topic:
+        yield {
+            "id": item["id"],
+            "question": item["question"],
+            "type": item["type"],
+            "answer": NO_ANSWER,
+            "source": [],
+            "answer_type": "none",
+            "off_topic": True,
+            "cache_hit": False,
+            "timings": {"retrieval": 0.0, "generation": 0.0},
+            "prompt_tokens": None,
+            "completion_tokens": None,
+        }
+    batch = [item for item in batch if item not in off_topic]
+    if not batch:
+        return
+
+    start = time.perf_counter()
+    retrieved = engine.retrieve_many([item["question"] for item in batch], top_k=top_k)
+    retrieval_each = (time.perf_counter() - start) / len(batch)
+
+    for item, (embedding, results) in zip(batch, retrieved):
+        t0 = time.perf_counter()
+        question = item["question"]
+        context, source, answer_type = engine.format_results(question, results)
+
+        stats = {}
+        cache_hit = False
+        if answer_type != "none":
+            response = engine.lookup_answer(embedding, results)
+            cache_hit = response is not None
+            if not cache_hit:
+                response = engine.infer(question, CONTEXT_SEPARATOR.join(context), source, stats=stats)
+                engine.store_answer(question, embedding, results, response)
+        else:
+            response = NO_ANSWER
+            source = []
+
+        yield {
+            "id": item["id"],
+            "question": question,
+            "type": item["type"],
+            "answer": response,
+            "source": source,
+            "answer_type": answer_type,
+            "off_topic": False,
+            "cache_hit": cache_hit,
+            "timings": {
+                "retrieval": retrieval_each,
+                "generation": time.perf_counter() - t0,
+                **{k: v for k, v in stats.items() if k in ("time_to_first_token", "decode_tokens_per_second")},
+            },
+            "prompt_tokens": stats.get("prompt_tokens"),
+            "completion_tokens": stats.get("completion_tokens"),
+        }
+
+
+def run_batch(engine, input_file, output_file, batch_size=BATCH_SIZE, top_k=TOP_K):
+    items = load_questions(input_file)
+    done = load_done_ids(output_file)
+    todo = [item for item in items if item["id"] not in done]
+    print(f"📚 Total pertanyaan: {len(items)} | Sudah dikerjakan: {len(done)} | Sisa: {len(todo)}")
+
+    start = time.perf_counter()
+    with open(output_file, "a", encoding="utf-8") as f, tqdm(total=len(todo), desc="Answering") as bar:
+        for batch in chunked(todo, batch_size):
+            for record in answer_batch(engine, batch, top_k):
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                bar.update(1)
+
+    elapsed = time.perf_counter() - start
+    if todo:
+        print(f"✅ {len(todo)} pertanyaan selesai dalam {elapsed:.1f} detik ({elapsed / len(todo):.2f} detik/pertanyaan)")
+    print(f"📝 Hasil disimpan di: {output_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jawab banyak pertanyaan sekaligus (JSONL/CSV -> JSONL)")
+    parser.add_argument("input_file", help="File JSONL/CSV berisi pertanyaan")
+    parser.add_argument("output_file", help="File JSONL hasil (dilanjutkan bila sudah ada)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--chroma-path", default=CHROMA_PATH)
+    parser.add_argument("--embedding-model", default=EMBEDDING_MODEL)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--topic-gate-path", default=None, help="Model topic gate terlatih (JSON, python topic_gate.py); tanpa ini gate nonaktif")
+    parser.add_argument("--no-topic-gate", action="store_true")
+    parser.add_argument("--hybrid", action="store_true", help="BM25 + vector search digabung RRF")
+    parser.add_argument("--no-citation-lookup", action="store_true", help="Selalu pakai vector search walau Pasal/Ayat disebut")
+    args = parser.parse_args()
+
+    engine = TaxbotEngine(
+        model_path=args.model_path,
+        chroma_path=args.chroma_path,
+        embedding_model=args.embedding_model,
+        device=args.device,
+        embedding_device=args.device,
+        topic_gate=None if args.no_topic_gate else load_topic_gate(args.topic_gate_path),
+        hybrid=args.hybrid,
+        citation_lookup=not args.no_citation_lookup,
+    )
+    startup = engine.warmup()
+    print(f"⚙️  Engine siap dalam {startup['total']:.2f} detik")
+    try:
+        run_batch(engine, args.input_file, args.output_file, args.batch_size, args.top_k)
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
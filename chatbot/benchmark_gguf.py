@@ -0,0 +1,121 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing as mp
+from engine import TaxbotEngine, CONTEXT_SEPARATOR, format_context
+from benchmark_questions import load_questions
+from citation_index import citation_match
+
+OUTPUT_FILE = "benchmark_gguf.json"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    idx = min(int(round(q / 100 * (len(values) - 1))), len(values) - 1)
+    return values[idx]
+
+
+# ===========================
+# BENCHMARK PER FILE GGUF
+# ===========================
+def run_model(model_path, prompts, n_ctx, max_tokens):
+    """
+    Dijalankan di proses terpisah per GGUF supaya peak RSS (ru_maxrss)
+    tidak tercampur antar model.
+    """
+    import metrics
+
+    rss_before = metrics.rss_bytes()
+    # prefix_cache=False agar prefill mencakup seluruh prompt (sebanding antar model)
+    engine = TaxbotEngine(model_path=model_path, n_ctx=n_ctx, prefix_cache=False)
+    engine.load_llm()
+    load_seconds = engine.startup_timings["load_llm"]
+    rss_loaded = metrics.rss_bytes()
+
+    rows = []
+    for question, context, source, metadatas in prompts:
+        stats = {}
+        answer = "".join(engine.infer_stream(question, context, source, stats=stats, max_tokens=max_tokens)).strip()
+        has_citation, pasal_ok, exact_ok = citation_match(answer, metadatas)
+        ttft = stats["time_to_first_token"]
+        rows.append({
+            "question": question,
+            "answer": answer,
+            "latency": stats["generation_seconds"],
+            "time_to_first_token": ttft,
+            "prefill_tokens_per_second": stats["prompt_tokens"] / ttft if ttft else None,
+            "decode_tokens_per_second": stats["decode_tokens_per_second"],
+            "completion_tokens": stats["completion_tokens"],
+            "has_citation": has_citation,
+            "citation_pasal_match": pasal_ok,
+            "citation_exact_match": exact_ok,
+        })
+    engine.close()
+
+    n = len(rows)
+    latencies = [r["latency"] for r in rows]
+    prefill = [r["prefill_tokens_per_second"] for r in rows if r["prefill_tokens_per_second"]]
+    return {
+        "model": model_path,
+        "load_seconds": load_seconds,
+        "model_rss_mb": (rss_loaded - rss_before) / 2**20,
+        "peak_rss_mb": metrics.peak_rss_bytes() / 2**20,
+        "prefill_tokens_per_second": sum(prefill) / len(prefill) if prefill else None,
+        "decode_tokens_per_second": sum(r["decode_tokens_per_second"] for r in rows) / n,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "avg_completion_tokens": sum(r["completion_tokens"] for r in rows) / n,
+        "citation_rate": sum(r["has_citation"] for r in rows) / n,
+        "citation_pasal_match_rate": sum(r["citation_pasal_match"] for r in rows) / n,
+        "citation_exact_match_rate": sum(r["citation_exact_match"] for r in rows) / n,
+        "per_question": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandingkan beberapa file GGUF (kuantisasi/versi) pada set pertanyaan tetap")
+    parser.add_argument("models", nargs="+", help="Path file GGUF, mis. model/taxbot_v9.gguf model/taxbot_v9_dpo_v2.gguf")
+    parser.add_argument("--questions", default=None, help="JSONL selected_questions (field 'prompt'); default BENCHMARK_QUESTIONS")
+    parser.add_argument("--limit", type=int, default=None, help="Ambil N pertanyaan pertama")
+    parser.add_argument("--n-ctx", type=int, default=2048)
+    parser.add_argument("--max-tokens", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    # Retrieval sekali saja: semua model mendapat konteks yang sama persis
+    retriever = TaxbotEngine()
+    retriever.load_retriever()
+    prompts = []
+    for question in load_questions(args.questions, args.limit):
+        _, results = retriever.retrieve(question, top_k=args.top_k)
+        context, source, answer_type = format_context(results)
+        if answer_type != "none":
+            metadatas = [dict(doc.metadata) for doc, _ in results]
+            prompts.append((question, CONTEXT_SEPARATOR.join(context), source, metadatas))
+    retriever.close()
+    print(f"📚 {len(prompts)} pertanyaan dengan konteks relevan")
+
+    report = []
+    for model_path in args.models:
+        print(f"⏳ {model_path} ...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+            report.append(pool.submit(run_model, model_path, prompts, args.n_ctx, args.max_tokens).result())
+
+    header = f"{'Model':<36}{'Load(s)':>8}{'RSS MB':>8}{'Prefill t/s':>12}{'Decode t/s':>11}{'p50(s)':>8}{'p95(s)':>8}{'Sitasi':>8}{'Pasal':>7}{'Exact':>7}"
+    print("\n" + header)
+    for r in report:
+        prefill = f"{r['prefill_tokens_per_second']:.1f}" if r["prefill_tokens_per_second"] else "-"
+        print(f"{r['model'][-36:]:<36}{r['load_seconds']:>8.2f}{r['model_rss_mb']:>8.0f}{prefill:>12}"
+              f"{r['decode_tokens_per_second']:>11.1f}{r['latency_p50']:>8.2f}{r['latency_p95']:>8.2f}"
+              f"{r['citation_rate']:>8.0%}{r['citation_pasal_match_rate']:>7.0%}{r['citation_exact_match_rate']:>7.0%}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Hasil disimpan ke {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import json
+import time
+from engine import TaxbotEngine, CHROMA_PATH
+from benchmark_gguf import percentile
+from retrieval_cache import cached_similarity_search
+
+OUTPUT_FILE = "benchmark_hybrid.json"
+# Hasil rag_model/generate_dataset_rag.py: global_chunk_id = urutan chunk di db.get()
+DATASET_PATH = "database/generated_qa_dataset_v4.jsonl"
+K_VALUES = (1, 3, 5)
+
+
+def load_labelled_questions(path, chunk_ids, chunk_texts, limit=None):
+    """(pertanyaan, id chunk sumber); baris yang teks chunk-nya tidak cocok lagi dengan DB dilewati."""
+    pairs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            i = row["global_chunk_id"]
+            if i < len(chunk_ids) and chunk_texts[i].strip()[:200] == row["text"][:200]:
+                pairs.append((row["questions"], chunk_ids[i]))
+    return pairs[:limit] if limit else pairs
+
+
+def run_mode(search, pairs, max_k):
+    """Hit@k (chunk sumber ada di top-k) + latensi per query."""
+    latencies, hits = [], {k: 0 for k in K_VALUES}
+    for question, chunk_id in pairs:
+        start = time.perf_counter()
+        _, results = search(question, max_k)
+        latencies.append(time.perf_counter() - start)
+        ranked = [doc.id for doc, _ in results]
+        for k in K_VALUES:
+            hits[k] += chunk_id in ranked[:k]
+    return {
+        **{f"hit@{k}": hits[k] / len(pairs) for k in K_VALUES},
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p95_ms": percentile(latencies, 95) * 1000,
+        "latency_avg_ms": sum(latencies) / len(latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hit rate + latensi: vector search saja vs hybrid BM25 + RRF")
+    parser.add_argument("--chroma-path", default=CHROMA_PATH)
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    engine = TaxbotEngine(chroma_path=args.chroma_path, hybrid=True)
+    engine.load_retriever()
+    data = engine.db.get(include=["documents"])
+    pairs = load_labelled_questions(args.dataset, data["ids"], data["documents"], args.limit)
+    print(f"📚 {len(pairs)} pertanyaan berlabel chunk sumber")
+
+    max_k = max(K_VALUES)
+    modes = {
+        "dense": lambda q, k: cached_similarity_search(engine.db, engine.embedding_function, q, k),
+        "hybrid (BM25 + RRF)": engine.retrieve,
+    }
+    report = {label: run_mode(search, pairs, max_k) for label, search in modes.items()}
+    engine.close()
+
+    hit_keys = [f"hit@{k}" for k in K_VALUES]
+    print(f"\n{'Mode':<22}" + "".join(f"{key:>8}" for key in hit_keys) + f"{'p50 ms':>9}{'p95 ms':>9}")
+    for label, r in report.items():
+        print(f"{label:<22}" + "".join(f"{r[key]:>8.1%}" for key in hit_keys)
+              + f"{r['latency_p50_ms']:>9.2f}{r['latency_p95_ms']:>9.2f}")
+    dense, hybrid = report["dense"], report["hybrid (BM25 + RRF)"]
+    print(f"\nOverhead hybrid p50: {hybrid['latency_p50_ms'] - dense['latency_p50_ms']:+.2f} ms, "
+          f"hit@{max_k}: {hybrid[f'hit@{max_k}'] - dense[f'hit@{max_k}']:+.1%}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Hasil disimpan ke {args.output}")
+
+
+if __name__ == "__main__":
+    main()
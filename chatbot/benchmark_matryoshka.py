@@ -0,0 +1,113 @@
+import argparse
+import json
+import tempfile
+import time
+from benchmark_gguf import percentile
+from vector_index import NumpyIndex, write_index
+
+OUTPUT_FILE = "benchmark_matryoshka.json"
+EMBEDDING_MODEL = "model/all-indo-e5-small-v4-matryoshka-v2"
+# Split IR dari FT_Embedding_Models_on_Domain_Specific_Data.ipynb (train + test = corpus, test = query)
+TRAIN_PATH = "../training_model/dataset/train_dataset.json"
+TEST_PATH = "../training_model/dataset/test_dataset.json"
+K_VALUES = (1, 3, 5, 10)
+
+
+def load_records(path):
+    """Baca dataset hasil `Dataset.to_json` (JSON lines; array JSON juga diterima)."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def build_ir_split(train_path, test_path):
+    """
+    Sama seperti notebook: corpus = positive dari train + test, query = anchor
+    test, dokumen relevan = semua entri corpus dengan global_chunk_id yang sama.
+    """
+    train, test = load_records(train_path), load_records(test_path)
+    corpus = {}
+    chunk_to_ids = {}
+    for row in train + test:
+        corpus[row["id"]] = row["positive"]
+        chunk_to_ids.setdefault(row["global_chunk_id"], set()).add(row["id"])
+    queries = {row["id"]: row["anchor"] for row in test}
+    relevant = {row["id"]: chunk_to_ids[row["global_chunk_id"]] for row in test}
+    return corpus, queries, relevant
+
+
+def evaluate(index, query_embeddings, query_ids, relevant, max_k):
+    """Recall@k per k + latensi per query (satu query per panggilan, seperti saat serving)."""
+    latencies, rankings = [], []
+    for embedding in query_embeddings:
+        start = time.perf_counter()
+        results = index.search_many_by_vector([embedding], max_k)[0]
+        latencies.append(time.perf_counter() - start)
+        rankings.append([doc.id for doc, _ in results])
+
+    recall = {}
+    for k in K_VALUES:
+        scores = [len(set(r[:k]) & relevant[q]) / len(relevant[q]) for q, r in zip(query_ids, rankings)]
+        recall[f"recall@{k}"] = sum(scores) / len(scores)
+    return recall, latencies, rankings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k vs latensi: pencarian penuh vs shortlist Matryoshka + rerank")
+    parser.add_argument("--embedding-model", default=EMBEDDING_MODEL)
+    parser.add_argument("--train-path", default=TRAIN_PATH)
+    parser.add_argument("--test-path", default=TEST_PATH)
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128], help="Dimensi shortlist")
+    parser.add_argument("--shortlist-sizes", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    corpus, queries, relevant = build_ir_split(args.train_path, args.test_path)
+    corpus_ids, query_ids = list(corpus), list(queries)
+    print(f"📚 {len(corpus_ids)} dokumen corpus, {len(query_ids)} query uji")
+
+    embedder = HuggingFaceEmbeddings(model_name=args.embedding_model, model_kwargs={"device": "cpu"})
+    corpus_embeddings = embedder.embed_documents([corpus[i] for i in corpus_ids])
+    query_embeddings = embedder.embed_documents([queries[i] for i in query_ids])
+
+    max_k = max(K_VALUES)
+    report = []
+    with tempfile.TemporaryDirectory() as index_dir:
+        # Notebook mengevaluasi dengan cosine similarity
+        write_index(index_dir, corpus_embeddings, corpus_ids, [corpus[i] for i in corpus_ids], [{}] * len(corpus_ids), space="cosine")
+
+        configs = [(None, None)] + [(dim, size) for dim in args.dims for size in args.shortlist_sizes]
+        baseline = None
+        for dim, size in configs:
+            index = NumpyIndex(index_dir, shortlist_dim=dim, shortlist_size=size or 100)
+            recall, latencies, rankings = evaluate(index, query_embeddings, query_ids, relevant, max_k)
+            if baseline is None:
+                baseline = rankings
+            overlap = [len(set(r) & set(b)) / len(b) for r, b in zip(rankings, baseline) if b]
+            report.append({
+                "label": f"{index.matrix.shape[1]} penuh" if dim is None else f"{dim} -> {index.matrix.shape[1]} (S={size})",
+                "shortlist_dim": dim,
+                "shortlist_size": size,
+                **recall,
+                f"overlap_with_full@{max_k}": sum(overlap) / len(overlap) if overlap else None,
+                "latency_p50_ms": percentile(latencies, 50) * 1000,
+                "latency_p95_ms": percentile(latencies, 95) * 1000,
+            })
+
+    recall_keys = [f"recall@{k}" for k in K_VALUES]
+    print(f"\n{'Mode':<22}" + "".join(f"{key:>11}" for key in recall_keys) + f"{'Overlap':>9}{'p50 ms':>9}{'p95 ms':>9}")
+    for r in report:
+        print(f"{r['label']:<22}" + "".join(f"{r[key]:>11.3f}" for key in recall_keys)
+              + f"{r[f'overlap_with_full@{max_k}']:>9.0%}{r['latency_p50_ms']:>9.2f}{r['latency_p95_ms']:>9.2f}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Hasil disimpan ke {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+import numpy as np
+from benchmark_questions import load_questions
+from benchmark_gguf import percentile
+
+OUTPUT_FILE = "benchmark_onnx_embedder.json"
+EMBEDDING_MODEL = "model/all-indo-e5-small-v4-matryoshka-v2"
+ONNX_PATH = "model/all-indo-e5-small-v4-matryoshka-v2-onnx"
+MIN_COSINE = 0.98
+
+
+def run_backend(backend, model_path, questions, threads, queue):
+    """
+    Dijalankan di proses baru (spawn) supaya waktu import/load dan RSS tiap
+    backend tidak tercampur: torch tidak pernah di-import oleh proses ONNX.
+    """
+    import metrics
+
+    rss_start = metrics.rss_bytes()
+    start = time.perf_counter()
+    if backend == "torch":
+        import torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+        if threads:
+            torch.set_num_threads(threads)
+        embedder = HuggingFaceEmbeddings(model_name=model_path, model_kwargs={"device": "cpu"})
+    else:
+        from onnx_embedder import OnnxEmbeddings
+        embedder = OnnxEmbeddings(model_path, quantized=backend == "onnx-int8", threads=threads)
+    embedder.embed_query("pajak")
+    load_seconds = time.perf_counter() - start
+    rss_loaded = metrics.rss_bytes()
+
+    # Latensi serving: satu query per panggilan, seperti retrieve()
+    vectors, latencies = [], []
+    for question in questions:
+        start = time.perf_counter()
+        vectors.append(embedder.embed_query(question))
+        latencies.append(time.perf_counter() - start)
+    queue.put({
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "rss_loaded_mb": rss_loaded / 2**20,
+        "rss_load_delta_mb": (rss_loaded - rss_start) / 2**20,
+        "peak_rss_mb": metrics.peak_rss_bytes() / 2**20,
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p95_ms": percentile(latencies, 95) * 1000,
+        "vectors": vectors,
+    })
+
+
+def measure(backend, model_path, questions, threads):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=run_backend, args=(backend, model_path, questions, threads, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def cosine_rows(a, b):
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paritas + latensi + RSS: embedder PyTorch vs ONNX Runtime (fp32/int8)")
+    parser.add_argument("--embedding-model", default=EMBEDDING_MODEL)
+    parser.add_argument("--onnx-path", default=ONNX_PATH, help="Hasil `python onnx_embedder.py`")
+    parser.add_argument("--questions", default=None, help="JSONL pertanyaan (field 'prompt'); default BENCHMARK_QUESTIONS")
+    parser.add_argument("--threads", type=int, default=None, help="Thread intra-op untuk kedua backend")
+    parser.add_argument("--min-cosine", type=float, default=MIN_COSINE, help="Ambang cosine minimum vs PyTorch")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    report = {"torch": measure("torch", args.embedding_model, questions, args.threads)}
+    for backend in ("onnx-fp32", "onnx-int8"):
+        report[backend] = measure(backend, args.onnx_path, questions, args.threads)
+
+    reference = report["torch"].pop("vectors")
+    failed = False
+    for backend in ("onnx-fp32", "onnx-int8"):
+        cosines = cosine_rows(reference, report[backend].pop("vectors"))
+        report[backend]["cosine_min"] = float(cosines.min())
+        report[backend]["cosine_mean"] = float(cosines.mean())
+        failed |= report[backend]["cosine_min"] < args.min_cosine
+
+    print(f"{'Backend':<11}{'Load s':>8}{'RSS MB':>9}{'p50 ms':>9}{'p95 ms':>9}{'Cos min':>9}{'Cos avg':>9}")
+    for backend, r in report.items():
+        cos_min = f"{r['cosine_min']:.4f}" if "cosine_min" in r else "-"
+        cos_avg = f"{r['cosine_mean']:.4f}" if "cosine_mean" in r else "-"
+        print(f"{backend:<11}{r['load_seconds']:>8.2f}{r['rss_loaded_mb']:>9.0f}{r['latency_p50_ms']:>9.2f}"
+              f"{r['latency_p95_ms']:>9.2f}{cos_min:>9}{cos_avg:>9}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"n_queries": len(questions), "min_cosine": args.min_cosine, **report}, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Hasil disimpan ke {args.output}")
+
+    if failed:
+        print(f"⚠️ Cosine minimum di bawah {args.min_cosine}: vektor ONNX tidak setara dengan PyTorch")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
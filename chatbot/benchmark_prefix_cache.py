@@ -0,0 +1,56 @@
+import argparse
+import json
+from engine import TaxbotEngine, CONTEXT_SEPARATOR, MODEL_PATH
+from benchmark_questions import load_questions
+
+OUTPUT_FILE = "benchmark_prefix_cache.json"
+
+
+def measure_prefill(engine, questions, contexts):
+    """
+    Ukur waktu prefill per pertanyaan = time-to-first-token dengan max_tokens=1.
+    """
+    results = []
+    for question, (context, source) in zip(questions, contexts):
+        stats = {}
+        for _ in engine.infer_stream(question, CONTEXT_SEPARATOR.join(context), source, stats=stats, max_tokens=1):
+            pass
+        results.append(stats["time_to_first_token"])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandingkan prefill dengan dan tanpa KV cache prefix statis")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--questions", default=None, help="JSONL pertanyaan (field 'prompt')")
+    parser.add_argument("--n-ctx", type=int, default=2048)
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    report = {}
+
+    for label, prefix_cache in [("before (konteks di depan)", False), ("after (prefix statis + KV cache)", True)]:
+        engine = TaxbotEngine(model_path=args.model_path, n_ctx=args.n_ctx, prefix_cache=prefix_cache)
+        engine.warmup()
+        retrieved = [(q, engine.build_context(q, top_k=3)) for q in questions]
+        retrieved = [(q, (context, source)) for q, (context, source, answer_type) in retrieved if answer_type != "none"]
+        prefill = measure_prefill(engine, [q for q, _ in retrieved], [c for _, c in retrieved])
+        report[label] = {
+            "prefill_avg": sum(prefill) / len(prefill),
+            "prefill_max": max(prefill),
+            "prefill_per_question": prefill,
+            "startup": engine.startup_timings,
+        }
+        engine.close()
+
+    print(f"{'Mode':<36}{'Prefill avg (s)':>18}{'Prefill max (s)':>18}")
+    for label, r in report.items():
+        print(f"{label:<36}{r['prefill_avg']:>18.3f}{r['prefill_max']:>18.3f}")
+
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Hasil disimpan ke {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
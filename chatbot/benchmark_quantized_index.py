@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import time
+from benchmark_questions import load_questions
+from benchmark_gguf import percentile
+from vector_index import NumpyIndex, EMBEDDINGS_FILE, INT8_FILE, BINARY_FILE
+import metrics
+
+OUTPUT_FILE = "benchmark_quantized_index.json"
+CHROMA_PATH = "database/chroma_uu_db_indo_v2"
+INDEX_PATH = "database/numpy_index"
+EMBEDDING_MODEL = "model/all-indo-e5-small-v4-matryoshka-v2"
+
+
+def chroma_top_ids(chroma_path, embeddings, k):
+    """Top-k id dari Chroma (hasil retrieval saat ini) sebagai acuan recall."""
+    from langchain_chroma import Chroma
+
+    db = Chroma(persist_directory=chroma_path)
+    return [[doc.id for doc, _ in db.similarity_search_by_vector_with_relevance_scores(e, k=k)] for e in embeddings]
+
+
+def run_mode(index_path, embeddings, reference, k, **options):
+    rss_before = metrics.rss_bytes()
+    index = NumpyIndex(index_path, **options)
+    rss_after = metrics.rss_bytes()
+
+    latencies, recalls = [], []
+    for embedding, expected in zip(embeddings, reference):
+        start = time.perf_counter()
+        results = index.search_many_by_vector([embedding], k)[0]
+        latencies.append(time.perf_counter() - start)
+        if expected:
+            recalls.append(len({doc.id for doc, _ in results} & set(expected)) / len(expected))
+    return {
+        "scan_mb": index.scan_bytes() / 2**20,
+        "open_rss_delta_mb": (rss_after - rss_before) / 2**20,
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p95_ms": percentile(latencies, 95) * 1000,
+        f"recall@{k}_vs_chroma": sum(recalls) / len(recalls) if recalls else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index NumPy float32 vs int8 vs biner (Hamming): memori, latensi, recall@k")
+    parser.add_argument("--chroma-path", default=CHROMA_PATH)
+    parser.add_argument("--index-path", default=INDEX_PATH, help="Hasil `python vector_index.py` (berisi file int8/biner)")
+    parser.add_argument("--embedding-model", default=EMBEDDING_MODEL)
+    parser.add_argument("--questions", default=None, help="JSONL pertanyaan (field 'prompt')")
+    parser.add_argument("--prefilter-sizes", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    embedder = HuggingFaceEmbeddings(model_name=args.embedding_model, model_kwargs={"device": "cpu"})
+    embeddings = embedder.embed_documents(load_questions(args.questions))
+    reference = chroma_top_ids(args.chroma_path, embeddings, args.top_k)
+
+    disk = {
+        name: os.path.getsize(os.path.join(args.index_path, name)) / 2**20
+        for name in (EMBEDDINGS_FILE, INT8_FILE, BINARY_FILE)
+        if os.path.exists(os.path.join(args.index_path, name))
+    }
+
+    modes = [("float32 eksak", {})]
+    for quantization in ("int8", "binary"):
+        for size in args.prefilter_sizes:
+            modes.append((f"{quantization} P={size}", {"quantization": quantization, "prefilter_size": size}))
+    report = {label: run_mode(args.index_path, embeddings, reference, args.top_k, **options) for label, options in modes}
+
+    recall_key = f"recall@{args.top_k}_vs_chroma"
+    print(f"{'Mode':<18}{'Scan MB':>9}{'RSS +MB':>9}{'p50 ms':>9}{'p95 ms':>9}{'Recall':>9}")
+    for label, r in report.items():
+        recall = f"{r[recall_key]:.1%}" if r[recall_key] is not None else "-"
+        print(f"{label:<18}{r['scan_mb']:>9.2f}{r['open_rss_delta_mb']:>9.1f}{r['latency_p50_ms']:>9.2f}"
+              f"{r['latency_p95_ms']:>9.2f}{recall:>9}")
+    print("\nUkuran file: " + ", ".join(f"{name} {mb:.2f} MB" for name, mb in disk.items()))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"disk_mb": disk, "modes": report}, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Hasil disimpan ke {args.output}")
+
+
+if __name__ == "__main__":
+    main()
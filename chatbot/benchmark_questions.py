@@ -0,0 +1,26 @@
+import json
+
+# Pertanyaan tetap untuk benchmark, supaya hasil antar-run bisa dibandingkan
+BENCHMARK_QUESTIONS = [
+    "Apa sanksi atas keterlambatan pelaporan SPT Tahunan badan?",
+    "Kapan batas waktu penyampaian SPT Masa PPN?",
+    "Siapa yang wajib mendaftarkan diri untuk memperoleh NPWP?",
+    "Berapa tarif PPh Pasal 21 untuk penghasilan sampai dengan 60 juta rupiah?",
+    "Apa yang dimaksud dengan pengusaha kena pajak?",
+    "Bagaimana prosedur pengajuan keberatan atas surat ketetapan pajak?",
+    "Apa saja objek pajak penghasilan menurut undang-undang?",
+    "Berapa lama jangka waktu daluwarsa penagihan pajak?",
+]
+
+
+def load_questions(path=None, limit=None):
+    """
+    Muat pertanyaan benchmark. Jika `path` diberikan, baca file JSONL hasil
+    rlhf/data_prep/get_question.py (field "prompt"); selain itu pakai BENCHMARK_QUESTIONS.
+    """
+    if path is None:
+        questions = list(BENCHMARK_QUESTIONS)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            questions = [json.loads(line)["prompt"] for line in f if line.strip()]
+    return questions[:limit] if limit else questions
@@ -0,0 +1,55 @@
+import argparse
+import json
+import time
+from engine import TaxbotEngine, CHROMA_PATH
+from benchmark_questions import load_questions
+
+OUTPUT_FILE = "benchmark_retrieve_many.json"
+
+
+def measure(run, queries):
+    """Query per detik untuk satu cara retrieval."""
+    start = time.perf_counter()
+    run(queries)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "queries_per_second": len(queries) / seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput retrieval: build_context per query vs build_contexts (batch)")
+    parser.add_argument("--chroma-path", default=CHROMA_PATH)
+    parser.add_argument("--questions", default=None, help="JSONL pertanyaan (field 'prompt'); default BENCHMARK_QUESTIONS")
+    parser.add_argument("--n-queries", type=int, default=256, help="Daftar pertanyaan diulang sampai sejumlah ini")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 64, 128])
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    queries = [questions[i % len(questions)] for i in range(args.n_queries)]
+
+    # Tanpa retrieval cache dan lookup sitasi: setiap query benar-benar di-embed dan dicari
+    engine = TaxbotEngine(chroma_path=args.chroma_path, embedding_device=args.device, citation_lookup=False)
+    engine.load_retriever()
+    engine.build_contexts(questions[:4], top_k=args.top_k)
+
+    report = {"sequential": measure(lambda qs: [engine.build_context(q, top_k=args.top_k) for q in qs], queries)}
+    for batch_size in args.batch_sizes:
+        report[f"batch {batch_size}"] = measure(
+            lambda qs: engine.build_contexts(qs, top_k=args.top_k, batch_size=batch_size), queries
+        )
+    engine.close()
+
+    baseline = report["sequential"]["queries_per_second"]
+    print(f"{'Mode':<14}{'Detik':>10}{'Query/s':>10}{'Speedup':>10}")
+    for label, r in report.items():
+        print(f"{label:<14}{r['seconds']:>10.2f}{r['queries_per_second']:>10.1f}{r['queries_per_second'] / baseline:>9.2f}x")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"n_queries": len(queries), "device": args.device, **report}, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Hasil disimpan ke {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import json
+import sys
+from engine import TaxbotEngine, MODEL_PATH
+from sessions import SessionStore
+
+OUTPUT_FILE = "benchmark_sessions.json"
+# Percakapan dua turn: pertanyaan lanjutan tanpa kata kunci, bergantung pada turn pertama
+CONVERSATION = [
+    "Berapa tarif PPh untuk wajib pajak orang pribadi?",
+    "Bagaimana dengan wajib pajak badan?",
+]
+
+
+def run_conversation(engine, questions, session_id="benchmark"):
+    """Jalankan percakapan; per turn catat riwayat yang dipakai dan token prompt dari KV cache."""
+    turns = []
+    for question in questions:
+        result = engine.chat(session_id, question)
+        stats = result["generation_stats"]
+        turns.append({
+            "question": question,
+            "answer_type": result["answer_type"],
+            "history_turns": result["history_turns"],
+            "prompt_tokens": stats.get("prompt_tokens"),
+            "reused_prompt_tokens": stats.get("reused_prompt_tokens", 0),
+            "time_to_first_token": stats.get("time_to_first_token"),
+        })
+    return turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cek riwayat multi-turn: turn kedua harus memakai ulang KV cache sesi")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--n-ctx", type=int, default=2048)
+    parser.add_argument("questions", nargs="*", default=CONVERSATION, help="Pertanyaan per turn (minimal dua)")
+    args = parser.parse_args()
+
+    engine = TaxbotEngine(model_path=args.model_path, n_ctx=args.n_ctx, session_store=SessionStore(max_states=1))
+    engine.warmup()
+    turns = run_conversation(engine, args.questions)
+    engine.close()
+
+    print(f"{'Turn':<6}{'Riwayat':>9}{'Prompt':>9}{'Reuse':>9}{'TTFT (s)':>10}")
+    for i, turn in enumerate(turns, start=1):
+        ttft = turn["time_to_first_token"]
+        print(f"{i:<6}{turn['history_turns']:>9}{turn['prompt_tokens'] or 0:>9}{turn['reused_prompt_tokens']:>9}"
+              f"{ttft if ttft is not None else float('nan'):>10.2f}")
+
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+        json.dump({"n_ctx": args.n_ctx, "turns": turns}, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Hasil disimpan ke {OUTPUT_FILE}")
+
+    # Turn kedua yang dijawab harus membawa turn pertama dan memakai ulang prompt-nya dari KV state sesi
+    answered = [t for t in turns[1:] if t["answer_type"] != "none"]
+    if answered and (answered[0]["history_turns"] == 0 or answered[0]["reused_prompt_tokens"] == 0):
+        print("⚠️ Turn kedua tidak memakai riwayat/KV cache sesi")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
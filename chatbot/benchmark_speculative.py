@@ -0,0 +1,78 @@
+import argparse
+import json
+from engine import TaxbotEngine, CONTEXT_SEPARATOR, MODEL_PATH
+from benchmark_questions import load_questions
+
+OUTPUT_FILE = "benchmark_speculative.json"
+
+
+def measure_decode(engine, prompts):
+    """Generate semua pertanyaan dengan streaming, kumpulkan statistik per pertanyaan."""
+    rows = []
+    for question, context, source in prompts:
+        stats = {}
+        answer = "".join(engine.infer_stream(question, context, source, stats=stats))
+        rows.append({"question": question, "answer": answer, **stats})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandingkan decode token/s dengan dan tanpa prompt-lookup speculative decoding")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--questions", default=None, help="JSONL pertanyaan (field 'prompt')")
+    parser.add_argument("--n-ctx", type=int, default=2048)
+    parser.add_argument("--speculative-tokens", type=int, nargs="+", default=[2, 5, 10],
+                        help="Nilai num_pred_tokens yang dibandingkan dengan baseline (0)")
+    args = parser.parse_args()
+
+    # Konteks diambil sekali supaya semua mode mendapat prompt yang sama persis
+    engine = TaxbotEngine(model_path=args.model_path, n_ctx=args.n_ctx)
+    engine.warmup()
+    prompts = []
+    for question in load_questions(args.questions):
+        context, source, answer_type = engine.build_context(question, top_k=3)
+        if answer_type != "none":
+            prompts.append((question, CONTEXT_SEPARATOR.join(context), source))
+    engine.close()
+
+    report = {}
+    baseline = None
+    for n in [0, *args.speculative_tokens]:
+        engine = TaxbotEngine(model_path=args.model_path, n_ctx=args.n_ctx, speculative_tokens=n)
+        engine.load_llm()
+        rows = measure_decode(engine, prompts)
+        engine.close()
+
+        drafted = sum(r.get("draft_tokens", 0) for r in rows)
+        accepted = sum(r.get("accepted_draft_tokens", 0) for r in rows)
+        decode_tokens = sum(max(r["completion_tokens"] - 1, 0) for r in rows)
+        decode_seconds = sum(r["decode_seconds"] for r in rows)
+        result = {
+            "decode_tokens_per_second": decode_tokens / decode_seconds if decode_seconds > 0 else 0.0,
+            "avg_time_to_first_token": sum(r["time_to_first_token"] or 0.0 for r in rows) / len(rows),
+            "avg_completion_tokens": sum(r["completion_tokens"] for r in rows) / len(rows),
+            "draft_tokens": drafted,
+            "accepted_draft_tokens": accepted,
+            "acceptance_rate": accepted / drafted if drafted else None,
+            "per_question": rows,
+        }
+        if baseline is None:
+            baseline = result
+        else:
+            base_answers = [r["answer"] for r in baseline["per_question"]]
+            result["speedup"] = result["decode_tokens_per_second"] / (baseline["decode_tokens_per_second"] or 1.0)
+            result["same_answer_as_baseline"] = sum(a == r["answer"] for a, r in zip(base_answers, rows)) / len(rows)
+        report[f"speculative_tokens={n}"] = result
+
+    print(f"{'Mode':<24}{'Decode tok/s':>14}{'Acceptance':>12}{'Speedup':>10}")
+    for label, r in report.items():
+        acceptance = f"{r['acceptance_rate']:.0%}" if r["acceptance_rate"] is not None else "-"
+        print(f"{label:<24}{r['decode_tokens_per_second']:>14.1f}{acceptance:>12}{r.get('speedup', 1.0):>9.2f}x")
+
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Hasil disimpan ke {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
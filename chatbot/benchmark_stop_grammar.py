@@ -0,0 +1,63 @@
+import argparse
+import json
+from engine import TaxbotEngine, CONTEXT_SEPARATOR, MODEL_PATH, STOP_SEQUENCES
+from benchmark_questions import load_questions
+
+OUTPUT_FILE = "benchmark_stop_grammar.json"
+
+# (label, stop sequences, grammar)
+MODES = [
+    ("before (tanpa stop)", [], None),
+    ("stop <|im_end|>", STOP_SEQUENCES, None),
+    ("stop + grammar citation", STOP_SEQUENCES, "citation"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rata-rata token per jawaban: tanpa stop vs stop ChatML vs grammar GBNF")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--questions", default=None, help="JSONL pertanyaan (field 'prompt')")
+    parser.add_argument("--n-ctx", type=int, default=2048)
+    args = parser.parse_args()
+
+    # Konteks diambil sekali supaya semua mode mendapat prompt yang sama
+    engine = TaxbotEngine(model_path=args.model_path, n_ctx=args.n_ctx)
+    engine.warmup()
+    prompts = []
+    for question in load_questions(args.questions):
+        context, source, answer_type = engine.build_context(question, top_k=3)
+        if answer_type != "none":
+            prompts.append((question, CONTEXT_SEPARATOR.join(context), source))
+    max_tokens = engine.generation_kwargs["max_tokens"]
+    engine.close()
+
+    report = {}
+    for label, stop, grammar in MODES:
+        engine = TaxbotEngine(model_path=args.model_path, n_ctx=args.n_ctx, grammar=grammar)
+        engine.load_llm()
+        rows = []
+        for question, context, source in prompts:
+            stats = {}
+            answer = engine.infer(question, context, source, stats=stats, stop=stop)
+            rows.append({"question": question, "answer": answer, **stats})
+        engine.close()
+
+        n = len(rows)
+        report[label] = {
+            "avg_completion_tokens": sum(r["completion_tokens"] for r in rows) / n,
+            "avg_generation_seconds": sum(r["generation_seconds"] for r in rows) / n,
+            "hit_max_tokens": sum(r["completion_tokens"] >= max_tokens for r in rows) / n,
+            "per_question": rows,
+        }
+
+    print(f"{'Mode':<28}{'Token/jawaban':>15}{'Detik/jawaban':>15}{'Kena max_tokens':>17}")
+    for label, r in report.items():
+        print(f"{label:<28}{r['avg_completion_tokens']:>15.1f}{r['avg_generation_seconds']:>15.2f}{r['hit_max_tokens']:>17.0%}")
+
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Hasil disimpan ke {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import json
+import time
+from engine import TaxbotEngine, MODEL_PATH
+from topic_gate import TopicGate, TAX_REGRESSION_QUESTIONS, load_labelled
+
+OUTPUT_FILE = "benchmark_topic_gate.json"
+
+
+def evaluate_gate(gate, texts, labels):
+    """Akurasi gate pada sampel berlabel; 'positif' = diblokir (di luar topik)."""
+    tp = fp = tn = fn = 0
+    seconds = []
+    blocked = []
+    for text, is_tax in zip(texts, labels):
+        start = time.perf_counter()
+        off = gate.is_off_topic(text)
+        seconds.append(time.perf_counter() - start)
+        blocked.append(off)
+        if off and not is_tax:
+            tp += 1
+        elif off and is_tax:
+            fp += 1
+        elif not off and is_tax:
+            tn += 1
+        else:
+            fn += 1
+    return {
+        "accuracy": (tp + tn) / len(texts),
+        "off_topic_precision": tp / (tp + fp) if tp + fp else None,
+        "off_topic_recall": tp / (tp + fn) if tp + fn else None,
+        "tax_blocked": fp,
+        "off_topic_passed": fn,
+        "gate_avg_ms": 1000 * sum(seconds) / len(seconds),
+    }, blocked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ukur akurasi topic gate dan latensi yang dihemat")
+    parser.add_argument("labelled_file", help="JSONL berlabel (question/prompt + label tax|off_topic)")
+    parser.add_argument("--topic-gate-path", default=None, help="Model topic gate (JSON); default: model seed")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--skip-pipeline", action="store_true", help="Hanya ukur akurasi, tanpa menjalankan RAG penuh")
+    args = parser.parse_args()
+
+    texts, labels = load_labelled(args.labelled_file)
+    gate = TopicGate.load(args.topic_gate_path) if args.topic_gate_path else TopicGate.from_seed()
+    report, blocked = evaluate_gate(gate, texts, labels)
+    print(f"🎯 Akurasi {report['accuracy']:.1%} | pertanyaan pajak ikut diblokir: {report['tax_blocked']} "
+          f"| di luar topik lolos: {report['off_topic_passed']} | gate {report['gate_avg_ms']:.3f} ms/pertanyaan")
+
+    # Regresi: pertanyaan pajak tanpa kata kunci yang tidak boleh diblokir
+    regressions = [q for q in TAX_REGRESSION_QUESTIONS if gate.is_off_topic(q)]
+    report["regression_blocked"] = regressions
+    for question in regressions:
+        print(f"⚠️ Pertanyaan pajak diblokir: {question}")
+
+    if not args.skip_pipeline:
+        # Latensi yang dihemat = waktu pipeline penuh (tanpa gate) untuk pertanyaan yang diblokir
+        engine = TaxbotEngine(model_path=args.model_path)
+        engine.warmup()
+        pipeline = [engine.answer(text)["timings"]["total"] for text, off in zip(texts, blocked) if off]
+        engine.close()
+        if pipeline:
+            report["blocked_questions"] = len(pipeline)
+            report["pipeline_avg_seconds"] = sum(pipeline) / len(pipeline)
+            report["saved_seconds_total"] = sum(pipeline) - len(pipeline) * report["gate_avg_ms"] / 1000
+            print(f"⏱️  {len(pipeline)} pertanyaan diblokir, hemat rata-rata {report['pipeline_avg_seconds']:.2f} detik "
+                  f"(total {report['saved_seconds_total']:.1f} detik)")
+
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Hasil disimpan ke {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing as mp
+import time
+from benchmark_questions import load_questions
+from benchmark_gguf import percentile
+
+OUTPUT_FILE = "benchmark_vector_index.json"
+CHROMA_PATH = "database/chroma_uu_db_indo_v2"
+INDEX_PATH = "database/numpy_index"
+EMBEDDING_MODEL = "model/all-indo-e5-small-v4-matryoshka-v2"
+
+
+# ===========================
+# BUKA BACKEND
+# ===========================
+def open_backend(backend, chroma_path, index_path):
+    """Buka Chroma atau NumpyIndex tanpa embedder (query memakai vektor yang sudah dihitung)."""
+    if backend == "chroma":
+        from langchain_chroma import Chroma
+        return Chroma(persist_directory=chroma_path)
+    from vector_index import NumpyIndex
+    return NumpyIndex(index_path, chroma_path=chroma_path)
+
+
+def cold_start(backend, chroma_path, index_path, embedding, k):
+    """
+    Dijalankan di proses baru: import + buka index + query pertama, supaya
+    modul dan page cache proses lain tidak ikut terhitung.
+    """
+    import metrics
+
+    start = time.perf_counter()
+    db = open_backend(backend, chroma_path, index_path)
+    t_open = time.perf_counter()
+    db.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+    t_query = time.perf_counter()
+    return {
+        "open_seconds": t_open - start,
+        "first_query_seconds": t_query - t_open,
+        "cold_start_seconds": t_query - start,
+        "rss_mb": metrics.rss_bytes() / 2**20,
+    }
+
+
+def measure_queries(db, embeddings, k, repeat):
+    """Latensi per query (detik) + top-k id per pertanyaan dari putaran terakhir."""
+    latencies, top_ids = [], []
+    for _ in range(repeat):
+        top_ids = []
+        for embedding in embeddings:
+            start = time.perf_counter()
+            results = db.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+            latencies.append(time.perf_counter() - start)
+            top_ids.append([doc.id for doc, _ in results])
+    return latencies, top_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandingkan Chroma vs index NumPy mmap: cold start dan latensi query")
+    parser.add_argument("--chroma-path", default=CHROMA_PATH)
+    parser.add_argument("--index-path", default=INDEX_PATH, help="Hasil `python vector_index.py`")
+    parser.add_argument("--embedding-model", default=EMBEDDING_MODEL)
+    parser.add_argument("--questions", default=None, help="JSONL pertanyaan (field 'prompt')")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20, help="Berapa kali set pertanyaan diulang untuk latensi")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    # Embedding dihitung sekali; yang dibandingkan hanya pencarian vektornya
+    embedder = HuggingFaceEmbeddings(model_name=args.embedding_model, model_kwargs={"device": "cpu"})
+    embeddings = embedder.embed_documents(load_questions(args.questions))
+
+    report = {}
+    top_ids = {}
+    for backend in ["chroma", "numpy"]:
+        with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+            cold = pool.submit(cold_start, backend, args.chroma_path, args.index_path, embeddings[0], args.top_k).result()
+
+        db = open_backend(backend, args.chroma_path, args.index_path)
+        latencies, top_ids[backend] = measure_queries(db, embeddings, args.top_k, args.repeat)
+        report[backend] = {
+            **cold,
+            "query_p50_ms": percentile(latencies, 50) * 1000,
+            "query_p95_ms": percentile(latencies, 95) * 1000,
+            "query_avg_ms": sum(latencies) / len(latencies) * 1000,
+        }
+
+    # HNSW Chroma bersifat aproksimasi; index NumPy eksak, jadi ini recall@k Chroma terhadap hasil eksak
+    overlaps = [len(set(c) & set(n)) / len(n) for c, n in zip(top_ids["chroma"], top_ids["numpy"]) if n]
+    report["chroma_recall_at_k"] = sum(overlaps) / len(overlaps) if overlaps else None
+
+    print(f"{'Backend':<10}{'Open (s)':>10}{'1st query (s)':>15}{'Cold (s)':>10}{'RSS MB':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for backend in ["chroma", "numpy"]:
+        r = report[backend]
+        print(f"{backend:<10}{r['open_seconds']:>10.3f}{r['first_query_seconds']:>15.3f}{r['cold_start_seconds']:>10.3f}"
+              f"{r['rss_mb']:>8.0f}{r['query_p50_ms']:>9.2f}{r['query_p95_ms']:>9.2f}")
+    if report["chroma_recall_at_k"] is not None:
+        print(f"\nRecall@{args.top_k} Chroma (HNSW) vs NumPy (eksak): {report['chroma_recall_at_k']:.1%}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Hasil disimpan ke {args.output}")
+
+
+if __name__ == "__main__":
+    main()
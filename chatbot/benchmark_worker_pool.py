@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import time
+from engine import TaxbotEngine, CONTEXT_SEPARATOR, MODEL_PATH, format_context
+from benchmark_questions import load_questions
+from worker_pool import LlamaWorkerPool
+
+OUTPUT_FILE = "benchmark_worker_pool.json"
+
+
+def run_load(pool, prompts, repeat):
+    """Kirim semua request sekaligus, ukur throughput token agregat."""
+    start = time.perf_counter()
+    jobs = []
+    for _ in range(repeat):
+        for question, context, source in prompts:
+            stats = {}
+            jobs.append((pool.submit(question, context, source, stats=stats), stats))
+    for future, _ in jobs:
+        future.result()
+    elapsed = time.perf_counter() - start
+
+    tokens = sum(stats.get("completion_tokens", 0) for _, stats in jobs)
+    return {
+        "requests": len(jobs),
+        "completion_tokens": tokens,
+        "seconds": elapsed,
+        "tokens_per_second": tokens / elapsed if elapsed > 0 else 0.0,
+        "requests_per_second": len(jobs) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Skalabilitas tokens/s worker pool llama.cpp (1..N worker)")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--max-workers", type=int, default=max(1, (os.cpu_count() or 2) // 4))
+    parser.add_argument("--questions", default=None, help="JSONL pertanyaan (field 'prompt')")
+    parser.add_argument("--repeat", type=int, default=2, help="Berapa kali set pertanyaan dikirim per run")
+    parser.add_argument("--max-tokens", type=int, default=200)
+    args = parser.parse_args()
+
+    # Retrieval dilakukan sekali di awal supaya benchmark hanya mengukur generate
+    engine = TaxbotEngine(model_path=args.model_path)
+    engine.load_retriever()
+    prompts = []
+    for question in load_questions(args.questions):
+        context, source, answer_type = format_context(engine.retrieve(question, top_k=3)[1])
+        if answer_type != "none":
+            prompts.append((question, CONTEXT_SEPARATOR.join(context), source))
+    engine.close()
+
+    report = []
+    for n_workers in range(1, args.max_workers + 1):
+        pool = LlamaWorkerPool(args.model_path, n_workers=n_workers, generation_kwargs={"max_tokens": args.max_tokens})
+        load_seconds = pool.start()
+        result = run_load(pool, prompts, args.repeat)
+        result.update({
+            "workers": n_workers,
+            "threads_per_worker": len(pool.core_groups[0]),
+            "load_seconds": max(load_seconds.values()),
+        })
+        pool.close()
+        report.append(result)
+        print(f"workers={n_workers:<3} threads/worker={result['threads_per_worker']:<3} "
+              f"{result['tokens_per_second']:8.1f} token/s  {result['requests_per_second']:6.2f} req/s")
+
+    base = report[0]["tokens_per_second"] or 1.0
+    for r in report:
+        r["speedup"] = r["tokens_per_second"] / base
+
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Hasil disimpan ke {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
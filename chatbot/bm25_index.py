@@ -0,0 +1,246 @@
+import argparse
+from collections import Counter
+import contextvars
+import os
+import re
+import time
+import numpy as np
+import metrics
+
+# Disimpan di dalam folder Chroma supaya ikut terhapus/terbangun ulang bersama DB
+BM25_FILE = "bm25_index.npz"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Kata fungsi bahasa Indonesia yang tidak membantu pencocokan istilah
+STOPWORDS = {
+    "yang", "dan", "di", "ke", "dari", "untuk", "dengan", "atau", "pada", "dalam",
+    "ini", "itu", "adalah", "oleh", "sebagai", "akan", "apa", "bagaimana", "berapa",
+    "kapan", "siapa", "mana", "saja", "ada", "para", "tersebut", "dapat", "bagi",
+    "atas", "serta", "karena", "jika", "bila", "apabila", "maka", "telah", "sudah",
+    "yaitu", "yakni", "secara", "agar", "setiap", "juga", "hal", "kah", "pun",
+}
+
+# Partikel/posesif yang dilepas bila sisa kata masih >= 5 huruf ("penghasilannya" -> "penghasilan")
+SUFFIXES = ("nya", "lah", "kah", "pun")
+MIN_STEM_LENGTH = 5
+
+
+# ===========================
+# TOKENISASI
+# ===========================
+def stem(token):
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text):
+    """
+    Token BM25: huruf kecil, alfanumerik, tanpa stopword, partikel dilepas.
+    Ditambah bigram berurutan ("spt_masa", "pasal_21") agar istilah majemuk
+    dan nomor pasal cocok sebagai frasa.
+    """
+    words = [stem(w) for w in TOKEN_PATTERN.findall(text.lower()) if w not in STOPWORDS]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+# ===========================
+# INDEX BM25
+# ===========================
+class BM25Index:
+    """
+    Inverted index BM25 (Okapi). Posting per term disimpan sebagai array
+    kontigu (doc int32 + tf uint16) dengan offset per term; bobot BM25 per
+    posting dihitung sekali saat load sehingga query cukup penjumlahan numpy.
+
+    Args:
+        ids (list): Id chunk (sama dengan id di Chroma).
+        terms (list): Daftar term, urutan sesuai `offsets`.
+        offsets (np.ndarray): Awal posting tiap term (panjang len(terms) + 1).
+        postings (np.ndarray): Indeks dokumen per posting.
+        tfs (np.ndarray): Frekuensi term per posting.
+        doc_lengths (np.ndarray): Jumlah token per dokumen.
+    """
+
+    def __init__(self, ids, terms, offsets, postings, tfs, doc_lengths, k1=1.2, b=0.75):
+        self.ids = list(ids)
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.postings = postings
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+
+        n_docs = len(self.ids)
+        avg_length = float(doc_lengths.mean()) if n_docs else 0.0
+        df = np.diff(offsets).astype(np.float32)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        tf = tfs.astype(np.float32)
+        norm = k1 * (1 - b + b * doc_lengths[postings] / max(avg_length, 1e-9))
+        self.weights = (tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+    @classmethod
+    def build(cls, ids, texts, **kwargs):
+        counts = [Counter(tokenize(text)) for text in texts]
+        terms = sorted({term for counter in counts for term in counter})
+        term_index = {term: i for i, term in enumerate(terms)}
+
+        rows = [[] for _ in terms]
+        for doc, counter in enumerate(counts):
+            for term, tf in counter.items():
+                rows[term_index[term]].append((doc, min(tf, 65535)))
+
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(row) for row in rows])
+        postings = np.fromiter((doc for row in rows for doc, _ in row), dtype=np.int32, count=int(offsets[-1]))
+        tfs = np.fromiter((tf for row in rows for _, tf in row), dtype=np.uint16, count=int(offsets[-1]))
+        doc_lengths = np.array([sum(counter.values()) for counter in counts], dtype=np.int32)
+        return cls(ids, terms, offsets, postings, tfs, doc_lengths, **kwargs)
+
+    def save(self, path):
+        terms = sorted(self.vocab, key=self.vocab.get)
+        np.savez(
+            path,
+            # Teks digabung "\n" sebagai byte utf-8: jauh lebih kecil dari array unicode numpy
+            ids=np.frombuffer("\n".join(self.ids).encode("utf-8"), dtype=np.uint8),
+            terms=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+            offsets=self.offsets,
+            postings=self.postings,
+            tfs=self.tfs,
+            doc_lengths=self.doc_lengths,
+        )
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with np.load(path) as data:
+            ids = data["ids"].tobytes().decode("utf-8").split("\n")
+            terms = data["terms"].tobytes().decode("utf-8").split("\n")
+            return cls(ids, terms, data["offsets"], data["postings"], data["tfs"], data["doc_lengths"], **kwargs)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, k):
+        """Top-k [(doc_id, skor_bm25), ...] urut skor menurun; dokumen tanpa term cocok dilewati."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            row = self.vocab.get(term)
+            if row is None:
+                continue
+            start, end = self.offsets[row], self.offsets[row + 1]
+            # Dokumen unik di satu posting list, jadi fancy-index += aman
+            scores[self.postings[start:end]] += self.idf[row] * self.weights[start:end]
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched])]
+        return [(self.ids[i], float(scores[i])) for i in matched]
+
+
+def bm25_path(chroma_path):
+    return os.path.join(chroma_path, BM25_FILE)
+
+
+def build_from_chroma(chroma_path, path=None):
+    """Bangun index BM25 dari semua chunk di Chroma (id sama) lalu simpan di samping DB."""
+    from langchain_chroma import Chroma
+
+    data = Chroma(persist_directory=chroma_path).get(include=["documents"])
+    index = BM25Index.build(data["ids"], data["documents"])
+    path = path or bm25_path(chroma_path)
+    index.save(path)
+    return index, path
+
+
+# ===========================
+# HYBRID: BM25 + DENSE (RRF)
+# ===========================
+def reciprocal_rank_fusion(rankings, k=60):
+    """Gabungkan beberapa ranking id dengan RRF: skor = sum 1 / (k + rank)."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def _search_bm25(bm25, queries, k):
+    with metrics.stage("bm25", queries=len(queries)):
+        return [bm25.search(query, k) for query in queries]
+
+
+def _submit_bm25(executor, bm25, queries, k):
+    """Jalankan BM25 di thread lain (context disalin agar tahap tercatat di trace yang sama)."""
+    if executor is None:
+        return None
+    return executor.submit(contextvars.copy_context().run, _search_bm25, bm25, queries, k)
+
+
+def fuse_results(db, embedding, dense, lexical, k, rrf_k=60):
+    """
+    Urutan hasil dari RRF, tetapi skor tetap jarak dense (chunk yang hanya
+    ditemukan BM25 dihitung jaraknya dari embedding tersimpan), sehingga
+    ambang relevansi format_context() tidak berubah arti.
+    """
+    from retrieval_cache import load_documents_by_id, vector_distances
+
+    if not all(getattr(doc, "id", None) for doc, _ in dense):
+        return dense[:k]
+    with metrics.stage("fusion"):
+        fused = reciprocal_rank_fusion([[doc.id for doc, _ in dense], [doc_id for doc_id, _ in lexical]], rrf_k)[:k]
+        known = {doc.id: (doc, score) for doc, score in dense}
+        missing = [doc_id for doc_id, _ in fused if doc_id not in known]
+        if missing:
+            docs = load_documents_by_id(db, missing)
+            distances = vector_distances(db, embedding, missing)
+            for doc_id, doc, distance in zip(missing, docs, distances):
+                if doc is not None and distance is not None:
+                    known[doc_id] = (doc, distance)
+        return [known[doc_id] for doc_id, _ in fused if doc_id in known]
+
+
+def hybrid_search(db, embedding_function, bm25, query, k, cache=None, executor=None, fetch_k=None, rrf_k=60):
+    """
+    Seperti cached_similarity_search, tetapi BM25 berjalan paralel dengan
+    embed + vector search lalu digabung RRF. Mengembalikan (query_embedding, [(doc, score), ...]).
+    """
+    from retrieval_cache import cached_similarity_search
+
+    fetch_k = fetch_k or max(4 * k, 20)
+    future = _submit_bm25(executor, bm25, [query], fetch_k)
+    embedding, dense = cached_similarity_search(db, embedding_function, query, fetch_k, cache=cache)
+    lexical = future.result() if future is not None else _search_bm25(bm25, [query], fetch_k)
+    return embedding, fuse_results(db, embedding, dense, lexical[0], k, rrf_k)
+
+
+def hybrid_search_many(db, embedding_function, bm25, queries, k, cache=None, executor=None, fetch_k=None, rrf_k=60, batch_size=None):
+    """Versi batch hybrid_search(); list (query_embedding, [(doc, score), ...]) sesuai urutan `queries`."""
+    from retrieval_cache import cached_similarity_search_many
+
+    fetch_k = fetch_k or max(4 * k, 20)
+    future = _submit_bm25(executor, bm25, queries, fetch_k)
+    dense_many = cached_similarity_search_many(db, embedding_function, queries, fetch_k, cache=cache, batch_size=batch_size)
+    lexical_many = future.result() if future is not None else _search_bm25(bm25, queries, fetch_k)
+    return [
+        (embedding, fuse_results(db, embedding, dense, lexical, k, rrf_k))
+        for (embedding, dense), lexical in zip(dense_many, lexical_many)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bangun index BM25 dari Chroma DB yang sudah ada")
+    parser.add_argument("--chroma-path", default="database/chroma_uu_db_indo_v2")
+    parser.add_argument("--output", default=None, help=f"Default: <chroma-path>/{BM25_FILE}")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index, path = build_from_chroma(args.chroma_path, args.output)
+    size_mb = os.path.getsize(path) / 2**20
+    print(f"✅ BM25: {len(index)} chunk, {len(index.vocab)} term, {size_mb:.1f} MB -> {path} "
+          f"({time.perf_counter() - start:.2f} detik)")
+
+
+if __name__ == "__main__":
+    main()
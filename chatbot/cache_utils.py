@@ -0,0 +1,24 @@
+import hashlib
+import os
+
+
+def path_signature(paths):
+    """
+    Hash dari ukuran + mtime semua file di `paths` (file GGUF, folder Chroma DB).
+    Berubah bila model diganti atau DB di-rebuild/di-upsert.
+    """
+    h = hashlib.sha1()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    full = os.path.join(root, name)
+                    st = os.stat(full)
+                    h.update(f"{os.path.relpath(full, path)}:{st.st_size}:{st.st_mtime_ns};".encode())
+        elif os.path.exists(path):
+            st = os.stat(path)
+            h.update(f"{path}:{st.st_size}:{st.st_mtime_ns};".encode())
+        else:
+            h.update(f"{path}:missing;".encode())
+    return h.hexdigest()
@@ -0,0 +1,49 @@
+import os
+
+# ===========================
+# GRAMMAR GBNF FORMAT JAWABAN
+# ===========================
+# Dua layout yang diminta SYSTEM_INSTRUCTIONS:
+#   1. Jawaban langsung + satu baris "Source: Pasal X Ayat Y UU Z".
+#   2. Sources Used (minimal 2) / Summary / [[ Conclusion ]] atau [[ Recommendation ]].
+# Plus jawaban penolakan NO_ANSWER. Rujukan di baris Source dan Sources Used
+# harus berbentuk Pasal/Ayat/UU; setelah baris Source hanya boleh satu "\n"
+# lalu akhir output. Jumlah dan panjang baris dibatasi (repetisi {m,n}, butuh
+# llama.cpp dengan dukungan bounded repetition) sehingga decode tidak bisa
+# berputar di dalam grammar sampai max_tokens.
+CITATION_GBNF = r"""
+root        ::= (direct | analysis | no-answer) "\n"?
+
+no-answer   ::= "Maaf, saya tidak memiliki pemahaman tentang hal itu."
+
+direct      ::= body "\n" "\n"? source-line
+source-line ::= "Source: " citation ("; " citation){0,2} "."?
+
+citation    ::= "Pasal " number (" Ayat " number)? " UU " uu
+number      ::= [0-9]{1,3} [a-z]?
+uu          ::= ("Nomor " | "No. ")? [0-9]{1,3} (" Tahun " | "/") [0-9]{4} | "KUP" | "PPh" | "PPN" | "PPnBM" | "HPP"
+
+analysis    ::= "Sources Used:\n" item{2,6} "\nSummary:\n" body "\n\n" closing
+item        ::= ("- " | [0-9] ". ")? (citation | "UU " uu (" Pasal " number (" Ayat " number)?)?) "\n"
+closing     ::= ("[[ Conclusion ]]" | "[[ Recommendation ]]") "\n" body
+
+body        ::= line ("\n" "\n"? line){0,7}
+line        ::= [^\n ] [^\n]{0,399}
+"""
+
+GRAMMARS = {"citation": CITATION_GBNF}
+
+
+def load_grammar(grammar):
+    """
+    Buat LlamaGrammar dari nama grammar bawaan ("citation"), path file .gbnf,
+    atau teks GBNF. None = tanpa grammar.
+    """
+    if not grammar:
+        return None
+    from llama_cpp import LlamaGrammar
+    if grammar in GRAMMARS:
+        return LlamaGrammar.from_string(GRAMMARS[grammar], verbose=False)
+    if os.path.exists(grammar):
+        return LlamaGrammar.from_file(grammar, verbose=False)
+    return LlamaGrammar.from_string(grammar, verbose=False)
@@ -0,0 +1,194 @@
+import argparse
+from collections import namedtuple
+import re
+import time
+import metrics
+
+CITATION_PATTERN = re.compile(r"pasal\s+(\d+[a-z]?)(?:\s+ayat\s+\(?(\d+[a-z]?)\)?)?", re.IGNORECASE)
+# "UU 28 Tahun 2007", "UU Nomor 28 Tahun 2007", "Undang-Undang No. 7 Tahun 2021", "UU 28/2007"
+UU_PATTERN = re.compile(
+    r"(?:\buu|undang[\s-]+undang)\s*(?:nomor|nomer|no\.?)?\s*(\d+)\s*(?:tahun|thn\.?|th\.?|/)\s*(\d{4})",
+    re.IGNORECASE,
+)
+
+# "UU PPh", "Undang-Undang KUP", "UU PPN dan PPnBM" -> nomor/tahun UU di dataset
+NAMED_UU = {"kup": "28/2007", "pph": "36/2008", "ppn": "42/2009", "ppnbm": "42/2009", "hpp": "7/2021"}
+NAMED_UU_PATTERN = re.compile(r"(?:\buu|undang[\s-]+undang)\s+(kup|pph|ppnbm|ppn|hpp)\b", re.IGNORECASE)
+# "PPh Pasal 21", "PPN Pasal 16D": nama jenis pajak, bukan rujukan pasal UU
+TAX_TYPE_BEFORE = re.compile(r"\b(?:pph|ppn|ppnbm)\s*$", re.IGNORECASE)
+UU_BEFORE = re.compile(r"(?:\buu|undang)\s*$", re.IGNORECASE)
+
+Citation = namedtuple("Citation", ["uu", "pasal", "ayat"])
+
+
+# ===========================
+# PARSER SITASI
+# ===========================
+def normalize_number(value):
+    """'PASAL 7A' / 'Pasal 7a' / '(2)' -> '7a' / '2'."""
+    match = re.search(r"\d+[a-z]?", str(value).lower())
+    return match.group(0) if match else ""
+
+
+def find_uu(text):
+    """[(posisi, '28/2007'), ...] untuk setiap UU yang disebut (nomor/tahun atau nama) di `text`."""
+    found = [(m.start(), f"{int(m.group(1))}/{m.group(2)}") for m in UU_PATTERN.finditer(text)]
+    found += [(m.start(), NAMED_UU[m.group(1).lower()]) for m in NAMED_UU_PATTERN.finditer(text)]
+    return sorted(found)
+
+
+def normalize_uu(value):
+    """'UU Nomor 28 Tahun 2007' / 'UU 28/2007' / 'UU KUP' -> '28/2007'; '' bila tidak dikenali."""
+    found = find_uu(str(value or ""))
+    return found[0][1] if found else ""
+
+
+def find_pasal(text):
+    """
+    Match CITATION_PATTERN di `text`, kecuali nama jenis pajak seperti "PPh
+    Pasal 21" ("UU PPh Pasal 17" tetap rujukan pasal).
+    """
+    matches = []
+    for match in CITATION_PATTERN.finditer(text):
+        tax = TAX_TYPE_BEFORE.search(text, 0, match.start())
+        if tax is None or UU_BEFORE.search(text, 0, tax.start()):
+            matches.append(match)
+    return matches
+
+
+def parse_citations(answer):
+    """Daftar (pasal, ayat) yang disebut di jawaban; ayat '' bila tidak disebut."""
+    return [(m.group(1).lower(), (m.group(2) or "").lower()) for m in find_pasal(answer)]
+
+
+def parse_references(text):
+    """
+    Rujukan eksplisit di pertanyaan sebagai Citation(uu, pasal, ayat); uu/ayat
+    '' bila tidak disebut. UU dipasangkan dengan pasal sebelumnya ("Pasal 9
+    ayat 2 UU 28 Tahun 2007"); bila hanya ada satu UU, berlaku untuk semua pasal.
+    """
+    pasal_matches = find_pasal(text)
+    uu_matches = find_uu(text)
+    references = []
+    for i, match in enumerate(pasal_matches):
+        end = pasal_matches[i + 1].start() if i + 1 < len(pasal_matches) else len(text)
+        following = [uu for start, uu in uu_matches if match.end() <= start < end]
+        if following:
+            uu = following[0]
+        elif len(uu_matches) == 1:
+            uu = uu_matches[0][1]
+        else:
+            uu = ""
+        references.append(Citation(uu, match.group(1).lower(), (match.group(2) or "").lower()))
+    return references
+
+
+def citation_match(answer, metadatas):
+    """
+    Bandingkan sitasi di jawaban dengan metadata chunk yang di-retrieve.
+    Mengembalikan (ada_sitasi, pasal_cocok, pasal_ayat_cocok).
+    """
+    cited = parse_citations(answer)
+    retrieved = {(normalize_number(m.get("pasal")), normalize_number(m.get("ayat"))) for m in metadatas}
+    retrieved_pasal = {p for p, _ in retrieved}
+    pasal_ok = any(p in retrieved_pasal for p, _ in cited)
+    exact_ok = any((p, a) in retrieved for p, a in cited if a)
+    return bool(cited), pasal_ok, exact_ok
+
+
+def chunk_citation(metadata):
+    """Citation(uu, pasal, ayat) dari metadata chunk; field kosong dilengkapi dari 'sumber'."""
+    sumber = metadata.get("sumber", "")
+    from_sumber = parse_references(sumber)
+    pasal = normalize_number(metadata.get("pasal", "")) or (from_sumber[0].pasal if from_sumber else "")
+    ayat = normalize_number(metadata.get("ayat", "")) or (from_sumber[0].ayat if from_sumber else "")
+    uu = normalize_uu(metadata.get("uu", "")) or normalize_uu(sumber)
+    return Citation(uu, pasal, ayat)
+
+
+# ===========================
+# INDEX (UU, PASAL, AYAT) -> CHUNK
+# ===========================
+class CitationIndex:
+    """
+    Index in-memory (uu, pasal, ayat) -> chunk. Setiap chunk didaftarkan juga
+    dengan ayat dikosongkan, sehingga "Pasal 9 UU KUP" mengambil semua ayatnya
+    dengan satu lookup dict.
+
+    Args:
+        documents (list): Document chunk (page_content, metadata, id), urutan asli DB.
+    """
+
+    def __init__(self, documents):
+        self.documents = list(documents)
+        self.citations = [chunk_citation(doc.metadata) for doc in self.documents]
+        self.keys = {}
+        for position, (uu, pasal, ayat) in enumerate(self.citations):
+            if not pasal or not uu:
+                continue
+            for key in {(uu, pasal, ayat), (uu, pasal, "")}:
+                self.keys.setdefault(key, []).append(position)
+
+    @classmethod
+    def from_db(cls, db):
+        """Bangun dari semua chunk di Chroma / NumpyIndex."""
+        from retrieval_cache import load_documents_by_id
+
+        ids = db.get(include=[])["ids"]
+        return cls(doc for doc in load_documents_by_id(db, ids) if doc is not None)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, question, k):
+        """
+        [(doc, 0.0), ...] untuk rujukan eksplisit di `question`, urut seperti di
+        dokumen asli; None bila tidak ada rujukan, tidak ditemukan, atau ada
+        pasal tanpa UU yang disebut ("tarif Pasal 17?"), biar vector search yang memilih.
+        """
+        references = parse_references(question)
+        if not references or any(not ref.uu for ref in references):
+            return None
+        positions = []
+        for ref in references:
+            found = self.keys.get(ref, [])
+            positions.extend(p for p in found if p not in positions)
+        if not positions:
+            return None
+        # Skor 0.0 = cocok persis (skala jarak, lolos ambang format_context)
+        return [(self.documents[p], 0.0) for p in positions[:k]]
+
+    def timed_lookup(self, question, k):
+        with metrics.stage("citation_lookup"):
+            return self.lookup(question, k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Uji lookup sitasi langsung (Pasal/Ayat/UU) terhadap Chroma DB")
+    parser.add_argument("questions", nargs="+")
+    parser.add_argument("--chroma-path", default="database/chroma_uu_db_indo_v2")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    from langchain_chroma import Chroma
+
+    start = time.perf_counter()
+    index = CitationIndex.from_db(Chroma(persist_directory=args.chroma_path))
+    print(f"📚 {len(index)} kunci sitasi dari {len(index.documents)} chunk ({time.perf_counter() - start:.2f} detik)")
+
+    for question in args.questions:
+        start = time.perf_counter()
+        results = index.lookup(question, args.top_k)
+        micros = (time.perf_counter() - start) * 1e6
+        print(f"\n❓ {question}  ({micros:.0f} µs) -> {parse_references(question)}")
+        if results is None:
+            print("   ↪ tidak ada rujukan eksplisit / ambigu: fallback ke vector search")
+            continue
+        for doc, _ in results:
+            meta = doc.metadata
+            print(f"   📄 {meta.get('uu', '')} Pasal {meta.get('pasal', '')} Ayat {meta.get('ayat', '')}: "
+                  f"{doc.page_content.strip()[:80]}")
+
+
+if __name__ == "__main__":
+    main()
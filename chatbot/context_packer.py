@@ -0,0 +1,113 @@
+import copy
+from engine import format_chunk, CONTEXT_SEPARATOR
+
+# RecursiveCharacterTextSplitter di create_db.py memakai chunk_overlap=100
+MAX_OVERLAP_CHARS = 150
+MIN_OVERLAP_CHARS = 20
+
+
+def same_passage(a, b):
+    keys = ("uu", "pasal", "ayat", "sumber")
+    return all(a.metadata.get(k, "") == b.metadata.get(k, "") for k in keys)
+
+
+def overlap_length(left, right, max_chars=MAX_OVERLAP_CHARS, min_chars=MIN_OVERLAP_CHARS):
+    """Panjang suffix `left` yang sama dengan prefix `right` (0 jika tidak ada)."""
+    for n in range(min(max_chars, len(left), len(right)), min_chars - 1, -1):
+        if left.endswith(right[:n]):
+            return n
+    return 0
+
+
+def drop_overlaps(results):
+    """
+    Hapus teks yang terduplikasi antara chunk bertetangga dari ayat yang sama
+    (efek chunk_overlap splitter). Document asli tidak diubah.
+    """
+    texts = [doc.page_content.strip() for doc, _ in results]
+    for i in range(len(results)):
+        for j in range(i + 1, len(results)):
+            a, b = results[i][0], results[j][0]
+            if not same_passage(a, b):
+                continue
+            # Urutan asli di dokumen diketahui dari start_index (add_start_index=True)
+            start_a, start_b = a.metadata.get("start_index"), b.metadata.get("start_index")
+            if start_a is not None and start_b is not None:
+                pairs = [(i, j)] if start_a <= start_b else [(j, i)]
+            else:
+                pairs = [(i, j), (j, i)]
+            for left, right in pairs:
+                n = overlap_length(texts[left], texts[right])
+                if n:
+                    texts[right] = texts[right][n:].lstrip()
+                    break
+
+    packed = []
+    for (doc, score), text in zip(results, texts):
+        if text != doc.page_content.strip():
+            doc = copy.copy(doc)
+            doc.page_content = text
+        if text:
+            packed.append((doc, score))
+    return packed
+
+
+def chunk_cost(i, doc, score, count_tokens):
+    """Token satu chunk di prompt: blok konteks + label sumber."""
+    block, source = format_chunk(i, doc, score)
+    return count_tokens(block) + count_tokens(repr(source))
+
+
+def truncate_chunk(doc, score, count_tokens, budget):
+    """
+    Potong isi chunk (di batas kata) sampai biayanya muat di `budget` token.
+    Mengembalikan (doc_terpotong, token) atau None bila header chunk saja sudah tidak muat.
+    """
+    words = doc.page_content.strip().split(" ")
+
+    def cut(n):
+        trimmed = copy.copy(doc)
+        trimmed.page_content = " ".join(words[:n])
+        return trimmed
+
+    if chunk_cost(0, cut(0), score, count_tokens) > budget:
+        return None
+    # Cari jumlah kata terbanyak yang masih muat (biaya naik monoton terhadap jumlah kata)
+    low, high = 0, len(words)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if chunk_cost(0, cut(mid), score, count_tokens) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    if low == 0:
+        return None
+    trimmed = cut(low)
+    return trimmed, chunk_cost(0, trimmed, score, count_tokens)
+
+
+def pack_context(results, count_tokens, budget):
+    """
+    Masukkan chunk (urut relevansi) sebanyak mungkin ke dalam `budget` token.
+    Biaya tiap chunk = token blok konteks + label sumber + separator.
+    Bila tidak ada chunk utuh yang muat, chunk paling relevan dipotong sampai muat.
+    Mengembalikan (results_terpakai, token_terpakai); kosong bila budget terlalu kecil.
+    """
+    separator_tokens = count_tokens(CONTEXT_SEPARATOR)
+    candidates = drop_overlaps(results)
+    packed = []
+    used = 0
+    for doc, score in candidates:
+        cost = chunk_cost(len(packed), doc, score, count_tokens)
+        if packed:
+            cost += separator_tokens
+        if used + cost > budget:
+            continue
+        packed.append((doc, score))
+        used += cost
+    if not packed and candidates:
+        doc, score = candidates[0]
+        truncated = truncate_chunk(doc, score, count_tokens, budget)
+        if truncated is not None:
+            packed, used = [(truncated[0], score)], truncated[1]
+    return packed, used
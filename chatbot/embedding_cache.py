@@ -0,0 +1,271 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import numpy as np
+from cache_utils import path_signature
+
+EMBEDDING_CACHE_PATH = "database/embedding_cache"
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.sqlite3"
+META_FILE = "meta.json"
+# Batas parameter per query SQLite (SQLITE_MAX_VARIABLE_NUMBER lama = 999)
+LOOKUP_CHUNK = 500
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_revision(model_name):
+    """
+    Revisi embedding model untuk key cache: folder lokal -> signature ukuran +
+    mtime file-nya; id HuggingFace Hub -> commit di cache hub (refs/main).
+    None bila model hub belum ada di cache lokal (revisi tidak diketahui).
+    """
+    if os.path.isdir(model_name):
+        return "local-" + path_signature([model_name])[:16]
+    hub = os.environ.get("HF_HUB_CACHE") or os.path.join(
+        os.environ.get("HF_HOME", os.path.join(os.path.expanduser("~"), ".cache", "huggingface")), "hub"
+    )
+    ref = os.path.join(hub, "models--" + model_name.replace("/", "--"), "refs", "main")
+    if os.path.exists(ref):
+        with open(ref, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    return None
+
+
+# ===========================
+# STORE VEKTOR (MMAP + INDEX HASH -> BARIS)
+# ===========================
+class EmbeddingStore:
+    """
+    Cache embedding content-addressed di disk: satu folder per (model, revisi)
+    berisi vectors.f32 (float32 baris-per-baris, dibaca lewat mmap) dan
+    index.sqlite3 (hash teks -> nomor baris). Bisa dipakai bersama antar-proses:
+    penulisan diserialisasi dengan transaksi SQLite, file vektor hanya ditambah.
+
+    Args:
+        root (str): Folder induk cache.
+        model_name (str): Nama/path embedding model (bagian dari key).
+        revision (str): Opsional, revisi model; default model_revision(model_name).
+            ValueError bila revisi tidak diketahui: vektor revisi lama tidak boleh
+            terpakai ulang setelah model di-upgrade.
+    """
+
+    def __init__(self, root, model_name, revision=None):
+        self.model_name = model_name
+        self.revision = revision or model_revision(model_name)
+        if not self.revision:
+            raise ValueError(f"Revisi embedding model {model_name} tidak diketahui (belum ada di cache HuggingFace)")
+        key = hashlib.sha1(f"{model_name}\x00{self.revision}".encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(root, key)
+        meta_path = os.path.join(self.path, META_FILE)
+        if not os.path.exists(meta_path):
+            # Hanya saat folder baru dibuat; tmp + rename supaya pembaca lain tidak melihat file setengah jadi
+            os.makedirs(self.path, exist_ok=True)
+            tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"model_name": model_name, "revision": self.revision}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, meta_path)
+
+        self.vectors_path = os.path.join(self.path, VECTORS_FILE)
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+        self.vectors = None
+
+        self.conn = sqlite3.connect(os.path.join(self.path, INDEX_FILE), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS rows (hash TEXT PRIMARY KEY, row INTEGER)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+
+    @property
+    def dim(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        return int(row[0]) if row else None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def _rows(self, hashes):
+        found = {}
+        for start in range(0, len(hashes), LOOKUP_CHUNK):
+            chunk = hashes[start:start + LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self.conn.execute(f"SELECT hash, row FROM rows WHERE hash IN ({placeholders})", chunk))
+        return found
+
+    def _mapped(self, max_row, dim):
+        # Map ulang bila proses lain sudah menambah baris setelah mmap terakhir
+        if self.vectors is None or max_row >= len(self.vectors):
+            n_rows = os.path.getsize(self.vectors_path) // (dim * 4)
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n_rows, dim))
+        return self.vectors
+
+    def get_many(self, texts):
+        """Vektor (np.ndarray) per teks sesuai urutan `texts`; None untuk yang belum ada."""
+        hashes = [text_hash(text) for text in texts]
+        with self.lock:
+            found = self._rows(list(set(hashes)))
+            output = [None] * len(texts)
+            if found:
+                vectors = self._mapped(max(found.values()), self.dim)
+                for i, h in enumerate(hashes):
+                    if h in found:
+                        output[i] = np.array(vectors[found[h]])
+            hits = sum(v is not None for v in output)
+            self.stats["hits"] += hits
+            self.stats["misses"] += len(texts) - hits
+            return output
+
+    def put_many(self, texts, vectors):
+        """Tambahkan vektor untuk teks yang belum ada di store."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        with self.lock:
+            # BEGIN IMMEDIATE: satu penulis sekaligus (antar-proses) untuk nomor baris + file vektor
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                dim = self.dim
+                if dim is None:
+                    dim = vectors.shape[1]
+                    self.conn.execute("INSERT INTO meta VALUES ('dim', ?)", (str(dim),))
+                elif dim != vectors.shape[1]:
+                    raise ValueError(f"Dimensi embedding {vectors.shape[1]} != dimensi store {dim}")
+
+                known = self._rows([text_hash(text) for text in texts])
+                new_rows, new_vectors = {}, []
+                for text, vector in zip(texts, vectors):
+                    h = text_hash(text)
+                    if h not in known and h not in new_rows:
+                        new_rows[h] = len(new_rows)
+                        new_vectors.append(vector)
+                if new_vectors:
+                    n_rows = self.conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+                    # Tulis di offset baris (bukan append): sisa transaksi gagal sebelumnya ditimpa
+                    with open(self.vectors_path, "r+b" if os.path.exists(self.vectors_path) else "wb") as f:
+                        f.seek(n_rows * dim * 4)
+                        f.write(np.stack(new_vectors).astype(np.float32).tobytes())
+                    self.conn.executemany(
+                        "INSERT INTO rows VALUES (?, ?)", [(h, n_rows + i) for h, i in new_rows.items()]
+                    )
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+
+    def report(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "entries": len(self), "hit_rate": self.stats["hits"] / total if total else 0.0}
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# ===========================
+# WRAPPER EMBEDDINGS
+# ===========================
+class CachedEmbeddings:
+    """
+    Pengganti HuggingFaceEmbeddings (embed_documents/embed_query) yang memeriksa
+    EmbeddingStore dulu; hanya teks yang belum ada yang dikirim ke model.
+    Hanya teks dokumen/chunk yang disimpan: embed_query langsung ke model
+    (query pengguna tidak terbatas jumlahnya; hasil retrieval-nya sudah
+    di-cache retrieval_cache.py).
+
+    Args:
+        store (EmbeddingStore): Store vektor.
+        embeddings: Opsional, objek embeddings yang sudah dimuat.
+        load (callable): Opsional, pembuat objek embeddings; dipanggil saat cache
+            miss pertama, sehingga skrip yang semua teksnya sudah di cache (atau
+            tidak pernah meng-embed) tidak memuat model sama sekali.
+    """
+
+    def __init__(self, store, embeddings=None, load=None):
+        if embeddings is None and load is None:
+            raise ValueError("Butuh embeddings atau load")
+        self.store = store
+        self._embeddings = embeddings
+        self._load = load
+        # Teks yang benar-benar di-embed model (tanpa duplikat), untuk laju embedding
+        self.computed = 0
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            self._embeddings = self._load()
+        return self._embeddings
+
+    def lookup(self, texts):
+        """(vektor per teks atau None, indeks teks yang belum ada di cache)."""
+        vectors = self.store.get_many(texts)
+        return vectors, [i for i, v in enumerate(vectors) if v is None]
+
+    def remember(self, texts, vectors):
+        """Simpan vektor hasil model; `texts` = teks yang baru saja di-embed."""
+        self.store.put_many(texts, vectors)
+        self.computed += len(texts)
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        vectors, missing = self.lookup(texts)
+        if missing:
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            computed = self.embeddings.embed_documents(unique)
+            self.remember(unique, computed)
+            by_text = dict(zip(unique, computed))
+            for i in missing:
+                vectors[i] = by_text[texts[i]]
+        return [np.asarray(v, dtype=np.float32).tolist() for v in vectors]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+def cached_huggingface_embeddings(model_name, cache_dir=EMBEDDING_CACHE_PATH, model_kwargs=None, encode_kwargs=None, revision=None):
+    """
+    HuggingFaceEmbeddings di balik EmbeddingStore; model baru dimuat saat cache
+    miss pertama. Model hub yang belum ada di cache lokal dimuat (diunduh) lebih
+    dulu supaya revisinya diketahui sebelum store dibuka.
+    """
+    def load():
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model_name, model_kwargs=model_kwargs or {}, encode_kwargs=encode_kwargs or {})
+
+    embeddings = None
+    revision = revision or model_revision(model_name)
+    if revision is None:
+        embeddings = load()
+        revision = model_revision(model_name)
+    return CachedEmbeddings(EmbeddingStore(cache_dir, model_name, revision), embeddings=embeddings, load=load)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lihat isi cache embedding (per model + revisi)")
+    parser.add_argument("--cache-dir", default=EMBEDDING_CACHE_PATH)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.cache_dir):
+        print(f"⚠️ Cache embedding belum ada di {args.cache_dir}")
+        return
+    for key in sorted(os.listdir(args.cache_dir)):
+        meta_path = os.path.join(args.cache_dir, key, META_FILE)
+        if not os.path.exists(meta_path):
+            continue
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        store = EmbeddingStore(args.cache_dir, meta["model_name"], meta["revision"])
+        size = os.path.getsize(store.vectors_path) if os.path.exists(store.vectors_path) else 0
+        print(f"📚 {meta['model_name']} @ {meta['revision'][:16]}: {len(store)} vektor "
+              f"(dim {store.dim}, {size / 2**20:.1f} MB)")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
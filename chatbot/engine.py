@@ -0,0 +1,906 @@
+import time
+import metrics
+
+CHROMA_PATH = "database/chroma_uu_db_indo_v2"
+MODEL_PATH = "model/taxbot_v9_dpo_v2.gguf"
+#MODEL_PATH = "model/taxbot_v9.gguf"
+EMBEDDING_MODEL = "model/all-indo-e5-small-v4-matryoshka-v2"
+
+NO_ANSWER = "Maaf, saya tidak memiliki pemahaman tentang hal itu."
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+# Cadangan token untuk selisih tokenisasi di batas potongan prompt
+CONTEXT_MARGIN_TOKENS = 16
+# Sesi multi-turn: konteks retrieval per turn dibatasi fraksi n_ctx ini (409 token di n_ctx 2048),
+# supaya turn sebelumnya (konteks + jawaban) masih muat dan KV state sesi bisa dipakai ulang
+SESSION_CONTEXT_FRACTION = 0.2
+
+# Token akhir ChatML: generate berhenti di sini, bukan di max_tokens
+STOP_SEQUENCES = ["<|im_end|>", "<|im_start|>"]
+
+GENERATION_KWARGS = {
+    "max_tokens": 500,
+    "temperature": 0.2,
+    "top_p": 0.8,
+    "repeat_penalty": 1.2,
+    "stop": STOP_SEQUENCES,
+}
+
+
+# ===========================
+# FORMAT CHAT UNTUK LLAMA_CPP
+# ===========================
+def format_llama_cpp_chat(messages):
+    text = ""
+    for msg in messages:
+        role = msg["role"]
+        content = msg["content"]
+        text += f"<|im_start|>{role}\n{content}<|im_end|>\n"
+    text += "<|im_start|>assistant\n"
+    return text
+
+
+# ===========================
+# FORMAT CONTEXT HASIL RETRIEVAL
+# ===========================
+def format_chunk(i, doc, score):
+    """Format satu chunk menjadi (blok konteks, label sumber)."""
+    meta = doc.metadata
+    uu = meta.get("uu", "")
+    pasal = meta.get("pasal", "")
+    ayat = meta.get("ayat", "")
+    sumber = meta.get("sumber", "")
+    context = f"""
+Konteks {i+1}:
+{uu} {pasal} Ayat {ayat}
+(Sumber: {sumber}, Skor: {score:.2f})
+
+Isi dan/atau Penjelasan:
+{doc.page_content.strip()}
+            """
+    return context, f"UU {uu} Pasal {pasal} Ayat {ayat}"
+
+
+def format_context(results):
+    """
+    Ubah hasil similarity search [(doc, score), ...] menjadi
+    (structured_contexts, source_list, answer_type).
+    """
+    # Skor = jarak; pakai yang terkecil karena urutan hybrid (RRF) tidak selalu urut jarak
+    if len(results) == 0 or min(score for _, score in results) > 13:
+        return "Maaf, tidak ada data relevan.", ["none"], "none"
+
+    structured_contexts = []
+    source_list = []
+
+    for i, (doc, score) in enumerate(results):
+        context, source = format_chunk(i, doc, score)
+        structured_contexts.append(context)
+        source_list.append(source)
+
+    return structured_contexts, source_list, "true"
+
+
+# ===========================
+# PROMPT TEMPLATE RAG
+# ===========================
+def build_system_template(context, source):
+    return f"""Jawab pertanyaan berdasarkan konteks berikut:
+    {context}
+
+    Kamu adalah asisten ahli pajak Indonesia.
+    Jawaban harus faktual, to the point, dan menggunakan bahasa formal.
+    Jika informasi tidak ada dikonteks atau pertanyaan tidak berkaitan dengan pajak,
+    jawab: "Maaf, saya tidak memiliki pemahaman tentang hal itu."
+
+    Sumber konteks: {source}
+
+    Bila jawaban ditemukan dengan jelas di konteks:
+    - Sertakan sumber pasal di akhir kalimat dengan cara yang natural,
+    misalnya: "sesuai dengan Pasal {{pasal}} UU Nomor {{ayat}} Tahun {{tahun}}".
+    - Sertakan sumber hukum dengan format:
+    Source: Pasal {{pasal}} Ayat {{ayat}} UU {{uu}}.
+
+    Bila jawaban tidak ditemukan dengan jelas di konteks:
+    Gunakan FORMAT JAWABAN AKHIR berikut:
+
+    Sources Used:
+    [Daftar sumber UU yang digunakan (minimal 2)]
+
+    Summary:
+    [Rangkuman inti analisis]
+
+    PILIH SATU BAGIAN SAJA di bawah ini, lalu isi dengan teks yang relevan:
+
+    [[ Conclusion ]]
+    [Tulis kesimpulan, JIKA analisis berfokus pada ringkasan temuan
+    dan implikasi logis dari data yang ada.]
+
+    ATAU
+
+    [[ Recommendation ]]
+    [Tulis rekomendasi, JIKA analisis berfokus pada usulan aksi,
+    kebijakan, atau langkah perbaikan di masa depan.]
+    """
+
+
+# ===========================
+# PROMPT DENGAN PREFIX STATIS (KV CACHE)
+# ===========================
+# Instruksi tetap diletakkan paling depan agar semua request berbagi prefix
+# yang sama; KV state prefix ini dievaluasi sekali saat warmup dan dipulihkan
+# per request, sehingga prefill hanya untuk konteks + pertanyaan.
+SYSTEM_INSTRUCTIONS = """Kamu adalah asisten ahli pajak Indonesia.
+Jawaban harus faktual, to the point, dan menggunakan bahasa formal.
+Jika informasi tidak ada dikonteks atau pertanyaan tidak berkaitan dengan pajak,
+jawab: "Maaf, saya tidak memiliki pemahaman tentang hal itu."
+
+Bila jawaban ditemukan dengan jelas di konteks:
+- Sertakan sumber pasal di akhir kalimat dengan cara yang natural,
+misalnya: "sesuai dengan Pasal {pasal} UU Nomor {ayat} Tahun {tahun}".
+- Sertakan sumber hukum dengan format:
+Source: Pasal {pasal} Ayat {ayat} UU {uu}.
+
+Bila jawaban tidak ditemukan dengan jelas di konteks:
+Gunakan FORMAT JAWABAN AKHIR berikut:
+
+Sources Used:
+[Daftar sumber UU yang digunakan (minimal 2)]
+
+Summary:
+[Rangkuman inti analisis]
+
+PILIH SATU BAGIAN SAJA di bawah ini, lalu isi dengan teks yang relevan:
+
+[[ Conclusion ]]
+[Tulis kesimpulan, JIKA analisis berfokus pada ringkasan temuan
+dan implikasi logis dari data yang ada.]
+
+ATAU
+
+[[ Recommendation ]]
+[Tulis rekomendasi, JIKA analisis berfokus pada usulan aksi,
+kebijakan, atau langkah perbaikan di masa depan.]
+"""
+
+SYSTEM_PREFIX = f"<|im_start|>system\n{SYSTEM_INSTRUCTIONS}"
+
+
+def build_context_block(context, source):
+    return f"""
+Jawab pertanyaan berdasarkan konteks berikut:
+{context}
+
+Sumber konteks: {source}
+"""
+
+
+def common_prefix_length(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+# ===========================
+# ENGINE
+# ===========================
+class TaxbotEngine:
+    """
+    Menyimpan Llama, embedding model, dan Chroma DB selama proses hidup,
+    sehingga setiap pertanyaan tidak perlu memuat ulang model dan membuka DB.
+
+    Args:
+        model_path (str): Path file GGUF chatbot.
+        chroma_path (str): Path folder Chroma DB.
+        embedding_model (str): Nama/path embedding model HuggingFace.
+        n_ctx (int): Ukuran context window llama.cpp.
+        device (str): Device untuk Llama.
+        embedding_device (str): Device untuk embedding model.
+        generation_kwargs (dict): Override parameter generate (temperature, dll).
+        answer_cache (AnswerCache): Opsional, cache jawaban semantik (lihat answer_cache.py).
+        retrieval_cache (RetrievalCache): Opsional, cache embedding query + top-k
+            (lihat retrieval_cache.py).
+        pack_context (bool): Susun konteks berdasarkan budget token (lihat context_packer.py):
+            overlap antar chunk dibuang dan chunk dimasukkan selama muat di n_ctx.
+        context_budget (int): Budget token konteks; None = n_ctx - max_tokens - prompt tetap.
+        n_threads (int): Jumlah thread llama.cpp (None = default llama.cpp).
+        worker_pool (LlamaWorkerPool): Opsional, generate dijalankan di pool proses
+            (lihat worker_pool.py); proses ini hanya memuat tokenizer.
+        prefix_cache (bool): Pakai layout prompt dengan instruksi statis di depan dan
+            pulihkan KV state prefix tersebut per request. False = layout lama
+            (konteks di depan instruksi).
+        speculative_tokens (int): Jumlah token draft prompt-lookup decoding per langkah
+            (LlamaPromptLookupDecoding, lihat speculative.py); 0 = nonaktif. Efektif
+            karena jawaban banyak menyalin teks pasal dari konteks.
+        draft_model (LlamaDraftModel): Opsional, draft model lain (misalnya GGUF kecil)
+            yang menggantikan prompt-lookup decoding.
+        topic_gate (TopicGate): Opsional, gate sebelum retrieval (lihat topic_gate.py);
+            pertanyaan yang jelas di luar topik pajak langsung dijawab NO_ANSWER.
+        grammar (str): Opsional, batasi output dengan grammar GBNF: "citation"
+            (format jawaban + Source, lihat citation_grammar.py) atau teks GBNF.
+        session_store (SessionStore): Opsional, aktifkan percakapan multi-turn lewat
+            chat()/chat_stream() dengan KV state per sesi (lihat sessions.py).
+        vector_index (str): Opsional, folder index NumPy hasil export vector_index.py;
+            dipakai menggantikan Chroma (top-k eksak dengan satu matmul).
+        shortlist_dim (int): Opsional (butuh vector_index), pencarian dua tahap Matryoshka:
+            shortlist dari `shortlist_dim` dimensi pertama, rerank di dimensi penuh.
+        shortlist_size (int): Jumlah kandidat shortlist yang diskor ulang.
+        quantization (str): Opsional (butuh vector_index), "int8" atau "binary":
+            prefilter pada kode terkuantisasi lalu rescore float.
+        prefilter_size (int): Jumlah kandidat prefilter yang diskor ulang.
+        hybrid (bool): Gabungkan BM25 (index di folder Chroma, lihat bm25_index.py)
+            dengan vector search lewat reciprocal rank fusion.
+        bm25_path (str): Opsional, lokasi index BM25 (default: <chroma_path>/bm25_index.npz).
+        citation_lookup (bool): Pertanyaan yang menyebut Pasal/Ayat beserta UU-nya secara eksplisit
+            dijawab dari index sitasi in-memory tanpa embedding (lihat citation_index.py).
+        retrieval_batch_size (int): Jumlah query per panggilan embed/search di retrieve_many().
+        onnx_embedder (str): Opsional, folder hasil export onnx_embedder.py; query di-embed
+            dengan ONNX Runtime (int8 bila ada) menggantikan PyTorch.
+    """
+
+    def __init__(
+        self,
+        model_path=MODEL_PATH,
+        chroma_path=CHROMA_PATH,
+        embedding_model=EMBEDDING_MODEL,
+        n_ctx=2048,
+        device="cpu",
+        embedding_device="cpu",
+        generation_kwargs=None,
+        answer_cache=None,
+        retrieval_cache=None,
+        pack_context=True,
+        context_budget=None,
+        n_threads=None,
+        worker_pool=None,
+        prefix_cache=True,
+        speculative_tokens=0,
+        draft_model=None,
+        topic_gate=None,
+        grammar=None,
+        session_store=None,
+        vector_index=None,
+        shortlist_dim=None,
+        shortlist_size=100,
+        quantization=None,
+        prefilter_size=200,
+        hybrid=False,
+        bm25_path=None,
+        citation_lookup=True,
+        retrieval_batch_size=64,
+        onnx_embedder=None,
+    ):
+        self.model_path = model_path
+        self.chroma_path = chroma_path
+        self.embedding_model = embedding_model
+        self.n_ctx = n_ctx
+        self.device = device
+        self.embedding_device = embedding_device
+        self.generation_kwargs = {**GENERATION_KWARGS, **(generation_kwargs or {})}
+        self.prefix_cache = prefix_cache
+        self.answer_cache = answer_cache
+        self.retrieval_cache = retrieval_cache
+        self.pack_context = pack_context
+        self.context_budget = context_budget
+        self.n_threads = n_threads
+        self.worker_pool = worker_pool
+        self.speculative_tokens = speculative_tokens
+        self.draft_model = draft_model
+        self.topic_gate = topic_gate
+        self.grammar = grammar
+        self.session_store = session_store
+        self.vector_index = vector_index
+        self.shortlist_dim = shortlist_dim
+        self.shortlist_size = shortlist_size
+        self.quantization = quantization
+        self.prefilter_size = prefilter_size
+        self.hybrid = hybrid
+        self.bm25_path = bm25_path
+        self.citation_lookup = citation_lookup
+        self.retrieval_batch_size = retrieval_batch_size
+        self.onnx_embedder = onnx_embedder
+
+        self.llm = None
+        self.draft_counter = None
+        self.llama_grammar = None
+        self.prefix_tokens = []
+        self.prefix_state = None
+        self.embedding_function = None
+        self.db = None
+        self.bm25 = None
+        self.bm25_executor = None
+        self.citation_index = None
+
+        self.startup_timings = {}
+        self.last_generation_stats = {}
+        self.cold_request_seconds = None
+        self.warm_request_seconds = []
+
+    @property
+    def is_ready(self):
+        return self.llm is not None and self.db is not None
+
+    def warmup(self):
+        """
+        Muat Llama, embedding model, dan Chroma DB sekali saja, lalu jalankan
+        satu query dummy agar index HNSW dan forward pertama embedder sudah panas.
+        Mengembalikan dict waktu (detik) per tahap.
+        """
+        if self.is_ready:
+            return self.startup_timings
+
+        start = time.perf_counter()
+        self.load_llm()
+        self.load_retriever()
+        self.startup_timings["total"] = time.perf_counter() - start
+        return self.startup_timings
+
+    def load_llm(self):
+        """
+        Muat Llama (+ prime prefix KV cache). Dengan worker_pool, proses ini hanya
+        memuat vocab GGUF untuk tokenisasi; generate dilakukan oleh worker.
+        """
+        if self.llm is not None:
+            return
+        # Import berat (torch, chromadb, llama_cpp) baru dilakukan di sini
+        # supaya modul ini bisa diimport tanpa memuat model.
+        from llama_cpp import Llama
+        from speculative import build_draft_model
+        from citation_grammar import load_grammar
+
+        start = time.perf_counter()
+        vocab_only = self.worker_pool is not None
+        if not vocab_only:
+            self.draft_counter = build_draft_model(self.speculative_tokens, self.draft_model)
+            self.llama_grammar = load_grammar(self.grammar)
+        self.llm = Llama(
+            model_path=self.model_path,
+            n_ctx=self.n_ctx,
+            n_threads=self.n_threads,
+            vocab_only=vocab_only,
+            draft_model=self.draft_counter,
+            verbose=False,
+            device=self.device
+        )
+        if self.prefix_cache and self.worker_pool is None:
+            self.prime_prefix()
+        self.startup_timings["load_llm"] = time.perf_counter() - start
+
+    def load_retriever(self):
+        """Muat embedding model dan buka Chroma DB (atau index NumPy bila vector_index diset)."""
+        if self.db is not None:
+            return
+        start = time.perf_counter()
+        if self.onnx_embedder:
+            from onnx_embedder import OnnxEmbeddings
+            self.embedding_function = OnnxEmbeddings(self.onnx_embedder)
+        else:
+            from langchain_huggingface import HuggingFaceEmbeddings
+            self.embedding_function = HuggingFaceEmbeddings(
+                model_name=self.embedding_model,
+                model_kwargs={"device": self.embedding_device}
+            )
+        t_embedder = time.perf_counter()
+
+        if self.vector_index:
+            from vector_index import NumpyIndex
+            self.db = NumpyIndex(
+                self.vector_index,
+                self.embedding_function,
+                chroma_path=self.chroma_path,
+                shortlist_dim=self.shortlist_dim,
+                shortlist_size=self.shortlist_size,
+                quantization=self.quantization,
+                prefilter_size=self.prefilter_size,
+            )
+        else:
+            from langchain_chroma import Chroma
+            self.db = Chroma(persist_directory=self.chroma_path, embedding_function=self.embedding_function)
+        self.db.similarity_search_with_score("pajak", k=1)
+        t_db = time.perf_counter()
+
+        self.startup_timings["load_embedder"] = t_embedder - start
+        self.startup_timings["open_db"] = t_db - t_embedder
+
+        if self.hybrid:
+            from concurrent.futures import ThreadPoolExecutor
+            from bm25_index import BM25Index, bm25_path
+            self.bm25 = BM25Index.load(self.bm25_path or bm25_path(self.chroma_path))
+            # Satu thread: BM25 berjalan selama query di-embed di thread pemanggil
+            self.bm25_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bm25")
+            self.startup_timings["load_bm25"] = time.perf_counter() - t_db
+
+        if self.citation_lookup:
+            from citation_index import CitationIndex
+            t_citation = time.perf_counter()
+            self.citation_index = CitationIndex.from_db(self.db)
+            self.startup_timings["build_citation_index"] = time.perf_counter() - t_citation
+
+    def prime_prefix(self):
+        """
+        Evaluasi SYSTEM_PREFIX sekali dan simpan KV state-nya (llama.cpp save_state).
+        """
+        start = time.perf_counter()
+        self.prefix_tokens = self.llm.tokenize(SYSTEM_PREFIX.encode("utf-8"), special=True)
+        self.llm.reset()
+        self.llm.eval(self.prefix_tokens)
+        self.prefix_state = self.llm.save_state()
+        self.startup_timings["prefill_prefix"] = time.perf_counter() - start
+        self.startup_timings["prefix_tokens"] = len(self.prefix_tokens)
+
+    def restore_prefix(self):
+        """
+        Pastikan KV cache diawali prefix statis. Bila request sebelumnya sudah
+        memakai prefix yang sama, llama.cpp otomatis memakai ulang prefix
+        tersebut; load_state hanya dibutuhkan bila KV sudah tertimpa.
+        """
+        if self.prefix_state is None:
+            return
+        n_prefix = len(self.prefix_tokens)
+        if self.llm.n_tokens >= n_prefix and list(self.llm.input_ids[:n_prefix]) == self.prefix_tokens:
+            return
+        self.llm.load_state(self.prefix_state)
+
+    def close(self):
+        """Lepaskan Llama dan referensi DB/embedder."""
+        if self.llm is not None:
+            try:
+                self.llm.close()
+            except Exception:
+                pass
+        self.llm = None
+        self.prefix_state = None
+        self.db = None
+        self.embedding_function = None
+        self.bm25 = None
+        self.citation_index = None
+        if self.bm25_executor is not None:
+            self.bm25_executor.shutdown(wait=False)
+            self.bm25_executor = None
+        if self.worker_pool is not None:
+            self.worker_pool.close()
+        if self.answer_cache is not None:
+            self.answer_cache.close()
+        if self.retrieval_cache is not None:
+            self.retrieval_cache.close()
+
+    def __enter__(self):
+        self.warmup()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def is_off_topic(self, question):
+        """True bila topic gate menilai pertanyaan jelas di luar topik pajak."""
+        if self.topic_gate is None:
+            return False
+        with metrics.stage("gate"):
+            return self.topic_gate.is_off_topic(question)
+
+    def retrieve(self, query, top_k=3, citation_query=None):
+        """
+        Embed query sekali lalu cari di Chroma dengan vektor tersebut.
+        Mengembalikan (query_embedding, [(doc, score), ...]) agar embedding
+        bisa dipakai ulang (misalnya oleh answer cache).
+        Bila pertanyaan menyebut Pasal/Ayat/UU yang ada di index sitasi, chunk
+        itu dikembalikan langsung tanpa embedding (query_embedding = None).
+        `citation_query` (default: query) adalah teks yang diperiksa rujukannya.
+        """
+        self.load_retriever()
+        if citation_query is None:
+            citation_query = query
+        direct = self.citation_index.timed_lookup(citation_query, top_k) if self.citation_index is not None else None
+        if direct is not None:
+            return None, direct
+        if self.bm25 is not None:
+            from bm25_index import hybrid_search
+            return hybrid_search(
+                self.db, self.embedding_function, self.bm25, query, top_k,
+                cache=self.retrieval_cache, executor=self.bm25_executor,
+            )
+        from retrieval_cache import cached_similarity_search
+        return cached_similarity_search(self.db, self.embedding_function, query, top_k, cache=self.retrieval_cache)
+
+    def retrieve_many(self, queries, top_k=3, batch_size=None):
+        """
+        Versi batch dari retrieve(): satu panggilan embed_documents dan satu
+        query Chroma untuk semua query (yang belum ada di retrieval cache).
+        Query dengan rujukan Pasal/Ayat/UU eksplisit dijawab dari index sitasi.
+        `batch_size` membatasi jumlah query per panggilan embed/search (default: retrieval_batch_size).
+        """
+        self.load_retriever()
+        output = [None] * len(queries)
+        if self.citation_index is not None:
+            for i, query in enumerate(queries):
+                direct = self.citation_index.timed_lookup(query, top_k)
+                if direct is not None:
+                    output[i] = (None, direct)
+        pending = [i for i, item in enumerate(output) if item is None]
+        if not pending:
+            return output
+
+        pending_queries = [queries[i] for i in pending]
+        batch_size = batch_size or self.retrieval_batch_size
+        if self.bm25 is not None:
+            from bm25_index import hybrid_search_many
+            retrieved = hybrid_search_many(
+                self.db, self.embedding_function, self.bm25, pending_queries, top_k,
+                cache=self.retrieval_cache, executor=self.bm25_executor, batch_size=batch_size,
+            )
+        else:
+            from retrieval_cache import cached_similarity_search_many
+            retrieved = cached_similarity_search_many(
+                self.db, self.embedding_function, pending_queries, top_k,
+                cache=self.retrieval_cache, batch_size=batch_size,
+            )
+        for i, item in zip(pending, retrieved):
+            output[i] = item
+        return output
+
+    def build_context(self, query, top_k=3):
+        _, results = self.retrieve(query, top_k=top_k)
+        return self.format_results(query, results)
+
+    def build_contexts(self, queries, top_k=3, batch_size=None):
+        """
+        Versi batch build_context(): satu retrieve_many() untuk semua query.
+        List (structured_contexts, source_list, answer_type) sesuai urutan `queries`.
+        """
+        retrieved = self.retrieve_many(queries, top_k=top_k, batch_size=batch_size)
+        return [self.format_results(query, results) for query, (_, results) in zip(queries, retrieved)]
+
+    def count_tokens(self, text):
+        self.load_llm()
+        return len(self.llm.tokenize(text.encode("utf-8"), add_bos=False, special=True))
+
+    def budget_for(self, question, max_tokens=None):
+        """Token yang tersisa untuk konteks setelah prompt tetap + jatah jawaban."""
+        if self.context_budget is not None:
+            return self.context_budget
+        max_tokens = max_tokens or self.generation_kwargs["max_tokens"]
+        fixed = self.count_tokens(self.build_prompt(question, "", []))
+        return self.n_ctx - max_tokens - fixed - CONTEXT_MARGIN_TOKENS
+
+    def format_results(self, question, results, max_tokens=None, budget=None):
+        """
+        Seperti format_context(), tetapi bila pack_context aktif (atau `budget`
+        diberikan) konteks disusun agar prompt + max_tokens tidak melebihi n_ctx.
+        """
+        with metrics.stage("format"):
+            packing = self.pack_context or budget is not None
+            if not packing or self.llm is None or len(results) == 0 or min(score for _, score in results) > 13:
+                return format_context(results)
+
+            from context_packer import pack_context
+            if budget is None:
+                budget = self.budget_for(question, max_tokens)
+            packed, _ = pack_context(results, self.count_tokens, budget)
+            # Budget habis (mis. riwayat sesi panjang): lebih baik "none" daripada prompt melebihi n_ctx
+            return format_context(packed)
+
+    def lookup_answer(self, embedding, results, generation_kwargs=None):
+        """
+        Cari jawaban di answer cache. Hanya dipakai untuk parameter generate default,
+        karena jawaban dengan temperature/max_tokens lain tidak setara.
+        """
+        # embedding None = hasil lookup sitasi langsung (tanpa embedding query)
+        if self.answer_cache is None or generation_kwargs or embedding is None:
+            return None
+        from answer_cache import chunk_ids
+        cached = self.answer_cache.get(embedding, chunk_ids(results))
+        return cached["answer"] if cached else None
+
+    def store_answer(self, question, embedding, results, answer, generation_kwargs=None):
+        if self.answer_cache is None or generation_kwargs or embedding is None:
+            return
+        from answer_cache import chunk_ids
+        self.answer_cache.put(question, embedding, chunk_ids(results), answer)
+
+    def build_prompt(self, question, context, source):
+        if self.prefix_cache:
+            system = SYSTEM_INSTRUCTIONS + build_context_block(context, source)
+        else:
+            system = build_system_template(context, source)
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": question}
+        ]
+        return format_llama_cpp_chat(messages)
+
+    def infer(self, question, context, source, stats=None, **generation_kwargs):
+        """
+        Jalankan LLaMA dengan prompt RAG. `generation_kwargs` menimpa default engine.
+        Jika `stats` (dict) diberikan, diisi dengan statistik generate.
+        Memakai jalur streaming agar prefill (TTFT) dan decode bisa diukur terpisah.
+        """
+        return "".join(self.infer_stream(question, context, source, stats=stats, **generation_kwargs)).strip()
+
+    def infer_stream(self, question, context, source, stats=None, **generation_kwargs):
+        """
+        Versi streaming dari infer(): yield potongan teks begitu token dihasilkan
+        llama.cpp (stream=True). Setelah generator habis, `stats` berisi
+        time-to-first-token dan kecepatan decode. Dengan worker_pool, jawaban
+        dikirim utuh sebagai satu potongan.
+        """
+        if self.worker_pool is not None:
+            stats = {} if stats is None else stats
+            yield self.worker_pool.infer(question, context, source, stats=stats, **generation_kwargs)
+            self._trace_generation(stats)
+            return
+
+        self.load_llm()
+        prompt = self.build_prompt(question, context, source)
+        for i, text in enumerate(self.generate_stream(prompt, stats, **generation_kwargs)):
+            if i == 0:
+                text = text.lstrip()
+            if text:
+                yield text
+
+    def generate_stream(self, prompt, stats=None, session_state=None, **generation_kwargs):
+        """
+        Generate streaming untuk prompt yang sudah jadi (teks mentah per token).
+        KV cache disiapkan dari `session_state` (sesi multi-turn) atau prefix statis;
+        llama.cpp lalu hanya mengevaluasi token setelah prefix yang sama.
+        """
+        with metrics.stage("tokenize"):
+            tokens = self.llm.tokenize(prompt.encode("utf-8"), special=True)
+
+        start = time.perf_counter()
+        draft_snapshot = self.draft_counter.snapshot() if self.draft_counter else None
+        if session_state is not None:
+            self.llm.load_state(session_state)
+        elif self.prefix_cache:
+            self.restore_prefix()
+        reused = common_prefix_length(self.llm.input_ids[:self.llm.n_tokens], tokens)
+
+        first_token = None
+        n_tokens = 0
+        kwargs = {**self.generation_kwargs, **generation_kwargs}
+        if self.llama_grammar is not None:
+            kwargs.setdefault("grammar", self.llama_grammar)
+        for chunk in self.llm(tokens, stream=True, **kwargs):
+            if first_token is None:
+                first_token = time.perf_counter()
+            n_tokens += 1
+            yield chunk["choices"][0]["text"]
+        end = time.perf_counter()
+
+        self._record_generation(stats, start, first_token, end, n_tokens, len(tokens), draft_snapshot)
+        if stats is not None:
+            stats["reused_prompt_tokens"] = reused
+
+    def _record_generation(self, stats, start, first_token, end, n_tokens, prompt_tokens=None, draft_snapshot=None):
+        """
+        Hitung TTFT (termasuk prefill) dan decode tokens/s untuk satu request.
+        Tanpa streaming, TTFT tidak diketahui dan tokens/s dihitung dari total waktu.
+        Dengan speculative decoding, ditambah jumlah token draft dan acceptance rate.
+        """
+        if first_token is not None:
+            decode_seconds = end - first_token
+            decode_tokens = max(n_tokens - 1, 0)
+        else:
+            decode_seconds = end - start
+            decode_tokens = n_tokens
+
+        result = {
+            "time_to_first_token": first_token - start if first_token is not None else None,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": n_tokens,
+            "decode_seconds": decode_seconds,
+            "decode_tokens_per_second": decode_tokens / decode_seconds if decode_seconds > 0 else 0.0,
+            "generation_seconds": end - start,
+        }
+        if draft_snapshot is not None:
+            result.update(self.draft_counter.since(draft_snapshot, n_tokens))
+        self.last_generation_stats = result
+        if stats is not None:
+            stats.update(result)
+        self._trace_generation(result)
+        return result
+
+    @staticmethod
+    def _trace_generation(stats):
+        """Teruskan prefill/decode ke trace request aktif (lihat metrics.py)."""
+        if not stats:
+            return
+        if stats.get("time_to_first_token") is not None:
+            metrics.record("prefill", stats["time_to_first_token"], tokens=stats.get("prompt_tokens") or 0)
+        decode_tokens = round(stats["decode_tokens_per_second"] * stats["decode_seconds"])
+        metrics.record("decode", stats["decode_seconds"], tokens=decode_tokens)
+
+    def answer(self, question, top_k=3, **generation_kwargs):
+        """
+        Pipeline lengkap: retrieval -> (answer cache) -> inferensi. Mengembalikan
+        dict berisi jawaban, konteks, sumber, dan waktu per tahap. `stages` berisi
+        waktu + memori per tahap dari trace request (lihat metrics.py).
+        """
+        self.warmup()
+        with metrics.request_trace("answer") as trace:
+            result = self._answer(question, top_k, **generation_kwargs)
+        result["stages"] = trace.stages
+        return result
+
+    def _answer(self, question, top_k=3, **generation_kwargs):
+        start = time.perf_counter()
+
+        if self.is_off_topic(question):
+            end = time.perf_counter()
+            self.record_request(end - start)
+            return {
+                "question": question,
+                "answer": NO_ANSWER,
+                "context": [],
+                "source": [],
+                "answer_type": "none",
+                "off_topic": True,
+                "cache_hit": False,
+                "timings": {"gate": end - start, "retrieval": 0.0, "generation": 0.0, "total": end - start},
+                "generation_stats": {},
+            }
+
+        embedding, results = self.retrieve(question, top_k=top_k)
+        context, source, answer_type = self.format_results(question, results, generation_kwargs.get("max_tokens"))
+        t_retrieval = time.perf_counter()
+
+        generation = {}
+        cache_hit = False
+        if answer_type != "none":
+            response = self.lookup_answer(embedding, results, generation_kwargs)
+            cache_hit = response is not None
+            if not cache_hit:
+                response = self.infer(question, CONTEXT_SEPARATOR.join(context), source, stats=generation, **generation_kwargs)
+                self.store_answer(question, embedding, results, response, generation_kwargs)
+        else:
+            response = NO_ANSWER
+        end = time.perf_counter()
+
+        timings = {
+            "retrieval": t_retrieval - start,
+            "generation": end - t_retrieval,
+            "total": end - start,
+        }
+        self.record_request(timings["total"])
+
+        return {
+            "question": question,
+            "answer": response,
+            "context": context,
+            "source": source,
+            "answer_type": answer_type,
+            "off_topic": False,
+            "cache_hit": cache_hit,
+            "timings": timings,
+            "generation_stats": generation,
+        }
+
+    # ---------- MULTI-TURN ----------
+    @staticmethod
+    def build_chat_message(question, context, source):
+        """Pesan user satu turn: konteks hasil retrieval + pertanyaan."""
+        return build_context_block(context, source) + f"\nPertanyaan: {question}"
+
+    def build_chat_prompt(self, turns, user_message):
+        """
+        Prompt multi-turn. Instruksi statis di system, konteks per turn di pesan
+        user, sehingga prompt turn sebelumnya selalu menjadi prefix turn berikutnya.
+        """
+        messages = [{"role": "system", "content": SYSTEM_INSTRUCTIONS}]
+        for turn in turns:
+            messages.append({"role": "user", "content": turn["user"]})
+            messages.append({"role": "assistant", "content": turn["answer"]})
+        messages.append({"role": "user", "content": user_message})
+        return format_llama_cpp_chat(messages)
+
+    @property
+    def session_context_tokens(self):
+        """Batas token konteks retrieval per turn percakapan."""
+        return int(self.n_ctx * SESSION_CONTEXT_FRACTION)
+
+    def fit_history(self, turns, question, max_tokens):
+        """Sliding window: buang turn tertua sampai riwayat + konteks satu turn + jawaban muat di n_ctx."""
+        turns = list(turns)
+        while turns:
+            fixed = self.count_tokens(self.build_chat_prompt(turns, self.build_chat_message(question, "", [])))
+            if fixed + self.session_context_tokens + max_tokens + CONTEXT_MARGIN_TOKENS <= self.n_ctx:
+                break
+            turns.pop(0)
+        return turns
+
+    def chat_stream(self, session_id, question, top_k=5, stats=None, info=None, **generation_kwargs):
+        """
+        Satu turn percakapan multi-turn (streaming). KV state sesi dipulihkan
+        sebelum generate sehingga hanya token turn baru yang dievaluasi.
+        `info` (dict) diisi context, source, answer_type, dan jumlah turn riwayat.
+        """
+        if self.session_store is None or self.worker_pool is not None:
+            raise ValueError("chat butuh session_store dan KV cache lokal (tanpa worker_pool)")
+        self.warmup()
+        info = {} if info is None else info
+        session = self.session_store.get(session_id)
+
+        # Follow-up pendek ("bagaimana dengan badan?") dinilai dan dicari bersama pertanyaan sebelumnya
+        previous = session.turns[-1]["question"] if session.turns else ""
+        query = f"{previous} {question}".strip()
+        if self.is_off_topic(query):
+            info.update({"context": [], "source": [], "answer_type": "none", "off_topic": True, "history_turns": len(session.turns)})
+            yield NO_ANSWER
+            return
+
+        # Rujukan Pasal/UU hanya diambil dari pertanyaan saat ini, bukan dari turn sebelumnya
+        _, results = self.retrieve(query, top_k=top_k, citation_query=question)
+
+        max_tokens = generation_kwargs.get("max_tokens") or self.generation_kwargs["max_tokens"]
+        turns = self.fit_history(session.turns, question, max_tokens)
+        fixed = self.count_tokens(self.build_chat_prompt(turns, self.build_chat_message(question, "", [])))
+        # Konteks tiap turn ikut tersimpan di riwayat: dibatasi agar turn berikutnya tidak membuang riwayat
+        budget = min(self.n_ctx - max_tokens - fixed - CONTEXT_MARGIN_TOKENS, self.session_context_tokens)
+        context, source, answer_type = self.format_results(question, results, max_tokens, budget=budget)
+        info.update({
+            "context": context if answer_type != "none" else [],
+            "source": source if answer_type != "none" else [],
+            "answer_type": answer_type,
+            "off_topic": False,
+            "history_turns": len(turns),
+        })
+        if answer_type == "none":
+            yield NO_ANSWER
+            return
+
+        user_message = self.build_chat_message(question, CONTEXT_SEPARATOR.join(context), source)
+        prompt = self.build_chat_prompt(turns, user_message)
+        # Bila riwayat dipangkas, prefix berubah dan KV state lama tidak berguna
+        state = self.session_store.load_state(session) if len(turns) == len(session.turns) else None
+
+        pieces = []
+        for i, text in enumerate(self.generate_stream(prompt, stats, session_state=state, **generation_kwargs)):
+            pieces.append(text)
+            if i == 0:
+                text = text.lstrip()
+            if text:
+                yield text
+
+        # Jawaban disimpan mentah (tanpa strip) supaya tokenisasinya sama dengan isi KV cache
+        session.turns = turns + [{"question": question, "user": user_message, "answer": "".join(pieces)}]
+        self.session_store.save_state(session, self.llm.save_state())
+
+    def chat(self, session_id, question, top_k=5, **generation_kwargs):
+        """Versi non-streaming dari chat_stream(); mengembalikan dict seperti answer()."""
+        self.warmup()
+        generation = {}
+        info = {}
+        start = time.perf_counter()
+        with metrics.request_trace("chat") as trace:
+            response = "".join(self.chat_stream(session_id, question, top_k, generation, info, **generation_kwargs)).strip()
+        total = time.perf_counter() - start
+        self.record_request(total)
+        return {
+            "session_id": session_id,
+            "question": question,
+            "answer": response,
+            **info,
+            "cache_hit": False,
+            "timings": {"total": total},
+            "generation_stats": generation,
+            "stages": trace.stages,
+        }
+
+    def record_request(self, seconds):
+        if self.cold_request_seconds is None:
+            self.cold_request_seconds = seconds
+        else:
+            self.warm_request_seconds.append(seconds)
+
+    def timing_report(self):
+        """
+        Ringkasan waktu cold start (load model + request pertama) vs request warm.
+        """
+        warm = self.warm_request_seconds
+        return {
+            "startup": self.startup_timings,
+            "cold_request": self.cold_request_seconds,
+            "warm_requests": len(warm),
+            "warm_request_avg": sum(warm) / len(warm) if warm else None,
+        }
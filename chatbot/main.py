@@ -1,163 +1,202 @@
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from llama_cpp import Llama
-from tqdm import tqdm
+from engine import TaxbotEngine, NO_ANSWER, CONTEXT_SEPARATOR
+from answer_cache import AnswerCache
+from retrieval_cache import RetrievalCache
+from topic_gate import load_topic_gate
+from sessions import SessionStore
+from bm25_index import bm25_path
+import metrics
+import os
 import time
 
 CHROMA_PATH = "database/chroma_uu_db_indo_v2"
 #CHROMA_PATH = "chatbot/database/chroma_uu_db_indo_v2"
+MODEL_PATH = "model/taxbot_v9_dpo_v2.gguf"
+#MODEL_PATH = "model/taxbot_v9.gguf"
+#MODEL_PATH = "chatbot/model/taxbot_v9.gguf"
+# Bandingkan varian/kuantisasi GGUF: python benchmark_gguf.py model/taxbot_v9.gguf model/taxbot_v9_dpo_v2.gguf
+EMBEDDING_MODEL = "model/all-indo-e5-small-v4-matryoshka-v2"
+#EMBEDDING_MODEL = "chatbot/model/all-indo-e5-small-v4-matryoshka-v2"
+# Hasil `python onnx_embedder.py`; bila ada, query di-embed dengan ONNX Runtime (int8) tanpa PyTorch
+ONNX_EMBEDDER_PATH = "model/all-indo-e5-small-v4-matryoshka-v2-onnx"
+ONNX_EMBEDDER = ONNX_EMBEDDER_PATH if os.path.exists(ONNX_EMBEDDER_PATH) else None
+ANSWER_CACHE_PATH = "database/answer_cache.sqlite3"
+RETRIEVAL_CACHE_PATH = "database/retrieval_cache.sqlite3"
+# Hasil `python topic_gate.py ...`; bila belum ada, topic gate nonaktif
+TOPIC_GATE_PATH = "model/topic_gate.json"
+# Log JSON waktu/memori per tahap (satu baris per pertanyaan) + dump Prometheus saat keluar
+METRICS_LOG_PATH = "metrics.jsonl"
+METRICS_PROM_PATH = "metrics.prom"
+# Hasil `python vector_index.py`; bila ada, dipakai menggantikan Chroma untuk retrieval
+VECTOR_INDEX_PATH = "database/numpy_index"
+# Pencarian dua tahap Matryoshka di index NumPy: shortlist 64/128 dim, rerank 384 dim (None = eksak penuh)
+SHORTLIST_DIM = None
+SHORTLIST_SIZE = 100
+# Prefilter terkuantisasi di index NumPy: "int8", "binary" (Hamming) atau None; lalu rescore float
+QUANTIZATION = None
+PREFILTER_SIZE = 200
+# Hybrid BM25 + dense (RRF); aktif bila index BM25 (create_db.py / bm25_index.py) ada di folder Chroma
+HYBRID = os.path.exists(bm25_path(CHROMA_PATH))
+# Pertanyaan yang menyebut Pasal/Ayat beserta UU-nya ("Pasal 9 UU KUP") langsung diambil dari index sitasi (tanpa embedding)
+CITATION_LOOKUP = True
+# KV state sesi yang keluar dari memori (LRU) disimpan di sini
+SESSION_SPILL_DIR = "database/sessions"
+
+STREAM = True
+# Percakapan multi-turn: pertanyaan lanjutan memakai riwayat + KV cache sesi ("reset" = mulai baru).
+# Jalur chat tidak memakai cache jawaban dan tidak mencetak context, jadi default tetap single-turn
+MULTI_TURN = False
+SESSION_ID = "cli"
+# Prompt-lookup speculative decoding: jumlah token draft per langkah (0 = nonaktif)
+SPECULATIVE_TOKENS = 0
+# Grammar GBNF untuk format jawaban ("citation" = jawaban + satu baris Source); None = bebas
+GRAMMAR = None
+# Kandidat chunk yang diambil; yang dipakai ditentukan budget token n_ctx
+TOP_K = 5
+
+answer_cache = AnswerCache(
+    threshold=0.95,
+    max_entries=512,
+    db_path=ANSWER_CACHE_PATH,
+    # Jawaban bergantung pada model, DB/index yang melayani retrieval, dan embedder query
+    watch_paths=[MODEL_PATH, CHROMA_PATH, VECTOR_INDEX_PATH, EMBEDDING_MODEL, ONNX_EMBEDDER_PATH],
+)
 
-llm = Llama(
-    model_path="model/taxbot_v9_dpo_v2.gguf",
-    #model_path="model/taxbot_v9.gguf",
-    #model_path="chatbot/model/taxbot_v9.gguf",
-    n_ctx=2048,
-    verbose=False,
-    device = "cpu"
+retrieval_cache = RetrievalCache(
+    # Vektor ONNX int8 sedikit berbeda dari PyTorch: cache dipisah per backend
+    model_name=ONNX_EMBEDDER or EMBEDDING_MODEL,
+    watch_paths=[CHROMA_PATH],
+    db_path=RETRIEVAL_CACHE_PATH,
+    max_entries=2048,
 )
 
-def format_llama_cpp_chat(messages):
-    text = ""
-    for msg in messages:
-        role = msg["role"]
-        content = msg["content"]
-        text += f"<|im_start|>{role}\n{content}<|im_end|>\n"
-    text += "<|im_start|>assistant\n"
-    return text
-
-def build_context_from_db(db, query, top_k=5):
-    """
-    Ambil dokumen relevan dari Chroma DB + hitung skor rata-rata
-    """
-    
-    results = db.similarity_search_with_score(query, k=top_k)
-    if len(results) == 0 or results[0][1] > 13:
-        return "Maaf, tidak ada data relevan.", ["none"], "none"
-
-    structured_contexts = []
-    source_list = []
-
-    for i, (doc, score) in enumerate(results):
-        meta = doc.metadata
-        uu = meta.get("uu", "")
-        pasal = meta.get("pasal", "")
-        ayat = meta.get("ayat", "")
-        sumber = meta.get("sumber", "")
-        structured_contexts.append(
-            f"""
-            Konteks {i+1}:
-            {uu} {pasal} Ayat {ayat}
-            (Sumber: {sumber}, Skor: {score:.2f})
-
-            Isi dan/atau Penjelasan:
-            {doc.page_content.strip()}
-            """
-            )
-        source_list.append(f"UU {uu} Pasal {pasal} Ayat {ayat}")
-
-    return structured_contexts, source_list, "true"
-
-def infer(question, context, source):
-    """
-    Jalankan LLaMA dengan prompt sesuai tipe jawaban
-    """
-    SYSTEM_TEMPLATE = f"""Jawab pertanyaan berdasarkan konteks berikut:
-    {context}
-
-    Kamu adalah asisten ahli pajak Indonesia.
-    Jawaban harus faktual, to the point, dan menggunakan bahasa formal.
-    Jika informasi tidak ada dikonteks atau pertanyaan tidak berkaitan dengan pajak,
-    jawab: "Maaf, saya tidak memiliki pemahaman tentang hal itu."
-
-    Sumber konteks: {source}
-
-    Bila jawaban ditemukan dengan jelas di konteks:
-    - Sertakan sumber pasal di akhir kalimat dengan cara yang natural,
-    misalnya: "sesuai dengan Pasal {{pasal}} UU Nomor {{ayat}} Tahun {{tahun}}".
-    - Sertakan sumber hukum dengan format:
-    Source: Pasal {{pasal}} Ayat {{ayat}} UU {{uu}}.
-
-    Bila jawaban tidak ditemukan dengan jelas di konteks:
-    Gunakan FORMAT JAWABAN AKHIR berikut:
-
-    Sources Used:
-    [Daftar sumber UU yang digunakan (minimal 2)]
-
-    Summary:
-    [Rangkuman inti analisis]
-
-    PILIH SATU BAGIAN SAJA di bawah ini, lalu isi dengan teks yang relevan:
-
-    [[ Conclusion ]]
-    [Tulis kesimpulan, JIKA analisis berfokus pada ringkasan temuan
-    dan implikasi logis dari data yang ada.]
-
-    ATAU
-
-    [[ Recommendation ]]
-    [Tulis rekomendasi, JIKA analisis berfokus pada usulan aksi,
-    kebijakan, atau langkah perbaikan di masa depan.]
-    """
-
-    messages = [
-        {"role": "system", "content": SYSTEM_TEMPLATE},
-        {"role": "user", "content": question}
-    ]
-    prompt = format_llama_cpp_chat(messages)
-
-    out = llm(
-        prompt,
-        max_tokens=500,
-        temperature=0.2,
-        top_p=0.8,
-        repeat_penalty=1.2,
-    )
-
-    text = out["choices"][0]["text"].strip()
-    return text
+engine = TaxbotEngine(
+    model_path=MODEL_PATH,
+    chroma_path=CHROMA_PATH,
+    embedding_model=EMBEDDING_MODEL,
+    n_ctx=2048,
+    device="cpu",
+    answer_cache=answer_cache,
+    retrieval_cache=retrieval_cache,
+    speculative_tokens=SPECULATIVE_TOKENS,
+    grammar=GRAMMAR,
+    topic_gate=load_topic_gate(TOPIC_GATE_PATH),
+    session_store=SessionStore(max_states=4, spill_dir=SESSION_SPILL_DIR) if MULTI_TURN else None,
+    vector_index=VECTOR_INDEX_PATH if os.path.exists(VECTOR_INDEX_PATH) else None,
+    shortlist_dim=SHORTLIST_DIM,
+    shortlist_size=SHORTLIST_SIZE,
+    quantization=QUANTIZATION,
+    prefilter_size=PREFILTER_SIZE,
+    hybrid=HYBRID,
+    citation_lookup=CITATION_LOOKUP,
+    onnx_embedder=ONNX_EMBEDDER,
+)
 
 def main(question):
+    with metrics.request_trace("cli") as trace:
+        if MULTI_TURN:
+            chat_question(question)
+        else:
+            answer_question(question)
+    print(f"📊 {trace.summary()}")
+
+def chat_question(question):
+    start_total = time.time()
+    stats, info = {}, {}
+
+    print("=== Chatbot Response ===")
+    for token in engine.chat_stream(SESSION_ID, question, top_k=TOP_K, stats=stats, info=info):
+        print(token, end="", flush=True)
+    print()
+
+    for source in info["source"]:
+        print(f"📚 Source: {source}")
+    if stats:
+        print(f"Riwayat : {info['history_turns']} turn | prompt {stats['prompt_tokens']} token, "
+              f"{stats['reused_prompt_tokens']} dipakai ulang dari KV cache")
+        print(f"Time to first token : {stats['time_to_first_token']:.2f} detik")
+        print(f"Decode : {stats['decode_tokens_per_second']:.1f} token/detik")
+
+    end_total = time.time()
+    engine.record_request(end_total - start_total)
+    print("Total Runtime :", f"{end_total - start_total:.2f} detik")
+
+def answer_question(question):
     start_total = time.time()
-    query_text = question
 
-    embedding_function = HuggingFaceEmbeddings(
-        model_name="model/all-indo-e5-small-v4-matryoshka-v2",
-        #model_name="chatbot/model/all-indo-e5-small-v4-matryoshka-v2",
-        model_kwargs={"device": "cpu"}
-    )
-    db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
+    if engine.is_off_topic(question):
+        print(NO_ANSWER)
+        end_total = time.time()
+        engine.record_request(end_total - start_total)
+        print("Total Runtime :", f"{end_total - start_total:.2f} detik (topic gate)")
+        return
 
-    context, source, answer_type = build_context_from_db(db, query_text, top_k=3)
-    context_combined = "\n\n---\n\n".join(context)
+    embedding, results = engine.retrieve(question, top_k=TOP_K)
+    context, source, answer_type = engine.format_results(question, results)
 
     if answer_type != 'none':
         print(f"=== Context Retrieved (type: {answer_type}) ===")
-        for i in range(3):
+        for i in range(len(context)):
             # print(f"--- Context {i+1} ---")
-            print(context[i][:500].strip()) 
+            print(context[i][:500].strip())
             print(f"\n📚 Source: {source[i]}\n")
             print("-" * 60)
 
-        response = infer(question, context_combined, source)
         print("=== Chatbot Response ===")
-        print(response)
-    
+        cached = engine.lookup_answer(embedding, results)
+        if cached is not None:
+            print(cached)
+            print("♻️  Jawaban diambil dari answer cache")
+        else:
+            stats = {}
+            if STREAM:
+                pieces = []
+                for token in engine.infer_stream(question, CONTEXT_SEPARATOR.join(context), source, stats=stats):
+                    print(token, end="", flush=True)
+                    pieces.append(token)
+                print()
+                response = "".join(pieces).strip()
+            else:
+                response = engine.infer(question, CONTEXT_SEPARATOR.join(context), source, stats=stats)
+                print(response)
+            engine.store_answer(question, embedding, results, response)
+
+            if stats.get("time_to_first_token") is not None:
+                print(f"Time to first token : {stats['time_to_first_token']:.2f} detik")
+            print(f"Token : prompt {stats['prompt_tokens']}, completion {stats['completion_tokens']} (n_ctx {engine.n_ctx})")
+            print(f"Decode : {stats['decode_tokens_per_second']:.1f} token/detik")
+            if "draft_acceptance_rate" in stats:
+                print(f"Speculative : {stats['accepted_draft_tokens']}/{stats['draft_tokens']} draft diterima "
+                      f"({stats['draft_acceptance_rate']:.0%})")
+
     else:
-       print("Maaf, saya tidak memiliki pemahaman tentang hal itu.")
+       print(NO_ANSWER)
 
     end_total = time.time()
+    engine.record_request(end_total - start_total)
     print("Total Runtime :", f"{end_total - start_total:.2f} detik")
 
 if __name__ == "__main__":
+    metrics.configure(log_path=METRICS_LOG_PATH)
+    startup = engine.warmup()
+    print(f"⚙️  Cold start: {startup['total']:.2f} detik "
+          f"(llm {startup['load_llm']:.2f}, embedder {startup['load_embedder']:.2f}, db {startup['open_db']:.2f})")
     while True:
         question = input("User: ")
+        if MULTI_TURN and question.lower() == "reset":
+            engine.session_store.reset(SESSION_ID)
+            print("🔄 Percakapan baru dimulai")
+            continue
         if question.lower() in ["exit", "quit"]:
+            report = engine.timing_report()
+            if report["cold_request"] is not None:
+                print(f"⏱️  Request pertama: {report['cold_request']:.2f} detik")
+            if report["warm_request_avg"] is not None:
+                print(f"⏱️  Rata-rata request warm ({report['warm_requests']}x): {report['warm_request_avg']:.2f} detik")
+            cache = answer_cache.report()
+            print(f"♻️  Answer cache: {cache['hits']} hit, {cache['misses']} miss (hit rate {cache['hit_rate']:.0%})")
+            metrics.REGISTRY.write_prometheus(METRICS_PROM_PATH)
+            print(f"📊 Metrics: {METRICS_LOG_PATH}, {METRICS_PROM_PATH}")
             print("Bye!")
-            try:
-                llm.close()
-            except Exception:
-                pass
+            engine.close()
             break
         main(question)
-    
-    
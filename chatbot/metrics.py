@@ -0,0 +1,216 @@
+from contextlib import contextmanager
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Batas bucket histogram latensi (detik) untuk output Prometheus
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CURRENT_TRACE = contextvars.ContextVar("taxbot_trace", default=None)
+
+
+# ===========================
+# MEMORI PROSES
+# ===========================
+def rss_bytes():
+    """RSS proses saat ini (Linux: /proc/self/statm; selain itu pakai peak RSS)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    """Peak RSS proses sejak start (ru_maxrss: KB di Linux, byte di macOS)."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+# ===========================
+# REGISTRY (PROMETHEUS)
+# ===========================
+class MetricsRegistry:
+    """Agregat per tahap (histogram latensi, total token) untuk format teks Prometheus."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.requests = {}
+
+    @staticmethod
+    def _new_histogram(buckets):
+        return {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0, "tokens": 0}
+
+    def _observe(self, table, name, seconds, tokens=0):
+        hist = table.setdefault(name, self._new_histogram(self.buckets))
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+        hist["sum"] += seconds
+        hist["count"] += 1
+        hist["tokens"] += tokens or 0
+
+    def observe_trace(self, trace):
+        with self.lock:
+            for name, stage in trace.stages.items():
+                self._observe(self.stages, name, stage["seconds"], stage.get("tokens"))
+            self._observe(self.requests, trace.name, trace.total_seconds)
+
+    def prometheus_text(self):
+        lines = []
+
+        def histogram(metric, label, table, help_text):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for name, hist in sorted(table.items()):
+                for bound, count in zip(self.buckets, hist["buckets"]):
+                    lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {count}')
+                lines.append(f'{metric}_bucket{{{label}="{name}",le="+Inf"}} {hist["count"]}')
+                lines.append(f'{metric}_sum{{{label}="{name}"}} {hist["sum"]:.6f}')
+                lines.append(f'{metric}_count{{{label}="{name}"}} {hist["count"]}')
+
+        with self.lock:
+            histogram("taxbot_stage_seconds", "stage", self.stages, "Latensi per tahap pipeline RAG")
+            histogram("taxbot_request_seconds", "kind", self.requests, "Latensi total per request")
+            lines.append("# HELP taxbot_stage_tokens_total Token yang diproses per tahap")
+            lines.append("# TYPE taxbot_stage_tokens_total counter")
+            for name, hist in sorted(self.stages.items()):
+                if hist["tokens"]:
+                    lines.append(f'taxbot_stage_tokens_total{{stage="{name}"}} {hist["tokens"]}')
+
+        lines.append("# HELP taxbot_process_resident_memory_bytes RSS proses saat ini")
+        lines.append("# TYPE taxbot_process_resident_memory_bytes gauge")
+        lines.append(f"taxbot_process_resident_memory_bytes {rss_bytes()}")
+        lines.append("# HELP taxbot_process_peak_resident_memory_bytes Peak RSS proses")
+        lines.append("# TYPE taxbot_process_peak_resident_memory_bytes gauge")
+        lines.append(f"taxbot_process_peak_resident_memory_bytes {peak_rss_bytes()}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Dump format teks Prometheus ke file (mis. untuk node_exporter textfile collector)."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+
+REGISTRY = MetricsRegistry()
+LOG_CONFIG = {"path": None}
+
+
+def configure(log_path=None):
+    """Aktifkan log JSON per request (satu baris JSONL per trace) ke `log_path`."""
+    LOG_CONFIG["path"] = log_path
+
+
+# ===========================
+# TRACE PER REQUEST
+# ===========================
+class RequestTrace:
+    """
+    Waktu dan memori per tahap untuk satu request. Tahap dicatat lewat
+    stage()/record() dari modul mana pun selama trace aktif di context ini.
+    """
+
+    def __init__(self, name="request", request_id=None, registry=REGISTRY):
+        self.name = name
+        self.request_id = request_id or uuid.uuid4().hex
+        self.registry = registry
+        self.stages = {}
+        self.start = None
+        self.total_seconds = 0.0
+        self._token = None
+
+    @contextmanager
+    def stage(self, name, **extra):
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, rss_before=rss_before, **extra)
+
+    def record(self, name, seconds, rss_before=None, **extra):
+        """Catat satu tahap yang waktunya diukur di tempat lain (mis. prefill/decode llama.cpp)."""
+        rss = rss_bytes()
+        entry = self.stages.setdefault(name, {"seconds": 0.0})
+        entry["seconds"] += seconds
+        entry["rss_mb"] = rss / 2**20
+        if rss_before is not None:
+            entry["rss_delta_mb"] = entry.get("rss_delta_mb", 0.0) + (rss - rss_before) / 2**20
+        entry["peak_rss_mb"] = max(peak_rss_bytes(), rss) / 2**20
+        for key, value in extra.items():
+            if isinstance(value, (int, float)) and key in entry:
+                entry[key] += value
+            else:
+                entry[key] = value
+        if entry.get("tokens") and entry["seconds"] > 0:
+            entry["tokens_per_second"] = entry["tokens"] / entry["seconds"]
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._token = CURRENT_TRACE.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        CURRENT_TRACE.reset(self._token)
+        self.total_seconds = time.perf_counter() - self.start
+        self.registry.observe_trace(self)
+        if LOG_CONFIG["path"]:
+            with open(LOG_CONFIG["path"], "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.to_dict(), ensure_ascii=False) + "\n")
+
+    def to_dict(self):
+        return {
+            "ts": time.time(),
+            "request_id": self.request_id,
+            "kind": self.name,
+            "total_seconds": self.total_seconds,
+            "stages": self.stages,
+        }
+
+    def summary(self):
+        """Ringkasan satu baris untuk print di CLI."""
+        parts = [f"{name} {stage['seconds'] * 1000:.0f}ms" for name, stage in self.stages.items()]
+        return " | ".join(parts) + f" | RSS {rss_bytes() / 2**20:.0f} MB (peak {peak_rss_bytes() / 2**20:.0f} MB)"
+
+
+@contextmanager
+def request_trace(name="request", request_id=None):
+    """
+    Mulai trace request. Bila sudah ada trace aktif (mis. CLI membungkus
+    engine.answer()), trace luar yang dipakai supaya tahap tidak terpecah.
+    """
+    current = CURRENT_TRACE.get()
+    if current is not None:
+        yield current
+        return
+    with RequestTrace(name, request_id) as trace:
+        yield trace
+
+
+@contextmanager
+def stage(name, **extra):
+    """Ukur satu tahap pada trace aktif; tanpa trace aktif tidak melakukan apa-apa."""
+    trace = CURRENT_TRACE.get()
+    if trace is None:
+        yield
+        return
+    with trace.stage(name, **extra):
+        yield
+
+
+def record(name, seconds, **extra):
+    trace = CURRENT_TRACE.get()
+    if trace is not None:
+        trace.record(name, seconds, **extra)
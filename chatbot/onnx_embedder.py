@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+CONFIG_FILE = "onnx_config.json"
+MODEL_FILE = "model.onnx"
+MODEL_INT8_FILE = "model_int8.onnx"
+
+
+# ===========================
+# EXPORT SENTENCE-TRANSFORMERS -> ONNX
+# ===========================
+def read_pooling_config(model_dir):
+    """
+    Ambil cara pooling, normalisasi dan max_seq_length dari folder
+    sentence-transformers (1_Pooling/config.json, modules.json,
+    sentence_bert_config.json) supaya vektor ONNX sama dengan HuggingFaceEmbeddings.
+    """
+    config = {"pooling": "mean", "normalize": False, "max_length": 512}
+
+    pooling_path = os.path.join(model_dir, "1_Pooling", "config.json")
+    if os.path.exists(pooling_path):
+        with open(pooling_path, "r", encoding="utf-8") as f:
+            pooling = json.load(f)
+        if pooling.get("pooling_mode_cls_token"):
+            config["pooling"] = "cls"
+        elif pooling.get("pooling_mode_max_tokens"):
+            config["pooling"] = "max"
+
+    modules_path = os.path.join(model_dir, "modules.json")
+    if os.path.exists(modules_path):
+        with open(modules_path, "r", encoding="utf-8") as f:
+            config["normalize"] = any(m.get("type", "").endswith("Normalize") for m in json.load(f))
+
+    st_config_path = os.path.join(model_dir, "sentence_bert_config.json")
+    if os.path.exists(st_config_path):
+        with open(st_config_path, "r", encoding="utf-8") as f:
+            config["max_length"] = json.load(f).get("max_seq_length", config["max_length"])
+    return config
+
+
+def export_onnx(model_dir, out_dir, quantize=True, opset=17):
+    """
+    Export transformer embedder ke ONNX (axis batch/sequence dinamis) +
+    tokenizer + onnx_config.json. Bila `quantize`, tulis juga model_int8.onnx
+    (kuantisasi dinamis bobot int8 ONNX Runtime).
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModel.from_pretrained(model_dir).eval()
+    os.makedirs(out_dir, exist_ok=True)
+
+    dummy = tokenizer(["pajak penghasilan orang pribadi"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    model_path = os.path.join(out_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]},
+            opset_version=opset,
+        )
+    tokenizer.save_pretrained(out_dir)
+
+    config = read_pooling_config(model_dir)
+    config.update({
+        "source_model": model_dir,
+        "pad_token": tokenizer.pad_token,
+        "pad_id": tokenizer.pad_token_id,
+        "inputs": input_names,
+    })
+    with open(os.path.join(out_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(model_path, os.path.join(out_dir, MODEL_INT8_FILE), weight_type=QuantType.QInt8)
+    return config
+
+
+# ===========================
+# EMBEDDER ONNX RUNTIME
+# ===========================
+class OnnxEmbeddings:
+    """
+    Pengganti HuggingFaceEmbeddings (embed_query/embed_documents) yang
+    menjalankan model hasil export_onnx() dengan ONNX Runtime + tokenizers,
+    tanpa import torch.
+
+    Args:
+        model_dir (str): Folder hasil export_onnx().
+        quantized (bool): Pakai model_int8.onnx bila ada (default), selain itu model.onnx.
+        threads (int): Opsional, jumlah thread intra-op ONNX Runtime.
+        batch_size (int): Jumlah teks per panggilan session.run().
+    """
+
+    def __init__(self, model_dir, quantized=True, threads=None, batch_size=32):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        model_file = MODEL_INT8_FILE if quantized and os.path.exists(os.path.join(model_dir, MODEL_INT8_FILE)) else MODEL_FILE
+        self.model_path = os.path.join(model_dir, model_file)
+        self.batch_size = batch_size
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_length"])
+        # pad_id harus benar: model turunan XLM-R menghitung position id dari token non-pad
+        self.tokenizer.enable_padding(pad_id=self.config["pad_id"], pad_token=self.config["pad_token"])
+
+    def _encode(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(None, {name: feeds[name] for name in self.input_names})[0]
+
+        mask = attention_mask[:, :, None].astype(np.float32)
+        if self.config["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        elif self.config["pooling"] == "max":
+            pooled = np.where(mask > 0, hidden, -1e9).max(axis=1)
+        else:
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.config["normalize"]:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled
+
+    def embed_documents(self, texts):
+        texts = [text.replace("\n", " ") for text in texts]
+        # Urutkan per panjang agar padding per batch minimal, lalu kembalikan ke urutan asli
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        output = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._encode([texts[i] for i in batch])):
+                output[i] = vector.astype(np.float32).tolist()
+        return output
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export embedder sentence-transformers ke ONNX (+ int8 dinamis)")
+    parser.add_argument("--model-dir", default="model/all-indo-e5-small-v4-matryoshka-v2")
+    parser.add_argument("--out", default="model/all-indo-e5-small-v4-matryoshka-v2-onnx")
+    parser.add_argument("--no-quantize", action="store_true", help="Hanya model.onnx float32")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    config = export_onnx(args.model_dir, args.out, quantize=not args.no_quantize, opset=args.opset)
+    sizes = ", ".join(
+        f"{name} {os.path.getsize(os.path.join(args.out, name)) / 2**20:.1f} MB"
+        for name in (MODEL_FILE, MODEL_INT8_FILE)
+        if os.path.exists(os.path.join(args.out, name))
+    )
+    print(f"✅ Export ke {args.out} ({sizes}; pooling {config['pooling']}, normalize {config['normalize']}) "
+          f"dalam {time.perf_counter() - start:.2f} detik")
+
+
+if __name__ == "__main__":
+    main()
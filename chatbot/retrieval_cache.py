@@ -0,0 +1,272 @@
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import numpy as np
+from cache_utils import path_signature
+import metrics
+
+
+def normalize_query(query):
+    """Lowercase + rapikan spasi, supaya pengulangan yang sama persis berbagi entri."""
+    return " ".join(query.lower().split())
+
+
+class RetrievalCache:
+    """
+    Cache embedding query + hasil top-k [(doc_id, score), ...] untuk retrieval.
+    Key = (embedding model, versi DB, k, query ternormalisasi).
+
+    Args:
+        model_name (str): Nama/path embedding model (bagian dari key).
+        watch_paths (list): Path yang menentukan versi DB (folder Chroma DB).
+        db_path (str): Opsional, file SQLite yang bisa dipakai bersama antar-proses.
+        max_entries (int): Batas jumlah entri di memori dan di SQLite.
+        max_bytes (int): Opsional, batas ukuran embedding + hasil di memori.
+        check_interval (float): Jeda minimal (detik) antar pengecekan versi DB.
+    """
+
+    def __init__(self, model_name, watch_paths=(), db_path=None, max_entries=2048, max_bytes=None, check_interval=5.0):
+        self.model_name = model_name
+        self.watch_paths = list(watch_paths)
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self.version = path_signature(self.watch_paths)
+        self.last_check = time.monotonic()
+
+        self.conn = None
+        if db_path:
+            self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS retrievals ("
+                "key TEXT PRIMARY KEY, embedding BLOB, hits TEXT, last_used REAL)"
+            )
+            self.conn.commit()
+
+    def make_key(self, query, k):
+        raw = f"{self.model_name}\x00{self.version}\x00{k}\x00{normalize_query(query)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self.last_check < self.check_interval:
+            return
+        self.last_check = now
+        version = path_signature(self.watch_paths)
+        if version != self.version:
+            # Entri lama otomatis tidak terpakai karena versi masuk ke key
+            self.version = version
+            self.entries.clear()
+            self.nbytes = 0
+
+    def _remember(self, key, embedding, hits):
+        size = embedding.nbytes + sum(len(doc_id) + 8 for doc_id, _ in hits)
+        if key in self.entries:
+            self.nbytes -= self.entries[key][2]
+        self.entries[key] = (embedding, hits, size)
+        self.entries.move_to_end(key)
+        self.nbytes += size
+
+        while self.entries and (
+            len(self.entries) > self.max_entries
+            or (self.max_bytes is not None and self.nbytes > self.max_bytes)
+        ):
+            _, (_, _, old_size) = self.entries.popitem(last=False)
+            self.nbytes -= old_size
+            self.stats["evictions"] += 1
+
+    def get(self, query, k):
+        """
+        Mengembalikan (embedding, [(doc_id, score), ...]) atau None.
+        """
+        with self.lock:
+            self._check_version()
+            key = self.make_key(query, k)
+
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                embedding, hits, _ = self.entries[key]
+                return embedding, hits
+
+            if self.conn is not None:
+                row = self.conn.execute("SELECT embedding, hits FROM retrievals WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    embedding = np.frombuffer(row[0], dtype=np.float32)
+                    hits = [tuple(h) for h in json.loads(row[1])]
+                    self._remember(key, embedding, hits)
+                    self.conn.execute("UPDATE retrievals SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self.conn.commit()
+                    self.stats["disk_hits"] += 1
+                    return embedding, hits
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, query, k, embedding, hits):
+        with self.lock:
+            self._check_version()
+            key = self.make_key(query, k)
+            embedding = np.asarray(embedding, dtype=np.float32)
+            hits = [(doc_id, float(score)) for doc_id, score in hits]
+            self._remember(key, embedding, hits)
+
+            if self.conn is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO retrievals VALUES (?, ?, ?, ?)",
+                    (key, embedding.tobytes(), json.dumps(hits), time.time()),
+                )
+                self.conn.execute(
+                    "DELETE FROM retrievals WHERE key NOT IN "
+                    "(SELECT key FROM retrievals ORDER BY last_used DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+                self.conn.commit()
+
+    def report(self):
+        total = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self.entries),
+            "bytes": self.nbytes,
+            "hit_rate": (self.stats["hits"] + self.stats["disk_hits"]) / total if total else 0.0,
+        }
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def load_documents_by_id(db, ids):
+    """Ambil Document dari Chroma berdasarkan id, urutan sesuai `ids`."""
+    if hasattr(db, "get_documents"):
+        return db.get_documents(list(ids))
+    from langchain_core.documents import Document
+
+    data = db.get(ids=list(ids), include=["documents", "metadatas"])
+    by_id = {
+        doc_id: Document(id=doc_id, page_content=content, metadata=meta or {})
+        for doc_id, content, meta in zip(data["ids"], data["documents"], data["metadatas"])
+    }
+    return [by_id.get(doc_id) for doc_id in ids]
+
+
+def vector_distances(db, embedding, ids):
+    """
+    Jarak query ke chunk tertentu (metrik koleksi, seperti skor similarity
+    search), urutan sesuai `ids`; None untuk id yang tidak ada.
+    """
+    if hasattr(db, "distances_for"):
+        return db.distances_for(embedding, list(ids))
+    import numpy as np
+
+    data = db._collection.get(ids=list(ids), include=["embeddings"])
+    space = (db._collection.metadata or {}).get("hnsw:space", "l2")
+    query = np.asarray(embedding, dtype=np.float32)
+    by_id = {}
+    for doc_id, vector in zip(data["ids"], data["embeddings"]):
+        vector = np.asarray(vector, dtype=np.float32)
+        if space == "l2":
+            by_id[doc_id] = float(np.sum((query - vector) ** 2))
+        elif space == "ip":
+            by_id[doc_id] = float(1.0 - query @ vector)
+        else:
+            by_id[doc_id] = float(1.0 - query @ vector / max(np.linalg.norm(query) * np.linalg.norm(vector), 1e-12))
+    return [by_id.get(doc_id) for doc_id in ids]
+
+
+def cached_similarity_search(db, embedding_function, query, k, cache=None):
+    """
+    Pengganti db.similarity_search_with_score yang memakai RetrievalCache.
+    Mengembalikan (query_embedding, [(doc, score), ...]).
+    """
+    if cache is not None:
+        with metrics.stage("retrieval_cache"):
+            hit = cache.get(query, k)
+            docs = load_documents_by_id(db, [doc_id for doc_id, _ in hit[1]]) if hit is not None else None
+        if hit is not None and all(doc is not None for doc in docs):
+            return list(hit[0]), [(doc, score) for doc, (_, score) in zip(docs, hit[1])]
+
+    with metrics.stage("embed"):
+        embedding = embedding_function.embed_query(query)
+    with metrics.stage("search"):
+        results = db.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+
+    if cache is not None and all(getattr(doc, "id", None) for doc, _ in results):
+        cache.put(query, k, embedding, [(doc.id, score) for doc, score in results])
+    return embedding, results
+
+
+def search_many_by_vector(db, embeddings, k):
+    """
+    Satu panggilan query Chroma untuk banyak embedding sekaligus.
+    Mengembalikan list [(doc, score), ...] per embedding (skor = jarak, sama
+    seperti similarity_search_with_score).
+    """
+    if len(embeddings) == 0:
+        return []
+    if hasattr(db, "search_many_by_vector"):
+        return db.search_many_by_vector(embeddings, k)
+    from langchain_core.documents import Document
+
+    data = db._collection.query(
+        query_embeddings=[list(e) for e in embeddings],
+        n_results=k,
+        include=["documents", "metadatas", "distances"],
+    )
+    all_results = []
+    for ids, documents, metadatas, distances in zip(data["ids"], data["documents"], data["metadatas"], data["distances"]):
+        all_results.append([
+            (Document(id=doc_id, page_content=content, metadata=meta or {}), distance)
+            for doc_id, content, meta, distance in zip(ids, documents, metadatas, distances)
+        ])
+    return all_results
+
+
+def cached_similarity_search_many(db, embedding_function, queries, k, cache=None, batch_size=None):
+    """
+    Versi batch dari cached_similarity_search: query yang belum ada di cache
+    di-embed dengan satu panggilan embed_documents lalu dicari dalam satu query Chroma
+    (per potongan `batch_size` query bila diset, agar memori embed/search terbatas).
+    Mengembalikan list (query_embedding, [(doc, score), ...]) sesuai urutan `queries`.
+    """
+    output = [None] * len(queries)
+    hits = {}
+    if cache is not None:
+        with metrics.stage("retrieval_cache", queries=len(queries)):
+            for i, query in enumerate(queries):
+                hit = cache.get(query, k)
+                if hit is not None:
+                    hits[i] = hit
+            # Satu pengambilan dokumen untuk semua cache hit
+            hit_ids = list({doc_id for _, ranked in hits.values() for doc_id, _ in ranked})
+            docs = dict(zip(hit_ids, load_documents_by_id(db, hit_ids))) if hit_ids else {}
+        for i, (embedding, ranked) in hits.items():
+            if all(docs.get(doc_id) is not None for doc_id, _ in ranked):
+                output[i] = (list(embedding), [(docs[doc_id], score) for doc_id, score in ranked])
+    missing = [i for i, item in enumerate(output) if item is None]
+
+    batch_size = batch_size or len(missing) or 1
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        with metrics.stage("embed", queries=len(batch)):
+            embeddings = embedding_function.embed_documents([queries[i] for i in batch])
+        with metrics.stage("search", queries=len(batch)):
+            retrieved = search_many_by_vector(db, embeddings, k)
+        for i, embedding, results in zip(batch, embeddings, retrieved):
+            output[i] = (embedding, results)
+            if cache is not None:
+                cache.put(queries[i], k, embedding, [(doc.id, score) for doc, score in results])
+    return output
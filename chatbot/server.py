@@ -0,0 +1,633 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from engine import TaxbotEngine, CHROMA_PATH, MODEL_PATH, EMBEDDING_MODEL, NO_ANSWER, CONTEXT_SEPARATOR
+from answer_cache import AnswerCache
+from worker_pool import LlamaWorkerPool
+from topic_gate import load_topic_gate
+from sessions import SessionStore
+import metrics
+
+# Server tidak boleh mengakses internet: semua model harus sudah ada di disk
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+HOST = "0.0.0.0"
+PORT = 8000
+MAX_CONCURRENCY = 1
+MAX_QUEUE = 8
+MAX_BODY_BYTES = 1024 * 1024
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+}
+
+
+# ===========================
+# STUB ENGINE (TANPA MODEL)
+# ===========================
+class StubDocument:
+    def __init__(self, page_content, metadata, id=None):
+        self.page_content = page_content
+        self.metadata = metadata
+        self.id = id
+
+
+class StubEngine(TaxbotEngine):
+    """
+    Pengganti TaxbotEngine untuk uji server tanpa GGUF/Chroma:
+    retrieval mengembalikan satu konteks dummy, infer menggemakan pertanyaan.
+    """
+
+    def __init__(self, answer_cache=None, topic_gate=None):
+        super().__init__(
+            model_path="stub", answer_cache=answer_cache, pack_context=False, prefix_cache=False, topic_gate=topic_gate
+        )
+
+    def warmup(self):
+        return {"total": 0.0}
+
+    def retrieve(self, query, top_k=3, citation_query=None):
+        # Embedding dummy: histogram huruf a-z, cukup untuk menguji answer cache
+        text = query.lower()
+        embedding = [float(text.count(c)) + 1e-3 for c in "abcdefghijklmnopqrstuvwxyz"]
+        doc = StubDocument(f"Stub konteks untuk: {query}", {"uu": "stub", "pasal": "1", "ayat": "1", "sumber": "stub"}, id="stub-1")
+        return embedding, [(doc, 0.0)]
+
+    def infer(self, question, context, source, stats=None, **generation_kwargs):
+        return "".join(self.infer_stream(question, context, source, stats=stats))
+
+    def infer_stream(self, question, context, source, stats=None, **generation_kwargs):
+        text = f"Jawaban stub untuk: {question}\nSource: {source[0] if source else '-'}"
+        tokens = text.split(" ")
+        for i, token in enumerate(tokens):
+            yield token if i == 0 else " " + token
+        if stats is not None:
+            stats.update({"time_to_first_token": 0.0, "completion_tokens": len(tokens), "decode_tokens_per_second": 0.0})
+
+
+def parse_question(body):
+    """Pesan user terakhir dari `messages`; ValueError bila format OpenAI tidak valid."""
+    messages = body.get("messages") or []
+    if not isinstance(messages, list) or not all(isinstance(m, dict) for m in messages):
+        raise ValueError("field 'messages' harus list objek {role, content}")
+    questions = [m.get("content") for m in messages if m.get("role") == "user"]
+    if not questions or not isinstance(questions[-1], str) or not questions[-1].strip():
+        raise ValueError("messages harus berisi minimal satu pesan user (content string)")
+    return questions[-1]
+
+
+def parse_generation_kwargs(body):
+    """max_tokens/temperature/top_p dari body; ValueError bila tipe atau rentangnya salah."""
+    kwargs = {}
+    if body.get("max_tokens") is not None:
+        value = body["max_tokens"]
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            raise ValueError("field 'max_tokens' harus bilangan bulat positif")
+        kwargs["max_tokens"] = value
+    for key, low, high in (("temperature", 0.0, 2.0), ("top_p", 0.0, 1.0)):
+        if body.get(key) is None:
+            continue
+        value = body[key]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+            raise ValueError(f"field '{key}' harus angka {low:g}-{high:g}")
+        kwargs[key] = float(value)
+    return kwargs
+
+
+def parse_top_k(body, default=3):
+    """top_k dari body request; ValueError bila bukan bilangan bulat positif."""
+    value = body.get("top_k", default)
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError("field 'top_k' harus bilangan bulat positif")
+    try:
+        top_k = int(value)
+    except ValueError:
+        raise ValueError("field 'top_k' harus bilangan bulat positif") from None
+    if top_k < 1:
+        raise ValueError("field 'top_k' harus bilangan bulat positif")
+    return top_k
+
+
+# ===========================
+# SERVER
+# ===========================
+class TaxbotServer:
+    """
+    HTTP server asyncio di depan pipeline RAG (endpoint kompatibel OpenAI).
+
+    Args:
+        engine: Objek dengan method build_context() dan infer() (TaxbotEngine/StubEngine).
+        max_concurrency (int): Jumlah request yang diproses bersamaan di executor.
+        max_queue (int): Jumlah request yang boleh menunggu; lebih dari itu dibalas 429.
+    """
+
+    def __init__(self, engine, max_concurrency=MAX_CONCURRENCY, max_queue=MAX_QUEUE):
+        self.engine = engine
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.pending = 0
+        self.rejected = 0
+        self.served = 0
+
+    def admit(self):
+        """Daftarkan request ke antrean; tolak (429) bila antrean penuh."""
+        if self.pending >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise QueueFullError()
+        self.pending += 1
+
+    def release(self):
+        self.pending -= 1
+
+    def admit_once(self):
+        """admit() yang mengembalikan fungsi release idempoten (aman dipanggil berkali-kali)."""
+        self.admit()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.release()
+        return release
+
+    async def run_in_engine(self, func, *args, **kwargs):
+        """Jalankan fungsi CPU-bound (llama.cpp/embedding) di executor, dibatasi semaphore."""
+        self.admit()
+        try:
+            async with self.semaphore:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.executor, lambda: func(*args, **kwargs))
+        finally:
+            self.release()
+
+    async def stream_in_engine(self, release, func, *args, **kwargs):
+        """
+        Jalankan generator CPU-bound di executor dan teruskan setiap item ke event loop.
+        `release` dari admit_once() dipanggil saat stream selesai. Bila stream
+        ditutup lebih awal (klien putus), generator di executor dihentikan pada
+        item berikutnya dan slot executor baru dilepas setelah thread-nya selesai.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def produce():
+            items = func(*args, **kwargs)
+            try:
+                for item in items:
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                items.close()
+                loop.call_soon_threadsafe(queue.put_nowait, STREAM_END)
+
+        try:
+            async with self.semaphore:
+                future = loop.run_in_executor(self.executor, produce)
+                try:
+                    while True:
+                        item = await queue.get()
+                        if item is STREAM_END:
+                            break
+                        if isinstance(item, Exception):
+                            raise item
+                        yield item
+                finally:
+                    cancelled.set()
+                    await asyncio.wait([future])
+        finally:
+            release()
+
+    # ---------- handler endpoint ----------
+    async def handle_chat_completions(self, body):
+        try:
+            question = parse_question(body)
+            top_k = parse_top_k(body)
+            generation_kwargs = parse_generation_kwargs(body)
+        except ValueError as e:
+            return 400, {"error": {"message": str(e)}}
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model") or os.path.basename(str(self.engine.model_path))
+
+        # session_id (opsional): percakapan multi-turn dengan KV cache per sesi
+        session_id = body.get("session_id")
+        if session_id is not None and self.engine.session_store is None:
+            return 400, {"error": {"message": "session_id tidak didukung (sesi nonaktif: --sessions 0 atau --workers > 1)"}}
+
+        if body.get("stream"):
+            # Slot diambil sekarang (429 sebelum header SSE); dilepas oleh stream atau handle_connection
+            release = self.admit_once()
+            chunks = self.stream_chat_completion(release, completion_id, model, question, top_k, generation_kwargs, session_id)
+            return 200, StreamingResponse(chunks, release)
+
+        start = time.perf_counter()
+        if session_id is not None:
+            result = await self.run_in_engine(self.engine.chat, str(session_id), question, top_k=top_k, **generation_kwargs)
+        else:
+            result = await self.run_in_engine(self.engine.answer, question, top_k=top_k, **generation_kwargs)
+        self.served += 1
+        text, stats = result["answer"], result["generation_stats"]
+        source = result["source"] if result["answer_type"] != "none" else []
+
+        return 200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": stats.get("prompt_tokens"),
+                "completion_tokens": stats.get("completion_tokens", 0),
+            },
+            "sources": source,
+            "answer_type": result["answer_type"],
+            "off_topic": result["off_topic"],
+            "cache_hit": result["cache_hit"],
+            "latency_seconds": round(time.perf_counter() - start, 4),
+        }
+
+    async def stream_chat_completion(self, release, completion_id, model, question, top_k, generation_kwargs, session_id=None):
+        """Yield chunk `chat.completion.chunk` (format SSE OpenAI) per token."""
+        stats = {}
+
+        def generate():
+            with metrics.request_trace("chat_stream", request_id=completion_id):
+                if session_id is not None:
+                    yield from generate_session()
+                else:
+                    yield from generate_traced()
+
+        def generate_session():
+            info = {}
+            tokens = self.engine.chat_stream(str(session_id), question, top_k, stats, info, **generation_kwargs)
+            # Token pertama memicu retrieval, sehingga sumber baru diketahui setelahnya
+            first = next(tokens, None)
+            yield {"role": "assistant", "sources": info.get("source", [])}
+            if first is not None:
+                yield {"content": first}
+            for token in tokens:
+                yield {"content": token}
+
+        def generate_traced():
+            if self.engine.is_off_topic(question):
+                yield {"role": "assistant", "sources": []}
+                yield {"content": NO_ANSWER}
+                return
+
+            embedding, results = self.engine.retrieve(question, top_k=top_k)
+            context, source, answer_type = self.engine.format_results(question, results, generation_kwargs.get("max_tokens"))
+            yield {"role": "assistant", "sources": source if answer_type != "none" else []}
+            if answer_type == "none":
+                yield {"content": NO_ANSWER}
+                return
+
+            cached = self.engine.lookup_answer(embedding, results, generation_kwargs)
+            if cached is not None:
+                yield {"content": cached}
+                return
+
+            pieces = []
+            for token in self.engine.infer_stream(question, CONTEXT_SEPARATOR.join(context), source, stats=stats, **generation_kwargs):
+                pieces.append(token)
+                yield {"content": token}
+            self.engine.store_answer(question, embedding, results, "".join(pieces).strip(), generation_kwargs)
+
+        created = int(time.time())
+        # aclosing: stream yang ditutup di tengah jalan langsung menghentikan generate() di executor
+        async with contextlib.aclosing(self.stream_in_engine(release, generate)) as deltas:
+            async for delta in deltas:
+                sources = delta.pop("sources", None)
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                }
+                if sources is not None:
+                    chunk["sources"] = sources
+                yield chunk
+
+        self.served += 1
+        yield {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            "generation_stats": stats,
+        }
+
+    async def handle_retrieve(self, body):
+        query = body.get("query")
+        if not query or not isinstance(query, str):
+            return 400, {"error": {"message": "field 'query' wajib diisi (string)"}}
+        try:
+            top_k = parse_top_k(body)
+        except ValueError as e:
+            return 400, {"error": {"message": str(e)}}
+
+        context, source, answer_type = await self.run_in_engine(self.engine.build_context, query, top_k=top_k)
+        self.served += 1
+        if answer_type == "none":
+            context, source = [], []
+        return 200, {"query": query, "context": context, "source": source, "answer_type": answer_type}
+
+    async def handle_health(self, body):
+        return 200, {
+            "status": "ok",
+            "pending": self.pending,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "served": self.served,
+            "rejected": self.rejected,
+            "answer_cache": self.engine.answer_cache.report() if self.engine.answer_cache else None,
+            "topic_gate": self.engine.topic_gate.report() if self.engine.topic_gate else None,
+            "sessions": self.engine.session_store.report() if self.engine.session_store else None,
+        }
+
+    async def handle_metrics(self, body):
+        return 200, metrics.REGISTRY.prometheus_text()
+
+    def route(self, method, path):
+        routes = {
+            ("POST", "/v1/chat/completions"): self.handle_chat_completions,
+            ("POST", "/v1/retrieve"): self.handle_retrieve,
+            ("GET", "/health"): self.handle_health,
+            ("GET", "/metrics"): self.handle_metrics,
+        }
+        if (method, path) in routes:
+            return routes[(method, path)], None
+        if any(p == path for _, p in routes):
+            return None, 405
+        return None, 404
+
+    # ---------- HTTP ----------
+    async def handle_connection(self, reader, writer):
+        try:
+            status, payload, headers = await self.handle_request(reader)
+        except Exception as e:
+            status, payload, headers = 500, {"error": {"message": str(e)}}, {}
+
+        if isinstance(payload, StreamingResponse):
+            try:
+                await write_stream_response(writer, payload.chunks)
+            finally:
+                # Stream yang tidak pernah dimulai (header gagal terkirim) tetap melepas slot antrean
+                payload.release()
+        else:
+            await write_response(writer, status, payload, headers)
+
+    async def handle_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return 400, {"error": {"message": "request kosong"}}, {}
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            return 400, {"error": {"message": "request line tidak valid"}}, {}
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            return 400, {"error": {"message": "Content-Length tidak valid"}}, {}
+        if length < 0:
+            return 400, {"error": {"message": "Content-Length tidak valid"}}, {}
+        if length > MAX_BODY_BYTES:
+            return 413, {"error": {"message": "body terlalu besar"}}, {}
+        raw = await reader.readexactly(length) if length else b""
+
+        handler, error_status = self.route(method.upper(), target.split("?", 1)[0])
+        if handler is None:
+            return error_status, {"error": {"message": f"{method} {target} tidak tersedia"}}, {}
+
+        try:
+            body = json.loads(raw) if raw else {}
+        except json.JSONDecodeError:
+            return 400, {"error": {"message": "body bukan JSON valid"}}, {}
+        if not isinstance(body, dict):
+            return 400, {"error": {"message": "body harus objek JSON"}}, {}
+
+        try:
+            status, payload = await handler(body)
+        except QueueFullError:
+            return 429, {"error": {"message": "server sibuk, antrean penuh"}}, {"Retry-After": "1"}
+        return status, payload, {}
+
+    async def serve(self, host=HOST, port=PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"🚀 Taxbot server berjalan di http://{host}:{port} "
+              f"(concurrency={self.max_concurrency}, queue={self.max_queue})")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.engine.close()
+
+
+class QueueFullError(Exception):
+    """Antrean request penuh (dibalas HTTP 429)."""
+
+
+STREAM_END = object()
+
+
+class StreamingResponse:
+    """Body SSE (async generator) beserta release slot antrean miliknya."""
+
+    def __init__(self, chunks, release):
+        self.chunks = chunks
+        self.release = release
+
+
+async def write_response(writer, status, payload, headers=None):
+    # Payload string dikirim apa adanya (format teks Prometheus untuk /metrics)
+    if isinstance(payload, str):
+        body = payload.encode("utf-8")
+        content_type = "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        content_type = "application/json; charset=utf-8"
+    lines = [
+        f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        "Connection: close",
+    ]
+    for key, value in (headers or {}).items():
+        lines.append(f"{key}: {value}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    try:
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def write_stream_response(writer, chunks):
+    """Kirim chunk sebagai Server-Sent Events, diakhiri `data: [DONE]`."""
+    head = [
+        "HTTP/1.1 200 OK",
+        "Content-Type: text/event-stream; charset=utf-8",
+        "Cache-Control: no-cache",
+        "Connection: close",
+    ]
+    try:
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        async for chunk in chunks:
+            writer.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await writer.drain()
+        writer.write(b"data: [DONE]\n\n")
+        await writer.drain()
+    except Exception as e:
+        writer.write(f"data: {json.dumps({'error': {'message': str(e)}})}\n\n".encode("utf-8"))
+    finally:
+        await chunks.aclose()
+        writer.close()
+
+
+def build_engine(args):
+    answer_cache = None
+    if args.answer_cache_size > 0:
+        answer_cache = AnswerCache(
+            threshold=args.answer_cache_threshold,
+            max_entries=args.answer_cache_size,
+            db_path=args.answer_cache_path,
+            watch_paths=[
+                p for p in (args.model_path, args.chroma_path, args.vector_index, args.embedding_model, args.onnx_embedder) if p
+            ],
+        )
+
+    topic_gate = None if args.no_topic_gate else load_topic_gate(args.topic_gate_path)
+
+    if args.stub:
+        return StubEngine(answer_cache=answer_cache, topic_gate=topic_gate)
+
+    session_store = None
+    if args.sessions > 0 and args.workers <= 1:
+        session_store = SessionStore(max_states=args.sessions, spill_dir=args.session_spill_dir)
+
+    worker_pool = None
+    if args.workers > 1:
+        worker_pool = LlamaWorkerPool(
+            args.model_path,
+            n_workers=args.workers,
+            n_ctx=args.n_ctx,
+            speculative_tokens=args.speculative_tokens,
+            grammar=args.grammar,
+        )
+        load_seconds = worker_pool.start()
+        print(f"👷 {args.workers} worker llama.cpp siap (load {max(load_seconds.values()):.2f} detik)")
+
+    return TaxbotEngine(
+        model_path=args.model_path,
+        chroma_path=args.chroma_path,
+        embedding_model=args.embedding_model,
+        n_ctx=args.n_ctx,
+        answer_cache=answer_cache,
+        worker_pool=worker_pool,
+        speculative_tokens=args.speculative_tokens,
+        topic_gate=topic_gate,
+        grammar=args.grammar,
+        session_store=session_store,
+        vector_index=args.vector_index,
+        shortlist_dim=args.shortlist_dim,
+        shortlist_size=args.shortlist_size,
+        quantization=args.quantization,
+        prefilter_size=args.prefilter_size,
+        hybrid=args.hybrid,
+        citation_lookup=not args.no_citation_lookup,
+        onnx_embedder=args.onnx_embedder,
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible HTTP server untuk Taxbot RAG")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--max-concurrency", type=int, default=None, help=f"Default: jumlah worker (tanpa pool selalu {MAX_CONCURRENCY}: satu Llama)")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE)
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--chroma-path", default=CHROMA_PATH)
+    parser.add_argument("--embedding-model", default=EMBEDDING_MODEL)
+    parser.add_argument("--onnx-embedder", default=None, help="Folder hasil `python onnx_embedder.py`: embedding query via ONNX Runtime")
+    parser.add_argument("--vector-index", default=None, help="Folder index NumPy (python vector_index.py) pengganti Chroma")
+    parser.add_argument("--shortlist-dim", type=int, default=None, help="Dimensi shortlist Matryoshka, mis. 64/128 (butuh --vector-index)")
+    parser.add_argument("--shortlist-size", type=int, default=100, help="Kandidat shortlist yang diskor ulang di dimensi penuh")
+    parser.add_argument("--quantization", choices=["int8", "binary"], default=None,
+                        help="Prefilter index NumPy pada kode int8 / bit tanda (Hamming), lalu rescore float")
+    parser.add_argument("--prefilter-size", type=int, default=200, help="Kandidat prefilter yang diskor ulang dengan float")
+    parser.add_argument("--hybrid", action="store_true", help="BM25 + vector search digabung RRF (butuh index BM25 di folder Chroma)")
+    parser.add_argument("--no-citation-lookup", action="store_true", help="Nonaktifkan lookup langsung untuk pertanyaan yang menyebut Pasal/Ayat/UU")
+    parser.add_argument("--n-ctx", type=int, default=2048)
+    parser.add_argument("--speculative-tokens", type=int, default=0, help="Token draft prompt-lookup decoding (0 = nonaktif)")
+    parser.add_argument("--grammar", default=None, help='Grammar GBNF output: "citation" atau path file .gbnf')
+    parser.add_argument("--workers", type=int, default=1, help="Jumlah proses llama.cpp (>1 = worker pool)")
+    parser.add_argument("--answer-cache-size", type=int, default=512, help="0 = answer cache nonaktif")
+    parser.add_argument("--answer-cache-threshold", type=float, default=0.95)
+    parser.add_argument("--answer-cache-path", default=None, help="File SQLite untuk answer cache (opsional)")
+    parser.add_argument("--topic-gate-path", default=None, help="Model topic gate terlatih (JSON, python topic_gate.py); tanpa ini gate nonaktif")
+    parser.add_argument("--no-topic-gate", action="store_true", help="Nonaktifkan gate di luar topik sebelum retrieval")
+    parser.add_argument("--sessions", type=int, default=4,
+                        help="KV state sesi multi-turn di memori (0 = nonaktif; tidak tersedia dengan --workers > 1)")
+    parser.add_argument("--session-spill-dir", default=None, help="Folder spill KV state sesi (default: dibuang)")
+    parser.add_argument("--metrics-log", default=None, help="File JSONL untuk log waktu/memori per request (opsional)")
+    parser.add_argument("--stub", action="store_true", help="Pakai StubEngine (tanpa model) untuk pengujian")
+    return parser.parse_args()
+
+
+async def main(args):
+    metrics.configure(log_path=args.metrics_log)
+    engine = build_engine(args)
+    startup = engine.warmup()
+    print(f"⚙️  Engine siap dalam {startup['total']:.2f} detik")
+
+    max_concurrency = args.max_concurrency or max(args.workers, MAX_CONCURRENCY)
+    if args.workers <= 1 and not args.stub and max_concurrency > 1:
+        # Tanpa worker pool hanya ada satu Llama (tidak thread-safe): request diproses satu per satu
+        print(f"⚠️ --max-concurrency {max_concurrency} butuh --workers > 1; dipakai 1")
+        max_concurrency = 1
+    server = TaxbotServer(engine, max_concurrency=max_concurrency, max_queue=args.max_queue)
+    try:
+        await server.serve(args.host, args.port)
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main(parse_args()))
+    except KeyboardInterrupt:
+        print("Bye!")
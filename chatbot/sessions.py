@@ -0,0 +1,121 @@
+from collections import OrderedDict
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+
+class Session:
+    """
+    Satu percakapan multi-turn: riwayat turn (pesan user lengkap dengan konteks
+    + jawaban) dan KV state llama.cpp setelah turn terakhir.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.turns = []
+        self.state = None
+        self.state_path = None
+        self.last_used = time.time()
+
+
+class SessionStore:
+    """
+    LRU sesi percakapan. KV state hanya disimpan di memori untuk `max_states`
+    sesi terakhir; sisanya di-spill ke `spill_dir` (pickle LlamaState) atau
+    dibuang bila spill_dir tidak diset (turn berikutnya prefill ulang riwayat).
+
+    Args:
+        max_states (int): Jumlah KV state yang boleh tinggal di memori.
+        max_sessions (int): Jumlah sesi (riwayat) maksimum; sesi tertua dihapus.
+        spill_dir (str): Opsional, folder untuk KV state yang dikeluarkan dari memori.
+    """
+
+    def __init__(self, max_states=4, max_sessions=1024, spill_dir=None):
+        self.max_states = max_states
+        self.max_sessions = max_sessions
+        self.spill_dir = spill_dir
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"state_hits": 0, "disk_loads": 0, "state_misses": 0, "spills": 0, "drops": 0, "evictions": 0}
+
+    def get(self, session_id):
+        """Ambil (atau buat) sesi dan tandai sebagai terbaru."""
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = Session(session_id)
+                self.sessions[session_id] = session
+            self.sessions.move_to_end(session_id)
+            session.last_used = time.time()
+            self._evict_sessions()
+            return session
+
+    def load_state(self, session):
+        """KV state sesi dari memori atau disk; None bila tidak ada."""
+        with self.lock:
+            if session.state is not None:
+                self.stats["state_hits"] += 1
+                return session.state
+            if session.state_path and os.path.exists(session.state_path):
+                with open(session.state_path, "rb") as f:
+                    session.state = pickle.load(f)
+                os.remove(session.state_path)
+                session.state_path = None
+                self.stats["disk_loads"] += 1
+                self._enforce_states(keep=session)
+                return session.state
+            self.stats["state_misses"] += 1
+            return None
+
+    def save_state(self, session, state):
+        with self.lock:
+            session.state = state
+            self._enforce_states(keep=session)
+
+    def reset(self, session_id):
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+            if session is not None:
+                self._discard(session)
+
+    def _state_file(self, session):
+        name = hashlib.sha1(session.session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, f"{name}.kv")
+
+    def _enforce_states(self, keep=None):
+        # Urutan LRU: sesi yang paling lama tidak dipakai dikeluarkan lebih dulu
+        in_memory = [s for s in self.sessions.values() if s.state is not None and s is not keep]
+        excess = len(in_memory) + (keep is not None and keep.state is not None) - self.max_states
+        for session in in_memory[:max(excess, 0)]:
+            if self.spill_dir:
+                session.state_path = self._state_file(session)
+                with open(session.state_path, "wb") as f:
+                    pickle.dump(session.state, f)
+                self.stats["spills"] += 1
+            else:
+                self.stats["drops"] += 1
+            session.state = None
+
+    def _evict_sessions(self):
+        while len(self.sessions) > self.max_sessions:
+            _, session = self.sessions.popitem(last=False)
+            self._discard(session)
+            self.stats["evictions"] += 1
+
+    def _discard(self, session):
+        session.state = None
+        if session.state_path and os.path.exists(session.state_path):
+            os.remove(session.state_path)
+        session.state_path = None
+
+    def report(self):
+        return {
+            **self.stats,
+            "sessions": len(self.sessions),
+            "states_in_memory": sum(s.state is not None for s in self.sessions.values()),
+        }
@@ -0,0 +1,50 @@
+class DraftCounter:
+    """
+    Pembungkus draft model llama.cpp (LlamaPromptLookupDecoding atau turunan
+    LlamaDraftModel lain) yang menghitung jumlah token draft yang diusulkan.
+
+    llama-cpp-python tidak melaporkan berapa draft yang diterima. Setiap
+    putaran generate menghasilkan 1 token hasil sampling + draft yang lolos
+    verifikasi, lalu memanggil draft model satu kali; sehingga
+    token diterima ≈ completion_tokens - 1 - jumlah panggilan draft.
+    """
+
+    def __init__(self, draft_model):
+        self.draft_model = draft_model
+        self.calls = 0
+        self.drafted = 0
+
+    def __call__(self, input_ids, **kwargs):
+        draft = self.draft_model(input_ids, **kwargs)
+        self.calls += 1
+        self.drafted += len(draft)
+        return draft
+
+    def snapshot(self):
+        return self.calls, self.drafted
+
+    def since(self, snapshot, completion_tokens):
+        """Statistik spekulasi sejak `snapshot` untuk satu request."""
+        calls = self.calls - snapshot[0]
+        drafted = self.drafted - snapshot[1]
+        accepted = min(max(completion_tokens - 1 - calls, 0), drafted)
+        return {
+            "draft_calls": calls,
+            "draft_tokens": drafted,
+            "accepted_draft_tokens": accepted,
+            "draft_acceptance_rate": accepted / drafted if drafted else 0.0,
+        }
+
+
+def build_draft_model(speculative_tokens=0, draft_model=None):
+    """
+    Buat draft model untuk speculative decoding. `draft_model` (turunan
+    LlamaDraftModel) dipakai apa adanya; selain itu prompt-lookup decoding
+    dengan `speculative_tokens` token per langkah. None bila nonaktif.
+    """
+    if draft_model is None:
+        if not speculative_tokens:
+            return None
+        from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+        draft_model = LlamaPromptLookupDecoding(num_pred_tokens=speculative_tokens)
+    return DraftCounter(draft_model)
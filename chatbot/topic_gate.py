@@ -0,0 +1,222 @@
+import argparse
+from collections import Counter
+import json
+import math
+import os
+import re
+
+# Kata kunci domain: pertanyaan yang memuat salah satunya selalu diteruskan ke retrieval
+TAX_KEYWORDS = (
+    "pajak", "perpajakan", "ppn", "ppnbm", "pph", "npwp", "spt", "pkp", "bea", "cukai",
+    "fiskal", "faktur", "restitusi", "keberatan", "banding", "ketetapan", "skp", "skpkb",
+    "pemotongan", "pemungutan", "penghasilan", "tarif", "wajib", "djp", "kup", "pbb",
+    "bphtb", "sanksi", "denda", "bunga", "tunggakan", "penagihan", "pemeriksaan",
+    "pengusaha", "bendahara", "dividen", "royalti", "natura", "undang-undang", "pasal", "ayat",
+    "angsuran", "karyawan", "pegawai", "pribadi", "gaji", "pesangon", "terutang", "penyetoran",
+)
+
+# Log-odds rata-rata per n-gram di bawah -DEFAULT_MARGIN baru diblokir. Konservatif:
+# pertanyaan pajak yang terblokir jauh lebih mahal daripada off-topic yang lolos ke retrieval
+DEFAULT_MARGIN = 0.5
+
+# Pertanyaan pajak tanpa kata kunci domain (lanjutan percakapan, istilah umum) yang
+# pernah diblokir model seed; ikut dilatih sebagai pajak dan dicek di benchmark_topic_gate.py
+TAX_REGRESSION_QUESTIONS = [
+    "Bagaimana cara menghitung angsuran bulanan?",
+    "bagaimana dengan orang pribadi?",
+    "kalau untuk karyawan kontrak bagaimana?",
+    "bagaimana dengan badan?",
+    "lalu bagaimana kalau terlambat?",
+    "apakah ada pengecualiannya?",
+]
+
+# Contoh pertanyaan di luar topik pajak untuk model awal (tanpa data berlabel)
+OFF_TOPIC_SEED = [
+    "Bagaimana cuaca di Jakarta hari ini?",
+    "Siapa pemenang piala dunia tahun 2022?",
+    "Berikan resep nasi goreng yang enak",
+    "Apa ibukota negara Jepang?",
+    "Tolong buatkan puisi tentang cinta",
+    "Bagaimana cara belajar bahasa pemrograman python?",
+    "Rekomendasi film horor terbaru dong",
+    "Berapa jarak bumi ke bulan?",
+    "Siapa presiden pertama Amerika Serikat?",
+    "Bagaimana cara menurunkan berat badan dengan cepat?",
+    "Ceritakan lelucon lucu",
+    "Apa arti mimpi digigit ular?",
+    "Jam berapa sekarang?",
+    "Halo, apa kabar?",
+    "Bagaimana cara merawat kucing yang sedang sakit?",
+    "Lagu apa yang sedang populer minggu ini?",
+    "Bagaimana cara memperbaiki laptop yang tidak mau menyala?",
+    "Tim sepak bola mana yang paling banyak juara liga inggris?",
+    "Apa manfaat minum air putih di pagi hari?",
+    "Tuliskan kode javascript untuk mengurutkan array",
+]
+
+
+def normalize_text(text):
+    return re.sub(r"[^0-9a-z\- ]+", " ", text.lower()).split()
+
+
+def char_ngrams(text, n_min=3, n_max=5):
+    """N-gram karakter per kata (dengan penanda batas kata), dipakai sebagai fitur."""
+    grams = []
+    for word in normalize_text(text):
+        padded = f"<{word}>"
+        for n in range(n_min, n_max + 1):
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+class TopicGate:
+    """
+    Gate murah sebelum retrieval: kata kunci pajak + Naive Bayes n-gram karakter
+    (pajak vs di luar topik). Hanya pertanyaan yang jelas di luar topik
+    (skor di bawah -margin) yang langsung dijawab NO_ANSWER tanpa embedding,
+    pencarian vektor, maupun generate.
+
+    Args:
+        margin (float): Batas log-odds rata-rata per n-gram; makin besar makin konservatif.
+        keywords (tuple): Kata kunci yang selalu diteruskan ke retrieval.
+    """
+
+    def __init__(self, margin=DEFAULT_MARGIN, keywords=TAX_KEYWORDS):
+        self.margin = margin
+        self.keywords = set(keywords)
+        self.counts = {"tax": Counter(), "off_topic": Counter()}
+        self.docs = {"tax": 0, "off_topic": 0}
+        self.stats = {"checked": 0, "blocked": 0}
+
+    def fit(self, texts, labels):
+        """`labels`: True/"tax" untuk pertanyaan pajak, False/"off_topic" untuk di luar topik."""
+        for text, label in zip(texts, labels):
+            cls = "tax" if label in (True, 1, "tax", "pajak") else "off_topic"
+            self.counts[cls].update(char_ngrams(text))
+            self.docs[cls] += 1
+        self._prepare()
+        return self
+
+    def _prepare(self):
+        vocab = set(self.counts["tax"]) | set(self.counts["off_topic"])
+        self.vocab_size = max(len(vocab), 1)
+        self.totals = {cls: sum(c.values()) for cls, c in self.counts.items()}
+        n_docs = sum(self.docs.values()) or 1
+        self.prior = math.log((self.docs["tax"] + 1) / (n_docs + 2)) - math.log((self.docs["off_topic"] + 1) / (n_docs + 2))
+
+    def has_keyword(self, question):
+        return any(word in self.keywords for word in normalize_text(question))
+
+    def score(self, question):
+        """Log-odds rata-rata per n-gram (pajak vs di luar topik); > 0 condong ke pajak."""
+        grams = char_ngrams(question)
+        if not grams:
+            return self.prior
+        llr = 0.0
+        for gram in grams:
+            p_tax = (self.counts["tax"][gram] + 1) / (self.totals["tax"] + self.vocab_size)
+            p_off = (self.counts["off_topic"][gram] + 1) / (self.totals["off_topic"] + self.vocab_size)
+            llr += math.log(p_tax) - math.log(p_off)
+        return self.prior / len(grams) + llr / len(grams)
+
+    def is_off_topic(self, question):
+        self.stats["checked"] += 1
+        if self.has_keyword(question):
+            return False
+        blocked = self.score(question) < -self.margin
+        self.stats["blocked"] += blocked
+        return blocked
+
+    def report(self):
+        return dict(self.stats)
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "margin": self.margin,
+                "keywords": sorted(self.keywords),
+                "counts": {cls: dict(c) for cls, c in self.counts.items()},
+                "docs": self.docs,
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        gate = cls(margin=data["margin"], keywords=data["keywords"])
+        gate.counts = {c: Counter(v) for c, v in data["counts"].items()}
+        gate.docs = data["docs"]
+        gate._prepare()
+        return gate
+
+    @classmethod
+    def from_seed(cls, tax_questions=None, margin=DEFAULT_MARGIN):
+        """
+        Model awal dari BENCHMARK_QUESTIONS + TAX_REGRESSION_QUESTIONS + OFF_TOPIC_SEED.
+        Terlalu sedikit data untuk dipakai di produksi; hanya untuk benchmark/percobaan.
+        """
+        if tax_questions is None:
+            from benchmark_questions import BENCHMARK_QUESTIONS
+            tax_questions = list(BENCHMARK_QUESTIONS) + TAX_REGRESSION_QUESTIONS
+        texts = list(tax_questions) + OFF_TOPIC_SEED
+        labels = [True] * len(tax_questions) + [False] * len(OFF_TOPIC_SEED)
+        return cls(margin=margin).fit(texts, labels)
+
+
+def load_topic_gate(path=None):
+    """
+    Muat gate dari file JSON hasil `python topic_gate.py`. Tanpa path (atau file
+    belum ada) mengembalikan None: gate nonaktif. Repo tidak menyertakan model
+    terlatih dan model seed tidak layak dipakai (memblokir pertanyaan pajak yang
+    sah, sementara off-topic seperti "Bagaimana cuaca hari ini?" tetap lolos),
+    jadi fitur ini mati sampai gate dilatih dari data berlabel dan diukur
+    dengan benchmark_topic_gate.py pada sampel yang tidak ikut dilatih.
+    """
+    if path and os.path.exists(path):
+        return TopicGate.load(path)
+    print(f"⚠️ Topic gate nonaktif: model terlatih tidak ditemukan ({path or 'tanpa --topic-gate-path'}); "
+          "latih dengan `python topic_gate.py data_berlabel.jsonl`")
+    return None
+
+
+def load_labelled(path):
+    """
+    Baca JSONL berlabel: {"question"/"prompt": ..., "label": "tax"|"off_topic"}.
+    Baris tanpa "label" (mis. output get_question.py) dianggap pertanyaan pajak.
+    """
+    texts, labels = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            texts.append(row.get("question") or row.get("prompt"))
+            labels.append(row.get("label", "tax") in (True, 1, "tax", "pajak"))
+    return texts, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latih topic gate (Naive Bayes n-gram karakter) dari JSONL berlabel")
+    parser.add_argument("input_files", nargs="+", help="JSONL berlabel (field question/prompt + label)")
+    parser.add_argument("--output", default="model/topic_gate.json")
+    parser.add_argument("--margin", type=float, default=DEFAULT_MARGIN)
+    parser.add_argument("--no-seed", action="store_true", help="Jangan tambahkan OFF_TOPIC_SEED")
+    args = parser.parse_args()
+
+    texts, labels = [], []
+    for path in args.input_files:
+        t, l = load_labelled(path)
+        texts += t
+        labels += l
+    if not args.no_seed:
+        texts += TAX_REGRESSION_QUESTIONS + OFF_TOPIC_SEED
+        labels += [True] * len(TAX_REGRESSION_QUESTIONS) + [False] * len(OFF_TOPIC_SEED)
+
+    gate = TopicGate(margin=args.margin).fit(texts, labels)
+    gate.save(args.output)
+    print(f"✅ Topic gate dilatih dari {sum(labels)} pertanyaan pajak + {len(labels) - sum(labels)} di luar topik")
+    print(f"📝 Disimpan ke {args.output}")
+
+
+if __name__ == "__main__":
+    main()
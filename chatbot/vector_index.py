@@ -0,0 +1,366 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+from cache_utils import path_signature
+
+EMBEDDINGS_FILE = "embeddings.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+HEADER_FILE = "index.json"
+# Versi terkuantisasi dari embeddings.npy untuk tahap prefilter
+INT8_FILE = "embeddings_int8.npy"
+BINARY_FILE = "embeddings_binary.npy"
+QUANT_FILE = "quantization.npz"
+QUANTIZATIONS = ("int8", "binary")
+# Baris per blok saat scan int8: dinaikkan ke float32 per blok (~3 MB, muat di cache),
+# bukan seluruh matriks
+SCAN_BLOCK_ROWS = 2048
+
+
+class IndexDocument:
+    """Pengganti ringan langchain Document (page_content, metadata, id)."""
+
+    __slots__ = ("page_content", "metadata", "id")
+
+    def __init__(self, page_content, metadata, id=None):
+        self.page_content = page_content
+        self.metadata = metadata
+        self.id = id
+
+
+# ===========================
+# EXPORT DARI CHROMA
+# ===========================
+def export_index(chroma_path, out_dir, dtype="float32", embedding_model=None):
+    """
+    Tulis seluruh embedding koleksi Chroma sebagai matriks .npy kontigu
+    (N x D) + documents.jsonl (id, isi, metadata) + index.json (header).
+    """
+    from langchain_chroma import Chroma
+
+    db = Chroma(persist_directory=chroma_path)
+    data = db.get(include=["embeddings", "documents", "metadatas"])
+    space = (db._collection.metadata or {}).get("hnsw:space", "l2")
+
+    return write_index(
+        out_dir, data["embeddings"], data["ids"], data["documents"], data["metadatas"],
+        space=space,
+        dtype=dtype,
+        embedding_model=embedding_model,
+        chroma_path=chroma_path,
+        chroma_signature=path_signature([chroma_path]),
+    )
+
+
+def write_index(out_dir, embeddings, ids, documents, metadatas, space="l2", dtype="float32", **extra):
+    """Tulis folder index (embeddings.npy + documents.jsonl + index.json) dari array apa pun."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, EMBEDDINGS_FILE), matrix.astype(dtype))
+
+    with open(os.path.join(out_dir, DOCUMENTS_FILE), "w", encoding="utf-8") as f:
+        for doc_id, content, meta in zip(ids, documents, metadatas):
+            f.write(json.dumps([doc_id, content, meta or {}], ensure_ascii=False) + "\n")
+
+    header = {
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "dtype": dtype,
+        "space": space,
+        "chroma_signature": None,
+        **extra,
+    }
+    save_quantized(out_dir, matrix)
+    with open(os.path.join(out_dir, HEADER_FILE), "w", encoding="utf-8") as f:
+        json.dump(header, f, ensure_ascii=False, indent=2)
+    return header
+
+
+# ===========================
+# KUANTISASI (INT8 / BINER)
+# ===========================
+def quantize(matrix):
+    """
+    Kuantisasi per dimensi setelah dikurangi rata-rata: int8 simetris
+    (skala = max |x| / 127) dan bit tanda yang di-pack (dipad ke kelipatan
+    8 byte agar bisa dibaca sebagai uint64 untuk popcount).
+    Mengembalikan (center, scale, codes_int8, codes_binary).
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    center = matrix.mean(axis=0) if len(matrix) else np.zeros(matrix.shape[1], dtype=np.float32)
+    centered = matrix - center
+    scale = np.abs(centered).max(axis=0) / 127 if len(matrix) else np.ones(matrix.shape[1], dtype=np.float32)
+    scale[scale == 0] = 1.0
+    codes_int8 = np.clip(np.round(centered / scale), -127, 127).astype(np.int8)
+    return center.astype(np.float32), scale.astype(np.float32), codes_int8, pack_signs(centered)
+
+
+def pack_signs(centered):
+    bits = np.packbits(np.atleast_2d(centered) > 0, axis=1)
+    pad = -bits.shape[1] % 8
+    return np.ascontiguousarray(np.pad(bits, ((0, 0), (0, pad))))
+
+
+def save_quantized(out_dir, matrix):
+    center, scale, codes_int8, codes_binary = quantize(matrix)
+    np.save(os.path.join(out_dir, INT8_FILE), codes_int8)
+    np.save(os.path.join(out_dir, BINARY_FILE), codes_binary)
+    np.savez(os.path.join(out_dir, QUANT_FILE), center=center, scale=scale)
+
+
+def row_sq_norms(matrix):
+    """||x||^2 per baris dalam float32, per blok (aman untuk matriks float16 yang di-mmap)."""
+    out = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), SCAN_BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+        out[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+    return out
+
+
+def popcount(values):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    # numpy < 2.0: hitung per byte dengan tabel
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[values.view(np.uint8)].reshape(*values.shape, -1).sum(axis=-1)
+
+
+def normalize_rows(matrix):
+    """Normalisasi L2 per baris (vektor nol dibiarkan nol)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+# ===========================
+# RETRIEVER NUMPY (MMAP)
+# ===========================
+class NumpyIndex:
+    """
+    Index vektor in-process: matriks embedding di-mmap dari .npy, top-k
+    eksak dengan satu matmul. Skor = jarak dengan metrik yang sama seperti
+    koleksi Chroma asal (default squared L2), sehingga ambang di
+    format_context() tetap berlaku. Method-nya meniru langchain Chroma
+    yang dipakai engine/retrieval_cache, jadi bisa dipakai sebagai `db`.
+
+    Dengan `shortlist_dim`, pencarian dua tahap ala Matryoshka: kandidat
+    dipilih dari `shortlist_dim` dimensi pertama (dinormalisasi, cosine),
+    lalu hanya `shortlist_size` kandidat itu yang diskor ulang di dimensi penuh.
+
+    Dengan `quantization` ("int8" atau "binary"), scan penuh dilakukan pada
+    kode int8 (4x lebih kecil) atau bit tanda + jarak Hamming (32x lebih
+    kecil); hanya `prefilter_size` kandidat yang diskor ulang dengan float
+    dari matriks yang di-mmap (tidak pernah dimuat penuh ke memori).
+
+    Args:
+        path (str): Folder hasil export_index().
+        embedding_function: Embedder dengan embed_query() (untuk similarity_search_with_score).
+        chroma_path (str): Opsional, Chroma DB asal; beri peringatan bila sudah berubah sejak export.
+        shortlist_dim (int): Opsional, dimensi terpotong untuk tahap shortlist (mis. 64 atau 128).
+        shortlist_size (int): Jumlah kandidat shortlist yang diskor ulang di dimensi penuh.
+        quantization (str): Opsional, "int8" atau "binary" untuk tahap prefilter.
+        prefilter_size (int): Jumlah kandidat prefilter yang diskor ulang dengan float.
+    """
+
+    def __init__(
+        self,
+        path,
+        embedding_function=None,
+        chroma_path=None,
+        shortlist_dim=None,
+        shortlist_size=100,
+        quantization=None,
+        prefilter_size=200,
+    ):
+        if quantization not in (None,) + QUANTIZATIONS:
+            raise ValueError(f"quantization harus salah satu dari {QUANTIZATIONS}, bukan {quantization!r}")
+        if quantization and shortlist_dim:
+            raise ValueError("shortlist_dim dan quantization tidak bisa dipakai bersamaan")
+        self.path = path
+        self.embedding_function = embedding_function
+
+        with open(os.path.join(path, HEADER_FILE), "r", encoding="utf-8") as f:
+            self.header = json.load(f)
+        if chroma_path and os.path.exists(chroma_path) and path_signature([chroma_path]) != self.header["chroma_signature"]:
+            print(f"⚠️  Index {path} lebih lama dari Chroma DB {chroma_path}; jalankan export ulang")
+
+        matrix = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+        # float16 menghemat disk/page cache; untuk BLAS dinaikkan sekali ke float32.
+        # Dengan kuantisasi matriks float hanya dibaca untuk rescore, jadi tetap di-mmap.
+        self.matrix = matrix if matrix.dtype == np.float32 or quantization else np.asarray(matrix, dtype=np.float32)
+        self.space = self.header["space"]
+        sq_norms = row_sq_norms(self.matrix) if self.space in ("l2", "cosine") else None
+        self.sq_norms = sq_norms if self.space == "l2" else None
+        self.norms = np.sqrt(sq_norms) if self.space == "cosine" else None
+
+        self.quantization = quantization
+        self.prefilter_size = prefilter_size
+        self.codes = None
+        if quantization:
+            self.load_quantized()
+
+        self.ids, self.documents, self.metadatas = [], [], []
+        with open(os.path.join(path, DOCUMENTS_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                doc_id, content, meta = json.loads(line)
+                self.ids.append(doc_id)
+                self.documents.append(content)
+                self.metadatas.append(meta)
+        self.positions = {doc_id: i for i, doc_id in enumerate(self.ids)}
+
+        self.shortlist_dim = shortlist_dim if shortlist_dim and shortlist_dim < self.matrix.shape[1] else None
+        self.shortlist_size = shortlist_size
+        # Salinan kecil (N x shortlist_dim) yang kontigu, dinormalisasi ulang setelah dipotong
+        self.short_matrix = normalize_rows(self.matrix[:, :self.shortlist_dim]) if self.shortlist_dim else None
+
+    def load_quantized(self):
+        code_file = os.path.join(self.path, INT8_FILE if self.quantization == "int8" else BINARY_FILE)
+        if os.path.exists(code_file):
+            with np.load(os.path.join(self.path, QUANT_FILE)) as data:
+                self.center, self.scale = data["center"], data["scale"]
+            self.codes = np.load(code_file, mmap_mode="r")
+        else:
+            # Index lama tanpa file kuantisasi: hitung sekali di memori
+            print(f"⚠️  {code_file} tidak ada; kuantisasi dihitung saat load (jalankan export ulang)")
+            self.center, self.scale, codes_int8, codes_binary = quantize(self.matrix)
+            self.codes = codes_int8 if self.quantization == "int8" else codes_binary
+        if self.quantization == "binary":
+            self.codes = self.codes.view(np.uint64)
+
+    def scan_bytes(self):
+        """Ukuran struktur yang di-scan penuh per query (byte)."""
+        if self.codes is not None:
+            return self.codes.nbytes
+        if self.short_matrix is not None:
+            return self.short_matrix.nbytes
+        return self.matrix.nbytes
+
+    def __len__(self):
+        return len(self.ids)
+
+    def distances(self, queries):
+        """Jarak (Q x N) dari query ke semua vektor, metrik sama dengan Chroma."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        return self._metric(queries, queries @ self.matrix.T, self.sq_norms, self.norms)
+
+    def _metric(self, queries, dots, sq_norms, norms):
+        if self.space == "l2":
+            return np.einsum("ij,ij->i", queries, queries)[:, None] + sq_norms - 2 * dots
+        if self.space == "ip":
+            return 1.0 - dots
+        q_norms = np.linalg.norm(queries, axis=1)
+        return 1.0 - dots / np.maximum(q_norms[:, None] * norms, 1e-12)
+
+    def shortlist(self, queries):
+        """Indeks kandidat (Q x shortlist_size) dari vektor terpotong `shortlist_dim`."""
+        short_queries = normalize_rows(queries[:, :self.shortlist_dim])
+        scores = short_queries @ self.short_matrix.T
+        size = min(self.shortlist_size, scores.shape[1])
+        return np.argpartition(-scores, size - 1, axis=1)[:, :size]
+
+    def prefilter(self, queries):
+        """Indeks kandidat (Q x prefilter_size) dari kode int8 / jarak Hamming bit tanda."""
+        size = min(self.prefilter_size, len(self.ids))
+        if self.quantization == "binary":
+            query_bits = pack_signs(queries - self.center).view(np.uint64)
+            scores = np.stack([popcount(self.codes ^ bits).sum(axis=1, dtype=np.int32) for bits in query_bits])
+        else:
+            # x ~ center + scale * code  =>  q.x ~ q.center + (q * scale).code
+            scaled = queries * self.scale
+            dots = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+            for start in range(0, len(self.ids), SCAN_BLOCK_ROWS):
+                block = np.asarray(self.codes[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+                dots[:, start:start + len(block)] = scaled @ block.T
+            dots += (queries @ self.center)[:, None]
+            scores = self._metric(queries, dots, self.sq_norms, self.norms)
+        return np.argpartition(scores, size - 1, axis=1)[:, :size]
+
+    def candidates(self, queries):
+        """Kandidat untuk rescore float, atau None untuk pencarian eksak penuh."""
+        if self.shortlist_dim is not None:
+            return self.shortlist(queries)
+        if self.quantization:
+            return self.prefilter(queries)
+        return None
+
+    def rerank_distances(self, queries, candidates):
+        """Jarak dimensi penuh (Q x S) hanya untuk kandidat shortlist per query."""
+        vectors = np.asarray(self.matrix[candidates], dtype=np.float32)
+        dots = np.einsum("qd,qsd->qs", queries, vectors)
+        sq_norms = self.sq_norms[candidates] if self.sq_norms is not None else None
+        norms = self.norms[candidates] if self.norms is not None else None
+        return self._metric(queries, dots, sq_norms, norms)
+
+    def top_k(self, distances, k):
+        k = min(k, distances.shape[1])
+        idx = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(distances, idx, axis=1).argsort(axis=1)
+        return np.take_along_axis(idx, order, axis=1)
+
+    def _result(self, i, distance):
+        doc = IndexDocument(self.documents[i], self.metadatas[i], id=self.ids[i])
+        return doc, float(max(distance, 0.0))
+
+    def search_many_by_vector(self, embeddings, k):
+        """Satu matmul untuk banyak query; list [(doc, score), ...] per query."""
+        if len(embeddings) == 0:
+            return []
+        queries = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        candidates = self.candidates(queries)
+        if candidates is None:
+            distances = self.distances(queries)
+            return [
+                [self._result(i, row[i]) for i in idx]
+                for row, idx in zip(distances, self.top_k(distances, k))
+            ]
+
+        distances = self.rerank_distances(queries, candidates)
+        return [
+            [self._result(cand[j], row[j]) for j in idx]
+            for cand, row, idx in zip(candidates, distances, self.top_k(distances, k))
+        ]
+
+    # ---------- antarmuka mirip langchain Chroma ----------
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4):
+        return self.search_many_by_vector([embedding], k)[0]
+
+    def similarity_search_with_score(self, query, k=4):
+        return self.similarity_search_by_vector_with_relevance_scores(self.embedding_function.embed_query(query), k)
+
+    def distances_for(self, embedding, ids):
+        """Jarak dimensi penuh ke id tertentu (None bila tidak ada), urutan sesuai `ids`."""
+        rows = [self.positions.get(i) for i in ids]
+        present = np.array([r for r in rows if r is not None], dtype=np.int64)
+        query = np.atleast_2d(np.asarray(embedding, dtype=np.float32))
+        distances = iter(self.rerank_distances(query, present[None, :])[0]) if len(present) else iter(())
+        return [float(max(next(distances), 0.0)) if r is not None else None for r in rows]
+
+    def get_documents(self, ids):
+        """Document per id (None bila tidak ada), urutan sesuai `ids`."""
+        return [self._result(self.positions[i], 0.0)[0] if i in self.positions else None for i in ids]
+
+    def get(self, ids=None, include=None):
+        positions = [self.positions[i] for i in ids if i in self.positions] if ids is not None else range(len(self.ids))
+        return {
+            "ids": [self.ids[i] for i in positions],
+            "documents": [self.documents[i] for i in positions],
+            "metadatas": [self.metadatas[i] for i in positions],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export koleksi Chroma ke index NumPy (mmap)")
+    parser.add_argument("--chroma-path", default="database/chroma_uu_db_indo_v2")
+    parser.add_argument("--out", default="database/numpy_index")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--embedding-model", default=None, help="Dicatat di header sebagai pengingat model embedding")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    header = export_index(args.chroma_path, args.out, args.dtype, args.embedding_model)
+    print(f"✅ {header['count']} vektor ({header['dim']} dim, {header['dtype']}, {header['space']}) "
+          f"diexport ke {args.out} dalam {time.perf_counter() - start:.2f} detik")
+
+
+if __name__ == "__main__":
+    main()
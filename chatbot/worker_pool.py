@@ -0,0 +1,251 @@
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+
+def split_cores(n_workers, cores=None):
+    """
+    Bagi core CPU menjadi `n_workers` kelompok yang tidak saling tumpang tindih.
+    """
+    if cores is None:
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+    if n_workers > len(cores):
+        raise ValueError(f"n_workers ({n_workers}) melebihi jumlah core ({len(cores)})")
+    per_worker = len(cores) // n_workers
+    return [cores[i * per_worker:(i + 1) * per_worker] for i in range(n_workers)]
+
+
+def worker_main(worker_id, engine_kwargs, cores, task_conn, result_conn):
+    """
+    Proses worker: pin ke `cores`, muat GGUF (mmap, page dibagi antar-proses
+    oleh OS) dengan n_threads = len(cores), lalu layani task sampai menerima None.
+    Gagal memuat model dilaporkan ("load_error", traceback) lewat result_conn.
+    """
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+
+        from engine import TaxbotEngine
+
+        start = time.perf_counter()
+        engine = TaxbotEngine(n_threads=len(cores), **engine_kwargs)
+        engine.load_llm()
+    except BaseException:
+        result_conn.send(("load_error", None, traceback.format_exc()))
+        return
+    result_conn.send(("ready", None, time.perf_counter() - start))
+
+    while True:
+        task = task_conn.recv()
+        if task is None:
+            break
+        request_id, question, context, source, generation_kwargs = task
+        stats = {}
+        try:
+            text = engine.infer(question, context, source, stats=stats, **generation_kwargs)
+            result_conn.send(("done", request_id, (text, {**stats, "worker": worker_id})))
+        except Exception as e:
+            result_conn.send(("error", request_id, repr(e)))
+
+    engine.close()
+
+
+class LlamaWorkerPool:
+    """
+    Pool proses llama.cpp: setiap worker memuat GGUF yang sama dengan alokasi
+    core CPU sendiri. Request dikirim ke worker yang sedang idle; bila semua
+    sibuk, request menunggu di antrean proses utama.
+
+    Setiap worker punya pipe task dan pipe hasil sendiri (bukan satu Queue
+    bersama), sehingga worker yang mati tiba-tiba tidak bisa mengunci antrean
+    worker lain; request yang sedang dikerjakannya langsung digagalkan.
+
+    Args:
+        model_path (str): Path file GGUF.
+        n_workers (int): Jumlah proses worker.
+        n_ctx (int): Context window per worker.
+        cores (list): Opsional, daftar core yang boleh dipakai (default: semua).
+        engine_kwargs: Argumen tambahan untuk TaxbotEngine di worker
+            (generation_kwargs, prefix_cache, ...).
+    """
+
+    def __init__(self, model_path, n_workers=2, n_ctx=2048, cores=None, **engine_kwargs):
+        self.model_path = model_path
+        self.n_workers = n_workers
+        self.core_groups = split_cores(n_workers, cores)
+        self.engine_kwargs = {"model_path": model_path, "n_ctx": n_ctx, **engine_kwargs}
+
+        ctx = mp.get_context("spawn")
+        self.task_conns, self.result_conns, self.processes = [], [], []
+        for i, cores_i in enumerate(self.core_groups):
+            task_reader, task_writer = ctx.Pipe(duplex=False)
+            result_reader, result_writer = ctx.Pipe(duplex=False)
+            self.task_conns.append(task_writer)
+            self.result_conns.append(result_reader)
+            self.processes.append(ctx.Process(
+                target=worker_main,
+                args=(i, self.engine_kwargs, cores_i, task_reader, result_writer),
+                daemon=True,
+            ))
+
+        self.futures = {}
+        self.backlog = deque()
+        self.idle = []
+        self.running = {}
+        self.alive = set()
+        self.lock = threading.Lock()
+        self.request_ids = itertools.count()
+        self.load_seconds = {}
+        self.dispatcher = None
+        self.closed = False
+
+    def start(self, timeout=600):
+        """
+        Jalankan semua worker dan tunggu sampai model selesai dimuat. RuntimeError
+        (berisi traceback worker) bila ada worker yang gagal memuat model atau mati,
+        TimeoutError bila melewati `timeout`.
+        """
+        for p in self.processes:
+            p.start()
+
+        deadline = time.monotonic() + timeout
+        waiting = {conn: i for i, conn in enumerate(self.result_conns)}
+        sentinels = {p.sentinel: i for i, p in enumerate(self.processes)}
+        try:
+            while waiting:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Worker llama.cpp belum siap setelah {timeout} detik")
+                for ready in wait(list(waiting) + list(sentinels), timeout=remaining):
+                    if ready in waiting:
+                        i = waiting.pop(ready)
+                        kind, _, payload = ready.recv()
+                        if kind == "load_error":
+                            raise RuntimeError(f"Worker {i} gagal memuat model:\n{payload}")
+                        self.load_seconds[i] = payload
+                    elif sentinels[ready] in waiting.values():
+                        i = sentinels[ready]
+                        raise RuntimeError(f"Worker {i} mati saat memuat model (exitcode {self.processes[i].exitcode})")
+        except BaseException:
+            for p in self.processes:
+                if p.is_alive():
+                    p.terminate()
+            raise
+
+        self.alive = set(range(self.n_workers))
+        self.idle = list(range(self.n_workers))
+        self.dispatcher = threading.Thread(target=self._dispatch_results, daemon=True)
+        self.dispatcher.start()
+        return self.load_seconds
+
+    def _send(self, worker_id, task):
+        """Kirim task ke worker idle (dipanggil dengan self.lock dipegang)."""
+        self.running[worker_id] = task[0]
+        self.task_conns[worker_id].send(task)
+
+    def _resolve(self, request_id, kind, payload):
+        with self.lock:
+            entry = self.futures.pop(request_id, None)
+        if entry is None:
+            return
+        future, stats = entry
+        if kind == "done":
+            text, worker_stats = payload
+            if stats is not None:
+                stats.update(worker_stats)
+            future.set_result(text)
+        else:
+            future.set_exception(RuntimeError(payload))
+
+    def _worker_died(self, worker_id):
+        with self.lock:
+            self.alive.discard(worker_id)
+            if worker_id in self.idle:
+                self.idle.remove(worker_id)
+            request_id = self.running.pop(worker_id, None)
+            orphans = [task[0] for task in self.backlog] if not self.alive else []
+            if not self.alive:
+                self.backlog.clear()
+        self.processes[worker_id].join(timeout=1)
+        exitcode = self.processes[worker_id].exitcode
+        if request_id is not None:
+            self._resolve(request_id, "error", f"Worker {worker_id} mati (exitcode {exitcode})")
+        for request_id in orphans:
+            self._resolve(request_id, "error", "Semua worker llama.cpp mati")
+
+    def _handle_result(self, worker_id, message):
+        kind, request_id, payload = message
+        with self.lock:
+            self.running.pop(worker_id, None)
+            if worker_id in self.alive:
+                if self.backlog:
+                    self._send(worker_id, self.backlog.popleft())
+                else:
+                    self.idle.append(worker_id)
+        self._resolve(request_id, kind, payload)
+
+    def _dispatch_results(self):
+        conns = {conn: i for i, conn in enumerate(self.result_conns)}
+        sentinels = {p.sentinel: i for i, p in enumerate(self.processes)}
+        while not self.closed and self.alive:
+            watched = [c for c, i in conns.items() if i in self.alive] + [s for s, i in sentinels.items() if i in self.alive]
+            for ready in wait(watched, timeout=0.5):
+                worker_id = conns[ready] if ready in conns else sentinels[ready]
+                if worker_id not in self.alive:
+                    continue
+                conn = self.result_conns[worker_id]
+                try:
+                    # Hasil yang sempat dikirim sebelum proses keluar diproses lebih dulu
+                    while conn.poll():
+                        self._handle_result(worker_id, conn.recv())
+                except (EOFError, OSError):
+                    pass
+                if ready in sentinels or not self.processes[worker_id].is_alive():
+                    self._worker_died(worker_id)
+
+    def submit(self, question, context, source, stats=None, **generation_kwargs):
+        """Kirim satu request ke pool. Mengembalikan Future berisi teks jawaban."""
+        if self.dispatcher is None:
+            self.start()
+        future = Future()
+        request_id = next(self.request_ids)
+        task = (request_id, question, context, source, generation_kwargs)
+        with self.lock:
+            if not self.alive:
+                raise RuntimeError("Semua worker llama.cpp mati")
+            self.futures[request_id] = (future, stats)
+            if self.idle:
+                self._send(self.idle.pop(), task)
+            else:
+                self.backlog.append(task)
+        return future
+
+    def infer(self, question, context, source, stats=None, **generation_kwargs):
+        return self.submit(question, context, source, stats=stats, **generation_kwargs).result()
+
+    def close(self):
+        if self.closed or self.dispatcher is None:
+            return
+        self.closed = True
+        self.dispatcher.join(timeout=5)
+        for i, conn in enumerate(self.task_conns):
+            if self.processes[i].is_alive():
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+        for p in self.processes:
+            p.join(timeout=30)
+            if p.is_alive():
+                p.terminate()
+        with self.lock:
+            request_ids = list(self.futures)
+            self.backlog.clear()
+        for request_id in request_ids:
+            self._resolve(request_id, "error", "Worker pool ditutup")
@@ -2,65 +2,272 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from langchain_huggingface  import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
+from collections import deque
+import argparse
+import hashlib
 import json
+import multiprocessing
+import numpy as np
 import os
-import shutil
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chatbot"))
+from bm25_index import build_from_chroma, bm25_path
+from embedding_cache import cached_huggingface_embeddings
 
 CHROMA_PATH = "database/chroma_uu_db_indo_v3"
-FOLDER_PATH = "/home/ubuntu/projek_chatbot_galang/process_dataset/dataset/"  
+FOLDER_PATH = "/home/ubuntu/projek_chatbot_galang/process_dataset/dataset/"
+EMBEDDING_MODEL = "LazarusNLP/all-indo-e5-small-v4"
+# Cache embedding bersama (model + revisi, hash teks): rebuild setelah splitter berubah hanya meng-embed teks baru
+EMBEDDING_CACHE_PATH = "database/embedding_cache"
+# Laju embedding run terakhir (detik/chunk), untuk estimasi waktu yang dihemat
+MANIFEST_FILE = "index_manifest.json"
+ID_FIELDS = ("uu", "bab", "pasal", "ayat", "sumber", "start_index")
+# Jumlah chunk per batch embed + upsert Chroma (juga batas record per panggilan delete)
+BATCH_SIZE = 256
+# 1 = embed di proses ini; >1 = pool proses CPU, masing-masing memuat model sekali
+EMBED_WORKERS = 1
+# Batch yang boleh menunggu/diproses per worker; membatasi memori berapa pun ukuran korpus
+MAX_PENDING_PER_WORKER = 2
+PROGRESS_EVERY = 10
 
 def load_documents():
-    documents = []
-    for filename in os.listdir(FOLDER_PATH):
+    """Generator Document per record JSON (file dibaca satu per satu, urutan nama file)."""
+    n_documents = 0
+    for filename in sorted(os.listdir(FOLDER_PATH)):
         if filename.endswith(".json"):
             file_path = os.path.join(FOLDER_PATH, filename)
             with open(file_path, "r", encoding="utf-8") as f:
-                data_list = json.load(f) 
-                for data in data_list:     
-                    text = f"""
+                data_list = json.load(f)
+            for data in data_list:
+                text = f"""
                     {data.get('Isi', '')} Penjelasan: {data.get('Penjelasan', '')}
                     """
-                    doc = Document(
-                        page_content=text,
-                        metadata={
-                            "uu": data.get("UU", ""),
-                            "bab": data.get("BAB", ""),
-                            "pasal": data.get("Pasal", ""),
-                            "ayat": data.get("Ayat", ""),
-                            "sumber": data.get("Sumber", ""),
-                        }
-                    )
-                    documents.append(doc)
-    print(f"Loaded {len(documents)} documents from {FOLDER_PATH}")
-    return documents
+                n_documents += 1
+                yield Document(
+                    page_content=text,
+                    metadata={
+                        "uu": data.get("UU", ""),
+                        "bab": data.get("BAB", ""),
+                        "pasal": data.get("Pasal", ""),
+                        "ayat": data.get("Ayat", ""),
+                        "sumber": data.get("Sumber", ""),
+                    }
+                )
+    print(f"Loaded {n_documents} documents from {FOLDER_PATH}")
 
 def split_text(documents):
+    """Generator chunk: setiap dokumen di-split begitu dibaca."""
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=700,
         chunk_overlap=100,
         length_function=len,
         add_start_index=True
     )
-    chunks = text_splitter.split_documents(documents)
-    print(f"Split {len(documents)} documents into {len(chunks)} chunks.")
-    return chunks
-
-def save_to_chroma(chunks):
-    if os.path.exists(CHROMA_PATH):
-        shutil.rmtree(CHROMA_PATH)
-    
-    embeddings = HuggingFaceEmbeddings(
-        model_name="LazarusNLP/all-indo-e5-small-v4"
-    )
+    for document in documents:
+        yield from text_splitter.split_documents([document])
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def assign_ids(chunks):
+    """
+    Generator (id, chunk): id stabil dari metadata (uu, bab, pasal, ayat, sumber,
+    start_index) + hash isi di metadata["content_hash"]. Metadata kembar diberi
+    akhiran urutan.
+    """
+    seen = {}
+    for chunk in chunks:
+        key = "|".join(str(chunk.metadata.get(field, "")) for field in ID_FIELDS)
+        chunk_id = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+        seen[chunk_id] = seen.get(chunk_id, 0) + 1
+        if seen[chunk_id] > 1:
+            chunk_id = f"{chunk_id}-{seen[chunk_id] - 1}"
+        chunk.metadata["content_hash"] = content_hash(chunk.page_content)
+        yield chunk_id, chunk
+
+def batched(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def load_manifest(chroma_path):
+    path = os.path.join(chroma_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(chroma_path, manifest):
+    with open(os.path.join(chroma_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+# ===========================
+# POOL EMBEDDING (PROSES CPU)
+# ===========================
+_worker_embeddings = None
+
+def init_embed_worker(model_name, batch_size, threads):
+    global _worker_embeddings
+    import torch
+    torch.set_num_threads(threads)
+    _worker_embeddings = HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"batch_size": batch_size})
+
+def embed_texts(texts):
+    return _worker_embeddings.embed_documents(texts)
+
+def embed_batches(batches, embeddings, workers, batch_size):
+    """
+    Generator (batch, vektor) dengan urutan sama seperti `batches`;
+    `embeddings` adalah CachedEmbeddings. Dengan workers > 1, cache diperiksa
+    di proses ini dan hanya teks yang belum ada dikirim ke pool proses, paling
+    banyak workers * MAX_PENDING_PER_WORKER batch yang sedang berjalan. Teks
+    yang sedang di-embed batch sebelumnya tidak dikirim lagi; vektornya diambil
+    dari cache setelah batch itu selesai (batch diselesaikan berurutan).
+    """
+    if workers <= 1:
+        for batch in batches:
+            yield batch, embeddings.embed_documents([c.page_content for _, c in batch])
+        return
+
+    in_flight = set()
 
-    Chroma.from_documents(
-        chunks,
-        embeddings,
-        persist_directory=CHROMA_PATH
+    def finish(item):
+        batch, texts, vectors, missing, sent, result = item
+        by_text = {}
+        if result is not None:
+            computed = result.get()
+            embeddings.remember(sent, computed)
+            in_flight.difference_update(sent)
+            by_text = dict(zip(sent, computed))
+        earlier = [i for i in missing if texts[i] not in by_text]
+        if earlier:
+            for i, vector in zip(earlier, embeddings.store.get_many([texts[i] for i in earlier])):
+                vectors[i] = vector
+        for i in missing:
+            if texts[i] in by_text:
+                vectors[i] = by_text[texts[i]]
+        # Vektor dari cache (np.float32) dan dari pool (float) disamakan jadi list float
+        return batch, [np.asarray(v, dtype=np.float32).tolist() for v in vectors]
+
+    threads = max(1, (os.cpu_count() or workers) // workers)
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, initializer=init_embed_worker, initargs=(EMBEDDING_MODEL, batch_size, threads)) as pool:
+        pending = deque()
+        for batch in batches:
+            texts = [c.page_content for _, c in batch]
+            vectors, missing = embeddings.lookup(texts)
+            sent = [t for t in dict.fromkeys(texts[i] for i in missing) if t not in in_flight]
+            in_flight.update(sent)
+            result = pool.apply_async(embed_texts, (sent,)) if sent else None
+            pending.append((batch, texts, vectors, missing, sent, result))
+            if len(pending) >= workers * MAX_PENDING_PER_WORKER:
+                yield finish(pending.popleft())
+        while pending:
+            yield finish(pending.popleft())
+
+# ===========================
+# BUILD STREAMING: FILE -> SPLIT -> EMBED -> UPSERT
+# ===========================
+def save_to_chroma(chunks, chroma_path=CHROMA_PATH, batch_size=BATCH_SIZE, workers=EMBED_WORKERS,
+                   cache_dir=EMBEDDING_CACHE_PATH):
+    """
+    Indexing inkremental dan streaming: chunk dibandingkan dengan hash isi di
+    DB, yang baru/berubah di-embed per batch lalu langsung di-upsert, chunk yang
+    hilang dari dataset dihapus. Yang disimpan di memori hanya id + hash.
+    Mengembalikan True bila isi DB berubah.
+    """
+    start = time.perf_counter()
+    # Model baru dimuat saat cache miss pertama (dengan pool: hanya di worker);
+    # vektor di-upsert langsung ke koleksi
+    embeddings = cached_huggingface_embeddings(
+        EMBEDDING_MODEL,
+        cache_dir=cache_dir,
+        encode_kwargs={"batch_size": batch_size}
     )
-    print(f"Saved {len(chunks)} chunks to Chroma DB at '{CHROMA_PATH}'")
+    db = Chroma(persist_directory=chroma_path, embedding_function=embeddings)
+
+    existing = db.get(include=["metadatas"])
+    stored_hashes = {i: (m or {}).get("content_hash") for i, m in zip(existing["ids"], existing["metadatas"])}
+    del existing
+
+    counts = {"added": 0, "updated": 0, "skipped": 0}
+    seen_ids = set()
+
+    def changed_chunks():
+        for chunk_id, chunk in assign_ids(chunks):
+            seen_ids.add(chunk_id)
+            stored = stored_hashes.get(chunk_id, False)
+            if stored == chunk.metadata["content_hash"]:
+                counts["skipped"] += 1
+                continue
+            counts["added" if stored is False else "updated"] += 1
+            yield chunk_id, chunk
+
+    # DB lama (id acak dari Chroma.from_documents) terhapus semua di akhir dan dibangun ulang sekali
+    embed_start = time.perf_counter()
+    n_embedded = 0
+    for n_batches, (batch, vectors) in enumerate(
+        embed_batches(batched(changed_chunks(), batch_size), embeddings, workers, batch_size), start=1
+    ):
+        db._collection.upsert(
+            ids=[i for i, _ in batch],
+            embeddings=vectors,
+            documents=[c.page_content for _, c in batch],
+            metadatas=[c.metadata for _, c in batch],
+        )
+        n_embedded += len(batch)
+        if n_batches % PROGRESS_EVERY == 0:
+            print(f"⏳ {n_embedded} chunks embedded ({n_embedded / (time.perf_counter() - embed_start):.1f} chunks/s)")
+    embed_seconds = time.perf_counter() - embed_start
+
+    removed = sorted(set(stored_hashes) - seen_ids)
+    for offset in range(0, len(removed), batch_size):
+        db.delete(ids=removed[offset:offset + batch_size])
+
+    # Laju dihitung dari teks yang benar-benar dikirim ke model (tanpa duplikat / cache hit)
+    cache = embeddings.store.report()
+    manifest = load_manifest(chroma_path)
+    if embeddings.computed:
+        manifest["seconds_per_chunk"] = embed_seconds / embeddings.computed
+        manifest["embedding_model"] = EMBEDDING_MODEL
+    save_manifest(chroma_path, manifest)
+
+    total_seconds = time.perf_counter() - start
+    n_chunks = len(seen_ids)
+    print(f"Split into {n_chunks} chunks.")
+    print(f"Chroma DB at '{chroma_path}': {counts['added']} added, {counts['updated']} updated, "
+          f"{len(removed)} removed, {counts['skipped']} unchanged (skipped) in {total_seconds:.2f}s")
+    if n_embedded:
+        print(f"Embedded {n_embedded} chunks at {n_embedded / embed_seconds:.1f} chunks/s "
+              f"(batch {batch_size}, {workers} worker(s)); pipeline {n_chunks / total_seconds:.1f} chunks/s")
+        print(f"Embedding cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.1%}); "
+              f"{embeddings.computed} texts sent to the model")
+    if "seconds_per_chunk" in manifest:
+        print(f"Saved ~{counts['skipped'] * manifest['seconds_per_chunk']:.1f}s of embedding vs a full rebuild "
+              f"({manifest['seconds_per_chunk'] * 1000:.1f} ms/chunk)")
+    return bool(n_embedded or removed)
+
+def save_bm25_index(chroma_path=CHROMA_PATH):
+    # Inverted index BM25 untuk retrieval hybrid, id chunk sama dengan di Chroma
+    index, path = build_from_chroma(chroma_path)
+    print(f"Saved BM25 index ({len(index.vocab)} terms) for {len(index)} chunks at '{path}'")
 
 if __name__ == "__main__":
-    documents = load_documents()
-    chunks = split_text(documents)
-    save_to_chroma(chunks)
+    parser = argparse.ArgumentParser(description="Build/update Chroma DB secara streaming dan inkremental")
+    parser.add_argument("--chroma-path", default=CHROMA_PATH)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Chunk per batch embed + upsert")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS, help="Proses embedding CPU (1 = tanpa pool)")
+    parser.add_argument("--embedding-cache", default=EMBEDDING_CACHE_PATH, help="Folder cache embedding bersama")
+    args = parser.parse_args()
+
+    chunks = split_text(load_documents())
+    changed = save_to_chroma(chunks, args.chroma_path, args.batch_size, args.workers, args.embedding_cache)
+    if changed or not os.path.exists(bm25_path(args.chroma_path)):
+        save_bm25_index(args.chroma_path)
@@ -1,15 +1,21 @@
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 import json
 import ollama
 from tqdm import tqdm
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chatbot"))
+from embedding_cache import cached_huggingface_embeddings
 
 CHROMA_PATH = "database/chroma_uu_db_indo_v2"
 OUTPUT_JSONL = "database/generated_qa_dataset_v4.jsonl"
+# Cache embedding bersama create_db.py: skrip ini hanya membaca chunk (db.get), model tidak pernah dimuat
+EMBEDDING_CACHE_PATH = "database/embedding_cache"
 
-embedding_function = HuggingFaceEmbeddings(
-    model_name="LazarusNLP/all-indo-e5-small-v4",
+embedding_function = cached_huggingface_embeddings(
+    "LazarusNLP/all-indo-e5-small-v4",
+    cache_dir=EMBEDDING_CACHE_PATH,
     model_kwargs={"device": "cuda"},
 )
 
@@ -1,18 +1,35 @@
 from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chatbot"))
+from retrieval_cache import RetrievalCache, cached_similarity_search
+import metrics
 
 CHROMA_PATH = "database/chroma_uu_db_indo_v2"  
+EMBEDDING_MODEL = "/home/ubuntu/projek_chatbot_galang/training_model/model/all-indo-e5-small-v4-matryoshka-v1"
+RETRIEVAL_CACHE_PATH = "database/retrieval_cache.sqlite3"
+METRICS_LOG_PATH = "metrics_test_rag.jsonl"
 
 embedding_function = HuggingFaceEmbeddings(
-    model_name="/home/ubuntu/projek_chatbot_galang/training_model/model/all-indo-e5-small-v4-matryoshka-v1",
+    model_name=EMBEDDING_MODEL,
     model_kwargs={"device": "cpu"},
 )
 
 db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
 
+retrieval_cache = RetrievalCache(
+    model_name=EMBEDDING_MODEL,
+    watch_paths=[CHROMA_PATH],
+    db_path=RETRIEVAL_CACHE_PATH,
+)
+
 def rag_retrieve(query, k=3):
     print(f"\nQuery: {query}")
-    results = db.similarity_search_with_score(query, k=k)
+    with metrics.request_trace("test_rag") as trace:
+        _, results = cached_similarity_search(db, embedding_function, query, k, cache=retrieval_cache)
+    print(f"📊 {trace.summary()}")
     print(results)
     for i, (doc, score) in enumerate(results):
         print(f"\n--- Hasil {i+1} (score={score}) ---")
@@ -21,6 +38,7 @@ def rag_retrieve(query, k=3):
         print("-" * 50)
 
 if __name__ == "__main__":
+    metrics.configure(log_path=METRICS_LOG_PATH)
     while True:
         query = input("\nMasukkan query (atau 'exit' untuk keluar): ")
         if query.lower() == "exit":
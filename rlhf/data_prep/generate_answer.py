@@ -2,11 +2,14 @@ import json
 import time
 from tqdm import tqdm
 import random
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from llama_cpp import Llama
 from ollama import Client
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "chatbot"))
+from engine import TaxbotEngine
+from retrieval_cache import RetrievalCache
+import metrics
 
 # ===========================
 # KONFIGURASI PATH & MODEL
@@ -15,127 +18,47 @@ CHROMA_PATH = "/home/ubuntu/projek_chatbot_galang/chatbot/database/chroma_uu_db_
 INPUT_FILE = "dataset/selected_questions_v3.jsonl"
 OUTPUT_FILE = "dataset/generated_responses_v3.jsonl"
 CHECKPOINT_FILE = "dataset/checkpoint_responses.jsonl"
-
-llm_local = Llama(
+EMBEDDING_MODEL = "/home/ubuntu/projek_chatbot_galang/chatbot/model/all-indo-e5-small-v4-matryoshka-v2"
+RETRIEVAL_CACHE_PATH = "/home/ubuntu/projek_chatbot_galang/chatbot/database/retrieval_cache.sqlite3"
+METRICS_LOG_PATH = "dataset/metrics_generate_answer.jsonl"
+METRICS_PROM_PATH = "dataset/metrics_generate_answer.prom"
+# Konteks untuk semua pertanyaan diambil di awal, per batch embed/search
+RETRIEVAL_BATCH_SIZE = 64
+
+engine = TaxbotEngine(
     model_path="/home/ubuntu/projek_chatbot_galang/chatbot/model/taxbot_v9_dpo_v1.gguf",
+    chroma_path=CHROMA_PATH,
+    embedding_model=EMBEDDING_MODEL,
     n_ctx=2048,
-    verbose=False,
-    device="cuda"
+    device="cuda",
+    embedding_device="cuda",
+    generation_kwargs={"temperature": 0.3, "repeat_penalty": 1.1},
+    # Data preferensi untuk model yang di-fine-tune dengan layout konteks-di-depan:
+    # prompt, konteks (tanpa packing) dan retrieval dibuat seperti saat training
+    prefix_cache=False,
+    pack_context=False,
+    citation_lookup=False,
+    retrieval_cache=RetrievalCache(
+        model_name=EMBEDDING_MODEL,
+        watch_paths=[CHROMA_PATH],
+        db_path=RETRIEVAL_CACHE_PATH,
+    ),
 )
 
 #ollama_client = Client()
 
-# ===========================
-# FORMAT CHAT UNTUK LLAMA_CPP
-# ===========================
-def format_llama_cpp_chat(messages):
-    text = ""
-    for msg in messages:
-        text += f"<|im_start|>{msg['role']}\n{msg['content']}<|im_end|>\n"
-    text += "<|im_start|>assistant\n"
-    return text
-
-
-# ===========================
-# BUILD CONTEXT DENGAN STRUKTUR JELAS
-# ===========================
-def build_context_from_db(db, query, top_k=3):
-    results = db.similarity_search_with_score(query, k=top_k)
-    if len(results) == 0 or results[0][1] > 13:
-        return "Maaf, tidak ada data relevan.", ["none"], "none"
-
-    structured_contexts = []
-    source_list = []
-
-    for i, (doc, score) in enumerate(results):
-        meta = doc.metadata
-        uu = meta.get("uu", "")
-        pasal = meta.get("pasal", "")
-        ayat = meta.get("ayat", "")
-        sumber = meta.get("sumber", "")
-        structured_contexts.append(
-            f"""
-Konteks {i+1}:
-{uu} {pasal} Ayat {ayat}
-(Sumber: {sumber}, Skor: {score:.2f})
-
-Isi dan/atau Penjelasan:
-{doc.page_content.strip()}
-            """
-        )
-        source_list.append(f"UU {uu} Pasal {pasal} Ayat {ayat}")
-
-    return structured_contexts, source_list, "true"
-
-
-# ===========================
-# PROMPT TEMPLATE RAG
-# ===========================
-def build_system_template(context, source):
-    return f"""Jawab pertanyaan berdasarkan konteks berikut:
-    {context}
-
-    Kamu adalah asisten ahli pajak Indonesia.
-    Jawaban harus faktual, to the point, dan menggunakan bahasa formal.
-    Jika informasi tidak ada dikonteks atau pertanyaan tidak berkaitan dengan pajak,
-    jawab: "Maaf, saya tidak memiliki pemahaman tentang hal itu."
-
-    Sumber konteks: {source}
-
-    Bila jawaban ditemukan dengan jelas di konteks:
-    - Sertakan sumber pasal di akhir kalimat dengan cara yang natural,
-    misalnya: "sesuai dengan Pasal {{pasal}} UU Nomor {{ayat}} Tahun {{tahun}}".
-    - Sertakan sumber hukum dengan format:
-    Source: Pasal {{pasal}} Ayat {{ayat}} UU {{uu}}.
-
-    Bila jawaban tidak ditemukan dengan jelas di konteks:
-    Gunakan FORMAT JAWABAN AKHIR berikut:
-
-    Sources Used:
-    [Daftar sumber UU yang digunakan (minimal 2)]
-
-    Summary:
-    [Rangkuman inti analisis]
-
-    PILIH SATU BAGIAN SAJA di bawah ini, lalu isi dengan teks yang relevan:
-
-    [[ Conclusion ]]
-    [Tulis kesimpulan, JIKA analisis berfokus pada ringkasan temuan
-    dan implikasi logis dari data yang ada.]
-
-    ATAU
-
-    [[ Recommendation ]]
-    [Tulis rekomendasi, JIKA analisis berfokus pada usulan aksi,
-    kebijakan, atau langkah perbaikan di masa depan.]
-    """
-
 
 # ===========================
 # INFERENSI DENGAN LLAMA_CPP LOKAL
 # ===========================
 def infer_local(question, context, source):
-    SYSTEM_TEMPLATE = build_system_template(context, source)
-    messages = [
-        {"role": "system", "content": SYSTEM_TEMPLATE},
-        {"role": "user", "content": question}
-    ]
-    prompt = format_llama_cpp_chat(messages)
-
-    out = llm_local(
-        prompt,
-        max_tokens=500,
-        temperature=0.3,
-        top_p=0.8,
-        repeat_penalty=1.1
-    )
-
-    return out["choices"][0]["text"].strip()
+    return engine.infer(question, context, source)
 
 
 # ===========================
 # INFERENSI DENGAN OLLAMA API
 # ===========================
+# from engine import build_system_template
 # def infer_ollama(question, context, source):
 #     SYSTEM_TEMPLATE = build_system_template(context, source)
 #     response = ollama_client.chat(
@@ -168,12 +91,10 @@ def load_existing_questions(filename):
 # MAIN PIPELINE
 # ===========================
 def main():
-    print("🔍 Memuat database embedding dan pertanyaan...")
-    embedding_function = HuggingFaceEmbeddings(
-        model_name="/home/ubuntu/projek_chatbot_galang/chatbot/model/all-indo-e5-small-v4-matryoshka-v2",
-        model_kwargs={"device": "cuda"}
-    )
-    db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
+    metrics.configure(log_path=METRICS_LOG_PATH)
+    print("🔍 Memuat model, database embedding dan pertanyaan...")
+    startup = engine.warmup()
+    print(f"⚙️  Engine siap dalam {startup['total']:.2f} detik")
 
     with open(INPUT_FILE, "r", encoding="utf-8") as f:
         questions = [json.loads(line) for line in f]
@@ -181,13 +102,21 @@ def main():
     done_questions = load_existing_questions(OUTPUT_FILE)
     print(f"📚 Total pertanyaan: {len(questions)} | Sudah dikerjakan: {len(done_questions)}")
 
+    # Ambil konteks dari database untuk semua pertanyaan yang belum dikerjakan sekaligus
+    pending = [q["prompt"] for q in questions if q["prompt"] not in done_questions]
+    start = time.perf_counter()
+    with metrics.request_trace("generate_answer/retrieve"):
+        contexts = dict(zip(pending, engine.build_contexts(pending, top_k=3, batch_size=RETRIEVAL_BATCH_SIZE)))
+    elapsed = time.perf_counter() - start
+    print(f"🔎 Konteks {len(pending)} pertanyaan diambil dalam {elapsed:.2f} detik "
+          f"({len(pending) / max(elapsed, 1e-9):.1f} query/detik)")
+
     for idx, q in enumerate(tqdm(questions, desc="Generating answers")):
         question = q["prompt"]
         if question in done_questions:
             continue
 
-        # Ambil konteks dari database
-        context, source, _ = build_context_from_db(db, question)
+        context, source, _ = contexts[question]
         context_combined = "\n\n==============================\n\n".join(context)
         source_combined = "; ".join(source)
 
@@ -196,7 +125,8 @@ def main():
         # 🔹 Generate dari Llama lokal
         for i in range(5):
             try:
-                ans = infer_local(question, context_combined, source_combined)
+                with metrics.request_trace("generate_answer/infer"):
+                    ans = infer_local(question, context_combined, source_combined)
                 question_outputs.append({
                     "context": context_combined,
                     "source": source_combined,
@@ -227,6 +157,7 @@ def main():
 
         time.sleep(1.5)
 
+    metrics.REGISTRY.write_prometheus(METRICS_PROM_PATH)
     print("\n✅ Semua pertanyaan selesai digenerate!")
 
 
@@ -235,4 +166,4 @@ def main():
 # ===========================
 if __name__ == "__main__":
     main()
-    llm_local.close()
+    engine.close()
@@ -1,15 +1,21 @@
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 import json
 import ollama
 from tqdm import tqdm
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "chatbot"))
+from embedding_cache import cached_huggingface_embeddings
 
 CHROMA_PATH = "/home/ubuntu/projek_chatbot_galang/rag_model/database/chroma_uu_db_indo_v2"
 OUTPUT_JSONL = "dataset/generated_qa_dataset_v5.jsonl"
+# Cache embedding yang sama dengan rag_model/create_db.py; hanya db.get(), model tidak pernah dimuat
+EMBEDDING_CACHE_PATH = "/home/ubuntu/projek_chatbot_galang/rag_model/database/embedding_cache"
 
-embedding_function = HuggingFaceEmbeddings(
-    model_name="LazarusNLP/all-indo-e5-small-v4",
+embedding_function = cached_huggingface_embeddings(
+    "LazarusNLP/all-indo-e5-small-v4",
+    cache_dir=EMBEDDING_CACHE_PATH,
     model_kwargs={"device": "cuda"},
 )
 